@@ -5,10 +5,9 @@ defines class `CntlrPy` that can be used interactively in python, this is a conv
 command line options in an interactive environment such as jupyter notebook or python interactive interpeter.
 """
 
-import os, sys, datetime, json, gettext, logging, time, multiprocessing, shlex, traceback, shutil
+import os, sys, datetime, json, gettext, logging, time, multiprocessing, shlex, traceback, shutil, threading, sqlite3
 from lxml import etree
 from collections import OrderedDict, defaultdict
-from urllib import request
 import arelle
 from arelle import (Cntlr, CntlrCmdLine, ModelManager, PluginManager, PackageManager, ModelXbrl,
                     ModelFormulaObject, XmlUtil)
@@ -17,11 +16,27 @@ from arelle.FileSource import openFileSource
 
 
 try:
-    from .HelperFuncs import chkToList, xmlFileFromString, getExtractedXbrlInstance
+    from .HelperFuncs import (chkToList, xmlFileFromString, getExtractedXbrlInstance, chkCompressionCodec, compressText, decompressText,
+                              compressedFileExtension, writeTextFile, getDeiFacts, get_size)
     from .OptionsHandler import OptionsHandler, RESERVED_KWARGS
+    from .WorkerPool import WorkerPool, processMemoryUsed
+    from .RunJournal import RunJournal
+    from .FormulaResultCache import FormulaResultCache
+    from .Prefetcher import Prefetcher, RateLimiter
+    from .RenderManifest import RenderManifest, renderSetupInfo, reportFilesHashes
+    from .Downloader import sharedDownloader
+    from .RenderProgress import RenderProgress, statusCallback
 except:
-    from HelperFuncs import chkToList, xmlFileFromString, getExtractedXbrlInstance
+    from HelperFuncs import (chkToList, xmlFileFromString, getExtractedXbrlInstance, chkCompressionCodec, compressText, decompressText,
+                             compressedFileExtension, writeTextFile, getDeiFacts, get_size)
     from OptionsHandler import OptionsHandler, RESERVED_KWARGS
+    from WorkerPool import WorkerPool, processMemoryUsed
+    from RunJournal import RunJournal
+    from FormulaResultCache import FormulaResultCache
+    from Prefetcher import Prefetcher, RateLimiter
+    from RenderManifest import RenderManifest, renderSetupInfo, reportFilesHashes
+    from Downloader import sharedDownloader
+    from RenderProgress import RenderProgress, statusCallback
 
 # print('FROZEN STAT:', getattr(sys, 'frozen', 'not frozen!'))
 
@@ -384,46 +399,45 @@ class CntlrPy(CntlrCmdLine.CntlrCmdLine):
                         'EntityPublicFloat', 'EntityListingParValuePerShare']
             info = OrderedDict()
             info['ModelXbrl at position'] = makeValDict(l='ModelXbrl at position', v=pos)
+            _deiFacts = getDeiFacts(mXbrl, dei_info)
             for _c in dei_info:
                 _c_enum = _c
                 i = 1
-                for _cx in mXbrl.nameConcepts[_c]:
-                    _fcts = list(mXbrl.factsByQname[_cx.qname])
-                    _fcts.sort(key=lambda z: z.sourceline)
-                    for _f in _fcts:
-                        _cntx = _f.context
-                        _lbl = ''
-                        if len(_cntx.qnameDims) > 0:
-                            _cntx_ky = list(_cntx.qnameDims.keys())[0]
-                            _lbl = _cntx.qnameDims[_cntx_ky].member.label()
-                        _prdEnd = (
-                            _cntx.endDatetime - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-                        _cntx_dim_lbl = _lbl if _lbl else None
-                        _ky = _cx.label()
-                        while _c_enum in info.keys():
-                        # if _ky in info.keys():
-                            _ky = _cx.label() + ' ({})'.format(i)
-                            _c_enum = _c + ' ({})'.format(i)
-                            i += 1
-                        _cntx_prd = ()
-                        if _cntx.isForeverPeriod:
-                            _cntx_prd = ('forever', None, None)
-                        elif _cntx.isInstantPeriod:
-                            _instprd = XmlUtil.dateunionValue(_cntx.instantDatetime, subtractOneDay=True)
-                            _cntx_prd = ('instant', _instprd, None)
-                        else:
-                            _cntx_prd = (
-                                'duration',
-                                XmlUtil.dateunionValue(_cntx.startDatetime),
-                                XmlUtil.dateunionValue(
-                                    _cntx.endDatetime, subtractOneDay=True)
-                            )
-                        # info[_ky] = (_f.value, _cntx_dim_lbl)
-                        _unt = _f.unit.value if _f.unit is not None else None
-                        # info[_ky] = makeValDict(v=_f.value, u=_unt, dim=_cntx_dim_lbl,
-                        #                         p=_cntx_prd)
-                        info[_c_enum] = makeValDict(l=_ky, v=_f.value, u=_unt, dim=_cntx_dim_lbl,
-                        p=_cntx_prd)
+                for _f in _deiFacts.get(_c, []):
+                    _cx = _f.concept
+                    _cntx = _f.context
+                    if _cx is None or _cntx is None:
+                        continue
+                    _lbl = ''
+                    if len(_cntx.qnameDims) > 0:
+                        _cntx_ky = list(_cntx.qnameDims.keys())[0]
+                        _lbl = _cntx.qnameDims[_cntx_ky].member.label()
+                    _cntx_dim_lbl = _lbl if _lbl else None
+                    _ky = _cx.label()
+                    while _c_enum in info.keys():
+                    # if _ky in info.keys():
+                        _ky = _cx.label() + ' ({})'.format(i)
+                        _c_enum = _c + ' ({})'.format(i)
+                        i += 1
+                    _cntx_prd = ()
+                    if _cntx.isForeverPeriod:
+                        _cntx_prd = ('forever', None, None)
+                    elif _cntx.isInstantPeriod:
+                        _instprd = XmlUtil.dateunionValue(_cntx.instantDatetime, subtractOneDay=True)
+                        _cntx_prd = ('instant', _instprd, None)
+                    else:
+                        _cntx_prd = (
+                            'duration',
+                            XmlUtil.dateunionValue(_cntx.startDatetime),
+                            XmlUtil.dateunionValue(
+                                _cntx.endDatetime, subtractOneDay=True)
+                        )
+                    # info[_ky] = (_f.value, _cntx_dim_lbl)
+                    _unt = _f.unit.value if _f.unit is not None else None
+                    # info[_ky] = makeValDict(v=_f.value, u=_unt, dim=_cntx_dim_lbl,
+                    #                         p=_cntx_prd)
+                    info[_c_enum] = makeValDict(l=_ky, v=_f.value, u=_unt, dim=_cntx_dim_lbl,
+                    p=_cntx_prd)
             info['Source File'] = makeValDict(l='Source File', v=mXbrl.uri)
             info['ModelXbrl'] = makeValDict(l='ModelXbrl', v=mXbrl)
             return info
@@ -495,22 +509,8 @@ class subProcessCntlrPy(CntlrPy):
             # super().addToLog(message,messageCode,messageArgs,file, refs, level)
             pass
 
-def renderEdgarReports(rssItem, saveToFolderPath, plugins=None, q=None):
-    '''Creates Edegar report for SEC filings along with additional `additionalMeta.json` file (used by LocalViewerStandalone) 
-    and saves output to selected folder, modelRssItem is meant to be the starting point of this process.
-    args:
-        rssItem: modelRssItem
-        saveToFolderPath: save rendered report to which folder (a sub folder will be created for the current instance)
-        plugins: list of absolute paths to required plugins 'validate/EFM', 'EdgarRenderer','transforms/SEC'. None if using default plugins location of Arelle installation,
-                the default is ['validate/EFM', 'EdgarRenderer','transforms/SEC']
-
-    '''
-    gettext.install('arelle') 
-    # information from rssItem
-    _cntlr = rssItem.modelDocument.modelXbrl.modelManager.cntlr
-    instConfigDir = _cntlr.userAppDir
-    useResDir = os.path.dirname(_cntlr.configDir)
-    logFileName = 'logToBuffer'
+def renderItemInfo(rssItem):
+    '''Returns picklable dict of the information needed from `rssItem` (modelRssItem) to render its Edgar reports'''
     inlineXbrl = 0
     inlineAttrib = rssItem.xpath('.//@*[local-name()="inlineXBRL"]')
     if inlineAttrib:
@@ -522,12 +522,17 @@ def renderEdgarReports(rssItem, saveToFolderPath, plugins=None, q=None):
                 inlineXbrl = 0
         elif isinstance(isInlineXbrl, bool):
             int(isInlineXbrl)
-    indexLink = rssItem.find('link').text
-    primeDoc = rssItem.primaryDocumentURL
-    filingDate = str(rssItem.filingDate)
-    entryPointUrl = getattr(rssItem, 'url', None)
-    errors  = []
-
+    return {'entryPointUrl': getattr(rssItem, 'url', None),
+            'indexLink': rssItem.find('link').text,
+            'primeDoc': rssItem.primaryDocumentURL,
+            'filingDate': str(rssItem.filingDate),
+            'inlineXbrl': inlineXbrl,
+            'accessionNumber': getattr(rssItem, 'accessionNumber', None),
+            'formType': getattr(rssItem, 'formType', None),
+            'companyName': getattr(rssItem, 'companyName', None)}
+
+def renderPluginsToPreload(useResDir, plugins=None):
+    '''Returns '|' separated plugins to preload for rendering, raises exception if any of the required plugins is not found'''
     # Check if all required plugins exits
     requiredPlugins = ['validate/EFM','EdgarRenderer','transforms/SEC']
     if plugins:
@@ -538,7 +543,50 @@ def renderEdgarReports(rssItem, saveToFolderPath, plugins=None, q=None):
     if not all(chkPlugins):
         raise Exception(_('Cannot find required plugin(s) {}'.format(', '.join([x for x,y in zip(requiredPlugins, chkPlugins) if not y]))))
 
-    preloadPlugins = '|'.join(requiredPlugins)
+    return '|'.join(requiredPlugins)
+
+def renderEdgarReports(rssItem, saveToFolderPath, plugins=None, q=None, forceRender=False):
+    '''Creates Edegar report for SEC filings along with additional `additionalMeta.json` file (used by LocalViewerStandalone) 
+    and saves output to selected folder, modelRssItem is meant to be the starting point of this process.
+    args:
+        rssItem: modelRssItem
+        saveToFolderPath: save rendered report to which folder (a sub folder will be created for the current instance)
+        plugins: list of absolute paths to required plugins 'validate/EFM', 'EdgarRenderer','transforms/SEC'. None if using default plugins location of Arelle installation,
+                the default is ['validate/EFM', 'EdgarRenderer','transforms/SEC']
+        forceRender: render again even if the report folder already has a complete report (existing report is removed)
+
+    '''
+    gettext.install('arelle') 
+    # information from rssItem
+    _cntlr = rssItem.modelDocument.modelXbrl.modelManager.cntlr
+    instConfigDir = _cntlr.userAppDir
+    useResDir = os.path.dirname(_cntlr.configDir)
+    itemInfo = renderItemInfo(rssItem)
+    preloadPlugins = renderPluginsToPreload(useResDir, plugins)
+
+    # create subfolder for the report
+    reportFolder = os.path.join(saveToFolderPath, os.path.basename(itemInfo['entryPointUrl']).replace('.', '_'))
+    if os.path.isdir(reportFolder) and not forceRender:
+        files = os.listdir(reportFolder)
+        if all([x in files for x in ["FilingSummary.xml","additionalMeta.json"]]):
+            return reportFolder, []
+
+    # initialize cntlr
+    # c = CntlrPy(instConfigDir=instConfigDir, useResDir=useResDir, logFileName=logFileName,  preloadPlugins=preloadPlugins)
+    c = subProcessCntlrPy(instConfigDir=instConfigDir, useResDir=useResDir, logFileName='logToBuffer',  preloadPlugins=preloadPlugins, q=q)
+    return renderEdgarReportsWithCntlr(c, itemInfo, saveToFolderPath, forceRender=forceRender)
+
+def renderEdgarReportsWithCntlr(c, itemInfo, saveToFolderPath, forceRender=False):
+    '''Renders Edgar reports for filing `itemInfo` (from `renderItemInfo`) using cntlr `c` (with rendering plugins preloaded),
+    see `renderEdgarReports`. Returns (report folder, errors), or None if the report was not created.
+    '''
+    logFileName = 'logToBuffer'
+    inlineXbrl = itemInfo['inlineXbrl']
+    indexLink = itemInfo['indexLink']
+    primeDoc = itemInfo['primeDoc']
+    filingDate = itemInfo['filingDate']
+    entryPointUrl = itemInfo['entryPointUrl']
+    errors  = []
 
     # create subfolder for the report
     reportFolder = os.path.join(saveToFolderPath, os.path.basename(entryPointUrl).replace('.', '_'))
@@ -546,13 +594,14 @@ def renderEdgarReports(rssItem, saveToFolderPath, plugins=None, q=None):
     if os.path.isdir(reportFolder):
         files = os.listdir(reportFolder)
         if all([x in files for x in ["FilingSummary.xml","additionalMeta.json"]]):
-            return reportFolder, errors
+            if not forceRender:
+                return reportFolder, errors
+            # stale report, render again from scratch
+            shutil.rmtree(reportFolder)
+            os.makedirs(reportFolder)
     else:
         os.makedirs(reportFolder)
 
-    # initialize cntlr
-    # c = CntlrPy(instConfigDir=instConfigDir, useResDir=useResDir, logFileName=logFileName,  preloadPlugins=preloadPlugins)
-    c = subProcessCntlrPy(instConfigDir=instConfigDir, useResDir=useResDir, logFileName=logFileName,  preloadPlugins=preloadPlugins, q=q)
     # Run arelle to create the Edgar report pack
     retries =0
     badURL = True
@@ -590,16 +639,14 @@ def renderEdgarReports(rssItem, saveToFolderPath, plugins=None, q=None):
 
     mX = c.modelManager.modelXbrl
     summary_dict = OrderedDict()
+    deiFacts = getDeiFacts(mX, dei_info)
     for cpt in dei_info:
-        for _cpt in mX.nameConcepts.get(cpt):
-            _fcts = list(mX.factsByQname[_cpt.qname])
-            if _fcts:
-                _fcts.sort(key=lambda z: z.sourceline)
-                fact = _fcts[0]
-                res = [fact.concept.label(), fact.effectiveValue.strip()]
-                summary_dict[cpt] = res
-            else:
-                summary_dict[cpt] = ['', '']
+        _fcts = deiFacts.get(cpt)
+        if _fcts:
+            fact = _fcts[0]
+            summary_dict[cpt] = [fact.concept.label() if fact.concept is not None else cpt, (fact.effectiveValue or '').strip()]
+        else:
+            summary_dict[cpt] = ['', '']
 
     summary_dict['Source File'] = ['Source File', os.path.join(reportFolder, os.path.basename(entryPointUrl))]
     card_dict = OrderedDict()
@@ -632,15 +679,14 @@ def renderEdgarReports(rssItem, saveToFolderPath, plugins=None, q=None):
     card_dict['indexLink'] = ['Filing Link', indexLink]
     card_dict['primeDoc'] = ['Primary Document', '']
     primeDocName = os.path.basename(primeDoc)
-    if not primeDocName in os.listdir(reportFolder):
+    if not os.path.exists(os.path.join(reportFolder, primeDocName)):
         try:
-            doc = request.urlopen(primeDoc)
-            if doc.code == 200:
-                with open(os.path.join(reportFolder, primeDocName), 'wb') as pDoc:
-                    pDoc.write(doc.read())
-                card_dict['primeDoc'] =  ['Primary Document', os.path.join(reportFolder, primeDocName)]
-        except:
+            sharedDownloader(c).download(primeDoc, destPath=os.path.join(reportFolder, primeDocName))
+            card_dict['primeDoc'] =  ['Primary Document', os.path.join(reportFolder, primeDocName)]
+        except Exception as e:
             c.showStatus(_('Could not get primary html document'))
+            c.addToLog(_('Could not get primary html document {}: {}').format(primeDoc, str(e)), messageCode="arellepy.Error", 
+                        file=primeDoc, level=logging.ERROR)
     else:
         card_dict['primeDoc'] =  ['Primary Document', os.path.join(reportFolder, primeDocName)]
 
@@ -668,7 +714,92 @@ def renderEdgarReports(rssItem, saveToFolderPath, plugins=None, q=None):
 
     return reportFolder, errors
 
-def renderEdgarReportsFromRssItems(mainCntlr, rssItems=None, saveToFolder=None, pluginsDirs=None):
+def prefetchRenderFiling(cntlr, itemInfo, saveToFolderPath, rateLimiter=None):
+    '''Downloads entry point of filing `itemInfo` (from `renderItemInfo`) into the web cache of `cntlr` and its primary document
+    into the report folder, so rendering does not wait for them. Does nothing for filings already rendered. Returns number of bytes
+    of the files fetched.
+    '''
+    entryPointUrl = itemInfo['entryPointUrl']
+    reportFolder = os.path.join(saveToFolderPath, os.path.basename(entryPointUrl).replace('.', '_'))
+    if os.path.isdir(reportFolder) and all(os.path.exists(os.path.join(reportFolder, x)) for x in ("FilingSummary.xml","additionalMeta.json")):
+        return 0
+    nBytes = 0
+    downloader = sharedDownloader(cntlr)
+    if entryPointUrl.startswith('http'):
+        if rateLimiter:
+            rateLimiter.wait()
+        nBytes += os.path.getsize(downloader.download(entryPointUrl))
+    primeDoc = itemInfo['primeDoc']
+    if primeDoc:
+        primeDocPath = os.path.join(reportFolder, os.path.basename(primeDoc))
+        if not os.path.exists(primeDocPath):
+            if rateLimiter:
+                rateLimiter.wait()
+            nBytes += os.path.getsize(downloader.download(primeDoc, destPath=primeDocPath))
+    return nBytes
+
+def initRenderWorker(configDir, resDir, preloadPlugins, eventQ=None):
+    '''Creates the cntlr with rendering plugins preloaded used by a render worker process for all filings it renders, progress
+    events are put on `eventQ` if given'''
+    gettext.install('arelle')
+    c = subProcessCntlrPy(instConfigDir=configDir, useResDir=resDir, logFileName='logToBuffer', preloadPlugins=preloadPlugins)
+    c.renderEventQ = eventQ
+    return c
+
+def renderWorkerTask(c, taskArgs):
+    '''Renders one filing with render worker cntlr `c`, returns dict of report folder, errors, duration, report files hashes, report
+    size in bytes and worker memory in KB'''
+    itemInfo, saveToFolder, forceRender = taskArgs
+    eventQ = getattr(c, 'renderEventQ', None)
+    if eventQ is not None:
+        eventQ.put((RenderProgress.RENDERING, itemInfo['entryPointUrl'], {'pid': os.getpid()}))
+    _start = time.perf_counter()
+    try:
+        res = renderEdgarReportsWithCntlr(c, itemInfo, saveToFolder, forceRender=forceRender)
+    finally:
+        c.modelManager.close()
+    if res is None:
+        return {'reportFolder': None, 'errors': ['FilingSummary.xml was not created'], 'duration': time.perf_counter() - _start, 'fileHashes': None,
+                'bytes': None, 'memory': processMemoryUsed()}
+    # report files are hashed here to keep that work off the calling process
+    isRendered = res[0] and not res[1] and os.path.isdir(res[0])
+    fileHashes = reportFilesHashes(res[0]) if isRendered else None
+    return {'reportFolder': res[0], 'errors': res[1], 'duration': time.perf_counter() - _start, 'fileHashes': fileHashes, 
+            'bytes': get_size(res[0])[0] if isRendered else None, 'memory': processMemoryUsed()}
+
+def closeRenderWorker(c):
+    c.modelManager.close()
+    c.close()
+
+def renderWorkerError(key, taskArgs, msg):
+    return {'reportFolder': None, 'errors': [msg], 'duration': None, 'fileHashes': None, 'bytes': None, 'memory': None}
+
+def renderEdgarReportsFromRssItems(mainCntlr, rssItems=None, saveToFolder=None, pluginsDirs=None, workers=1, maxFilingsPerWorker=None, 
+                                   maxWorkerMemory=None, filingTimeout=None, prefetch=0, prefetchThreads=4, maxRequestsPerSecond=10,
+                                   manifestPath=None, forceRender=False, progressCallback=None):
+    '''Renders Edgar reports for `rssItems` (see `renderEdgarReports`) to `saveToFolder`, latest filings first.
+
+    `workers` is the number of filings rendered concurrently (linux only), each worker subprocess holds one cntlr with rendering plugins
+    preloaded that renders filings until it is replaced after `maxFilingsPerWorker` filings (None for no limit) or when its memory
+    exceeds `maxWorkerMemory` MB, a worker rendering a filing for more than `filingTimeout` seconds is killed and replaced. A filing
+    that fails is logged (and its rssItem status set to 'Render Failed') and the batch goes on with the next filings.
+
+    When filings are rendered one at a time, `prefetch` next filings (entry point into the web cache and primary document into the
+    report folder) are downloaded by up to `prefetchThreads` threads while a filing renders, prefetch requests are limited to
+    `maxRequestsPerSecond` (None for no limit). Workers download their own filings, so downloads already overlap rendering.
+
+    Each filing rendered is recorded in a render manifest (sqlite file `manifestPath`, defaults to "arellepyRenderManifest.db" in cntlr
+    user app dir) with arelle, EdgarRenderer and plugins versions and hashes of report files. Filings recorded as rendered with the same
+    setup are skipped, filings recorded as failed or rendered by a different setup are rendered again from scratch, new filings are
+    rendered. A complete report already in `saveToFolder` that is not recorded (rendered before the manifest was used) is recorded as
+    adopted and kept. If `forceRender` is True all filings are rendered again.
+
+    Progress of each filing is reported as events (queued, downloading, rendering, done, failed, see `RenderProgress`) with durations,
+    bytes and memory, `progressCallback(event, stats)` is called for each event with batch stats including rate and ETA, by default a
+    status line is shown through cntlr `showStatus` when a filing is finished.
+
+    Returns `saveToFolder`.
+    '''
     cntlr = mainCntlr
     if not len(rssItems):
         cntlr.addToLog(_('Param rssitems must be a list of ModelRssItem objects'), messageCode="arellepy.Error",  file="",  level=logging.ERROR)
@@ -677,69 +808,195 @@ def renderEdgarReportsFromRssItems(mainCntlr, rssItems=None, saveToFolder=None,
     pubDateRssItems = []
     _items = rssItems
     n = 0
-    reportFolder = None
-    for _rssItem in _items:
-        pubDateRssItems.append((_rssItem.pubDate, _rssItem))
-    for pubDate, rssItem in sorted(pubDateRssItems, reverse=True):
-        res = []
-        plugins = pluginsDirs
-        try:
+    nFailed = 0
+    nSkipped = 0
+    configDir = cntlr.userAppDir
+    resDir = os.path.dirname(cntlr.configDir)
+    try:
+        preloadPlugins = renderPluginsToPreload(resDir, pluginsDirs)
+    except Exception as e:
+        cntlr.addToLog(str(e), messageCode="arellepy.Error",  file="",  level=logging.ERROR)
+        return
+    setupInfo = renderSetupInfo(resDir, preloadPlugins.split('|'))
+    manifest = RenderManifest(manifestPath if manifestPath else os.path.join(cntlr.userAppDir, 'arellepyRenderManifest.db'))
+
+    for i, _rssItem in enumerate(_items):
+        pubDateRssItems.append((_rssItem.pubDate, i, _rssItem))
+    sortedItems = [x[2] for x in sorted(pubDateRssItems, key=lambda x: (x[0], x[1]), reverse=True)]
+
+    progress = RenderProgress(total=len(sortedItems), callback=progressCallback if progressCallback else statusCallback(cntlr))
+
+    def _renderDone(i, reportFolder, errors, duration, fileHashes=None, nBytes=None, memory=None):
+        nonlocal n, nFailed
+        rssItem = sortedItems[i]
+        info = itemsInfo.get(i)
+        _key = info['entryPointUrl'] if info else getattr(rssItem, 'url', None)
+        progress.emit(RenderProgress.DONE if reportFolder and not errors else RenderProgress.FAILED, _key, duration=duration, 
+                      bytes=nBytes, memory=memory, errors=errors)
+        if reportFolder and not errors:
             rssItem.status = 'Render Edgar Reports'
-            _start = time.perf_counter()
-            reportFolder = renderEdgarReports(rssItem, saveToFolder, plugins, None)
-            _end = time.perf_counter()
-            res.append(reportFolder)
             rssItem.results = [reportFolder]
-            cntlr.addToLog(_('Done rendering form {} for {} in {} secs').format(rssItem.formType, rssItem.companyName, round(_end-_start,3)), messageCode="arellepy.Info", level=logging.INFO)
+            cntlr.addToLog(_('Done rendering form {} for {} in {} secs').format(rssItem.formType, rssItem.companyName, round(duration or 0,3)), 
+                            messageCode="arellepy.Info", level=logging.INFO)
             n +=1
-        except Exception as e:
-            cntlr.addToLog(_('Error in rendering form {} for {}\n{}').format(rssItem.formType, rssItem.companyName, str(e)), 
+            if info:
+                manifest.record(info['entryPointUrl'], reportFolder, setupInfo, RenderManifest.DONE, 
+                                fileHashes=fileHashes if fileHashes is not None else reportFilesHashes(reportFolder), 
+                                accessionNumber=info['accessionNumber'])
+        else:
+            rssItem.status = 'Render Failed'
+            nFailed +=1
+            cntlr.addToLog(_('Error in rendering form {} for {}\n{}').format(rssItem.formType, rssItem.companyName, '\n'.join(str(e) for e in errors)), 
                             messageCode="arellepy.Error",  file=getattr(rssItem, 'url', None),  level=logging.ERROR)
-            return
+            if info:
+                manifest.record(info['entryPointUrl'], reportFolder, setupInfo, RenderManifest.FAILED, accessionNumber=info['accessionNumber'], 
+                                message='\n'.join(str(e) for e in errors))
+
+    # filings already rendered with the same setup (or rendered before the manifest) are skipped
+    itemsInfo = dict()
+    toRender = []
+    forceItems = set()
+    for i, rssItem in enumerate(sortedItems):
+        try:
+            itemsInfo[i] = renderItemInfo(rssItem)
+        except Exception as e:
+            _renderDone(i, None, [str(e)], None)
+            continue
+        reportFolder = os.path.join(saveToFolder, os.path.basename(itemsInfo[i]['entryPointUrl']).replace('.', '_'))
+        action = manifest.renderAction(itemsInfo[i]['entryPointUrl'], reportFolder, setupInfo, forceRender=forceRender, 
+                                       accessionNumber=itemsInfo[i]['accessionNumber'])
+        if action == RenderManifest.SKIP:
+            rssItem.status = 'Render Edgar Reports'
+            rssItem.results = [reportFolder]
+            nSkipped +=1
+        else:
+            toRender.append(i)
+            if action == RenderManifest.RERENDER:
+                forceItems.add(i)
+    progress.skipped = nSkipped
+    for i in toRender:
+        progress.emit(RenderProgress.QUEUED, itemsInfo[i]['entryPointUrl'])
+    if nSkipped:
+        cntlr.addToLog(_('{} filing(s) already rendered with the same renderer setup will NOT be rendered again').format(nSkipped), 
+                        messageCode="arellepy.Info", file=manifest.path, level=logging.INFO)
+
+    try:
+        if workers and workers > 1 and sys.platform.lower().startswith('lin'):
+            # rssItems are not picklable, only information needed for rendering is passed on to the subprocess
+            tasks = [(i, (itemsInfo[i], saveToFolder, i in forceItems)) for i in toRender]
+            # events from workers are forwarded to progress by a thread while results are handled here
+            eventQ = multiprocessing.Queue()
+            def _forwardEvents():
+                for evt in iter(eventQ.get, None):
+                    progress.emit(evt[0], evt[1], **evt[2])
+            eventsThread = threading.Thread(target=_forwardEvents, daemon=True)
+            eventsThread.start()
+            pool = WorkerPool(workers, renderWorkerTask, initFunc=initRenderWorker, initArgs=(configDir, resDir, preloadPlugins, eventQ), 
+                              closeFunc=closeRenderWorker, maxTasksPerWorker=maxFilingsPerWorker, maxWorkerMemory=maxWorkerMemory, 
+                              errorFunc=renderWorkerError, taskTimeout=filingTimeout)
+            try:
+                for i, res in pool.imap(tasks):
+                    _renderDone(i, res['reportFolder'], res['errors'], res['duration'], res['fileHashes'], res['bytes'], res['memory'])
+            finally:
+                eventQ.put(None)
+                eventsThread.join()
+        else:
+            if workers and workers > 1:
+                cntlr.addToLog(_('Rendering with {} workers is only available on linux, filings will be rendered one at a time').format(workers), 
+                                messageCode="arellepy.Info", file='', level=logging.INFO)
+            renderIndexes = toRender
+            if prefetch:
+                rateLimiter = RateLimiter(maxRequestsPerSecond)
+                def _fetch(i):
+                    _start = time.perf_counter()
+                    nBytes = prefetchRenderFiling(cntlr, itemsInfo[i], saveToFolder, rateLimiter)
+                    progress.emit(RenderProgress.DOWNLOADING, itemsInfo[i]['entryPointUrl'], duration=time.perf_counter() - _start, bytes=nBytes)
+                def _prefetched():
+                    for i, err in Prefetcher(_fetch, toRender, lookAhead=prefetch, threads=prefetchThreads):
+                        if err is not None:
+                            cntlr.addToLog(_('Could not prefetch {}: {}').format(itemsInfo[i]['entryPointUrl'], str(err)), 
+                                            messageCode="arellepy.Info", file=itemsInfo[i]['entryPointUrl'], level=logging.INFO)
+                        yield i
+                renderIndexes = _prefetched()
+            for i in renderIndexes:
+                progress.emit(RenderProgress.RENDERING, itemsInfo[i]['entryPointUrl'], pid=os.getpid())
+                _start = time.perf_counter()
+                try:
+                    res = renderEdgarReports(sortedItems[i], saveToFolder, pluginsDirs, None, forceRender=i in forceItems)
+                    if res is None:
+                        _renderDone(i, None, ['FilingSummary.xml was not created'], time.perf_counter() - _start, memory=processMemoryUsed())
+                    else:
+                        isRendered = res[0] and not res[1] and os.path.isdir(res[0])
+                        _renderDone(i, res[0], res[1], time.perf_counter() - _start, nBytes=get_size(res[0])[0] if isRendered else None, 
+                                    memory=processMemoryUsed())
+                except Exception as e:
+                    _renderDone(i, None, [str(e)], time.perf_counter() - _start, memory=processMemoryUsed())
+    finally:
+        manifest.close()
     endTime = time.perf_counter()
-    cntlr.addToLog(_('Done with Rendering {} reports in {} secs').format(n,round(endTime-startTime,3)), messageCode="arellepy.Info", level=logging.INFO)
+    cntlr.addToLog(_('Done with Rendering {} reports in {} secs, {} failed, {} already rendered').format(n,round(endTime-startTime,3), nFailed, nSkipped), 
+                    messageCode="arellepy.Info", level=logging.INFO)
+    if progress.slowest:
+        cntlr.addToLog(_('Slowest filing {} rendered in {} secs').format(progress.slowest[1], round(progress.slowest[0],3)), 
+                        messageCode="arellepy.Info", level=logging.INFO)
 
     return saveToFolder
 
 def removeDuplicatesFromXmlDocument(modelXbrl):
+    '''Removes duplicate elements from formula output document of `modelXbrl` (when cntlr `rssDBFormulaRemoveDups` is set), first
+    occurrence is kept.
+
+    Facts are grouped by `conceptContextUnitHash` and checked by `isDuplicateOf` only against facts kept in the same group, other
+    elements (except schemaRef, context and unit) are grouped by signature (tag, attributes, stripped text), so the document is
+    processed in one pass. One summary entry is logged, each removed element is logged at debug level only.
+    '''
     cntlr = modelXbrl.modelManager.cntlr
     # Remove duplicates from output
     if getattr(cntlr, 'rssDBFormulaRemoveDups', False):
         from arelle.ModelInstanceObject import ModelFact
         from arelle.ModelDtsObject import ModelObject
         try:
-            f1 = [x for x in modelXbrl.modelDocument.xmlRootElement.iterchildren() if x.localName not in ('schemaRef', 'context', 'unit')]
-            for obj in f1:
-                if not hasattr(obj, 'isDuplicate'):
-                    obj.isDuplicate = False
-                if getattr(obj, 'isDuplicate'):
+            logger = getattr(cntlr, 'logger', None)
+            logDebug = logger is not None and logger.isEnabledFor(logging.DEBUG)
+            keptFacts = defaultdict(list) # conceptContextUnitHash: [facts kept]
+            keptSignatures = set()
+            duplicates = []
+            nFacts = 0
+            for obj in modelXbrl.modelDocument.xmlRootElement.iterchildren():
+                if obj.localName in ('schemaRef', 'context', 'unit'):
                     continue
-                for OtherObj in f1:
-                    if not hasattr(OtherObj, 'isDuplicate'):
-                        OtherObj.isDuplicate = False
-                    if getattr(OtherObj, 'isDuplicate'):
-                        continue
-                    if not obj is OtherObj:
-                        if type(obj) is ModelFact and type(OtherObj) is ModelFact:
-                            if OtherObj.isDuplicateOf(obj):
-                                OtherObj.isDuplicate = True
-                                cntlr.addToLog(_('Removing duplicate element "{}" from formula output').format(OtherObj.tag),
-                                        messageCode="arellepy.Info",  file=modelXbrl.modelDocument.basename, refs=[{'href': OtherObj},], level=logging.INFO)
-                                # cntlr.showStatus(_('Removing duplicate element "{}" from formula output').format(OtherObj.tag))
-                                OtherObj.getparent().remove(OtherObj)
-                        elif type(obj) is ModelObject and type(OtherObj) is ModelObject:
-                            if obj.tag == OtherObj.tag and all([all([obj.attrib.get(att) == OtherObj.attrib.get(att) for att in obj.attrib.keys()]), obj.text.strip() == OtherObj.text.strip()]):
-                                OtherObj.isDuplicate = True
-                                cntlr.addToLog(_('Removing duplicate element "{}" from formula output').format(OtherObj.tag),
-                                        messageCode="arellepy.Info",  file= modelXbrl.modelDocument.basename, refs=[{'href': OtherObj},], level=logging.INFO)
-                                # cntlr.showStatus(_('Removing duplicate element "{}" from formula output').format(OtherObj.tag))
-                                OtherObj.getparent().remove(OtherObj)
+                if type(obj) is ModelFact:
+                    kept = keptFacts[obj.conceptContextUnitHash]
+                    if any(obj.isDuplicateOf(x) for x in kept):
+                        duplicates.append(obj)
+                        nFacts += 1
+                    else:
+                        kept.append(obj)
+                elif type(obj) is ModelObject:
+                    signature = (obj.tag, tuple(sorted(obj.attrib.items())), (obj.text or '').strip())
+                    if signature in keptSignatures:
+                        duplicates.append(obj)
+                    else:
+                        keptSignatures.add(signature)
+            for obj in duplicates:
+                if logDebug:
+                    cntlr.addToLog(_('Removing duplicate element "{}" from formula output').format(obj.tag),
+                            messageCode="arellepy.Info",  file=modelXbrl.modelDocument.basename, refs=[{'href': obj},], level=logging.DEBUG)
+                obj.isDuplicate = True
+                obj.getparent().remove(obj)
+            if duplicates:
+                cntlr.addToLog(_('Removed {} duplicate element(s) from formula output ({} facts, {} other elements)').format(
+                                    len(duplicates), nFacts, len(duplicates) - nFacts),
+                                messageCode="arellepy.Info",  file=modelXbrl.modelDocument.basename, level=logging.INFO)
         except Exception as e:
             cntlr.addToLog(_('Error Removing Duplicates from "{}":\n{}').format(modelXbrl.modelDocument.basename, str(e)),
                                 messageCode="arellepy.Info",  file=modelXbrl.modelDocument.basename,  level=logging.ERROR)
             cntlr.showStatus(_('Error Removing Duplicates from "{}":\n{}').format(modelXbrl.modelDocument.basename, str(e)))
 
-def extractFormulaOutput(modelXbrl, formulaId=None, filingId=None, inlineXbrl=0):
+def extractFormulaOutput(modelXbrl, formulaId=None, filingId=None, inlineXbrl=0, compress=None):
+    '''Returns formula result dict for `modelXbrl` after running formula, if `compress` is a codec ('zlib' or 'zstd') 'formulaOutput' and
+    'processingLog' are compressed by `HelperFuncs.compressText`, use `decompressFormulaResult` to get the text back.
+    '''
     from arelle.ModelFormulaObject import ModelValueAssertion
     mx = modelXbrl
     outputRes = dict()
@@ -760,8 +1017,21 @@ def extractFormulaOutput(modelXbrl, formulaId=None, filingId=None, inlineXbrl=0)
                       'assertionsResults': json.dumps(assertionsRes) if assertionsRes else None,
                       'dateTimeProcessed': datetime.datetime.now().replace(microsecond=0),
                       'processingLog': modelXbrl.modelManager.cntlr.logHandler.getXml().replace('\n', '')}
+    if compress:
+        outputRes['formulaOutput'] = compressText(outputRes['formulaOutput'], compress)
+        outputRes['processingLog'] = compressText(outputRes['processingLog'], compress)
     return outputRes
 
+def decompressFormulaResult(result):
+    '''Returns a copy of formula result dict (from `extractFormulaOutput` or formulaeResults table) with 'formulaOutput' and 'processingLog'
+    decompressed if they were compressed, uncompressed results are returned as they are.
+    '''
+    res = dict(result)
+    for k in ('formulaOutput', 'processingLog'):
+        if k in res:
+            res[k] = decompressText(res[k])
+    return res
+
 def makeFormulaDict(formulaString=None, formulaSourceFile=None, writeFormulaToSourceFile=False, formulaId=None, tempDir=None):
     '''Returns formula dict ready to run or insert into DB, source can be from xml string or file.
 
@@ -804,81 +1074,618 @@ def makeFormulaDict(formulaString=None, formulaSourceFile=None, writeFormulaToSo
 
     return formulaDict
 
-def runFormulaHelper(argsDict, q):
-    res = False
+# instances processed by a worker reusing compiled formula when maxFilingsPerWorker is not given
+REUSE_COMPILED_FILINGS_PER_WORKER = 100
+
+# formula options tracing XPath source or code while parsing, expressions are not cached while any is set
+FORMULA_PARSE_TRACE_OPTIONS = ('traceVariableSetExpressionSource', 'traceVariableExpressionSource', 'traceCallExpressionSource',
+                               'traceVariableSetExpressionCode', 'traceVariableExpressionCode', 'traceCallExpressionCode')
+
+def _xpathParserModule():
+    try:
+        from arelle import XPathParser
+    except ImportError:
+        from arelle.formula import XPathParser
+    return XPathParser
+
+def _modulesReferencing(func):
+    '''Returns loaded modules having `func` as their `parse` attribute (such as modules importing XPath parser `parse` by name)'''
+    return [m for m in list(sys.modules.values()) if isinstance(getattr(m, '__dict__', None), dict) and m.__dict__.get('parse') is func]
+
+def _pluginCustomFunctionNames(cntlr):
+    '''Returns frozenset of names of custom functions provided by plugins (Formula.CustomFunctions hook)'''
+    plugins = getattr(cntlr, 'plugins', None)
+    if plugins is not None and hasattr(plugins, 'hooks'):
+        methods = plugins.hooks("Formula.CustomFunctions")
+    else:
+        from arelle.PluginManager import pluginClassMethods
+        methods = pluginClassMethods("Formula.CustomFunctions")
+    names = set()
+    for method in methods:
+        names.update(method().keys())
+    return frozenset(names)
+
+def enableFormulaCompileCache():
+    '''Parses each formula XPath expression once per process and reuses the parsed program for the following instances.
+
+    When the same formula linkbase is imported with each instance, arelle loads the linkbase, builds its variable sets and
+    parses all their XPath expressions again for every instance. The formula objects (variable sets, variables, filters) belong
+    to the DTS of each instance and are bound to its concepts and custom functions, so they can not be shared between instances,
+    this only saves the XPath parsing: the linkbase is still loaded and its formula objects are built with each instance, but
+    their parsed programs are reused. The XPath parser `parse` is replaced, in `XPathParser` and in every loaded module that
+    imported it by name (such as `arelle.ModelRenderingObject`), with a version that keeps parsed programs keyed by the
+    expression, the element it comes from (namespace, local name and namespaces in scope), its document, the trace type, and
+    the DTS custom function signatures, custom transforms and plugins custom functions, only the program header (pointing at
+    the formula objects of the current instance DTS) is created for each instance. Expressions that logged any message while
+    parsed (such as parse errors) are not cached so messages are logged for each instance, and nothing is cached or reused
+    while formula options trace expressions source or code so trace messages are the same. Only pays off when a process runs
+    formula on more than one instance. Use `disableFormulaCompileCache` to restore the original parser.
+    '''
+    XPathParser = _xpathParserModule()
+    if getattr(XPathParser.parse, 'arellepyOriginalParse', None):
+        return
+    _parse = XPathParser.parse
+    cache = dict()
+
+    def dtsKey(modelXbrl):
+        # custom functions and transforms do not change once DTS is loaded, key is made once for each DTS
+        key = getattr(modelXbrl, 'arellepyXPathDtsKey', None)
+        if key is None:
+            modelManager = modelXbrl.modelManager
+            key = (frozenset(getattr(modelXbrl, 'modelCustomFunctionSignatures', None) or ()),
+                   frozenset(getattr(modelManager, 'customTransforms', None) or ()),
+                   _pluginCustomFunctionNames(modelManager.cntlr))
+            modelXbrl.arellepyXPathDtsKey = key
+        return key
+
+    def isTracing(modelXbrl):
+        formulaOptions = getattr(modelXbrl.modelManager, 'formulaOptions', None)
+        return any(getattr(formulaOptions, x, False) for x in FORMULA_PARSE_TRACE_OPTIONS)
+
+    def parseLogged(modelObject, xpathExpression, element, name, traceType):
+        '''Returns (program, number of messages logged by modelXbrl while parsing)'''
+        modelXbrl = modelObject.modelXbrl
+        _log = modelXbrl.__dict__.get('log')
+        _logMethod = modelXbrl.log
+        logged = []
+        def log(level, codes, msg, **args):
+            logged.append(codes)
+            return _logMethod(level, codes, msg, **args)
+        modelXbrl.log = log
+        try:
+            prog = _parse(modelObject, xpathExpression, element, name, traceType)
+        finally:
+            if _log is None:
+                del modelXbrl.log
+            else:
+                modelXbrl.log = _log
+        return prog, len(logged)
+
+    def parse(modelObject, xpathExpression, element, name, traceType):
+        modelXbrl = modelObject.modelXbrl
+        if isTracing(modelXbrl):
+            return _parse(modelObject, xpathExpression, element, name, traceType)
+        try:
+            key = (xpathExpression, traceType, getattr(element, 'namespaceURI', None), getattr(element, 'localName', None),
+                   tuple(sorted((k or '', v) for k, v in element.nsmap.items())),
+                   getattr(getattr(element, 'modelDocument', None), 'uri', None), dtsKey(modelXbrl))
+            hash(key)
+        except Exception:
+            key = None
+        cached = cache.get(key) if key is not None else None
+        if cached is not None:
+            sourceStr, prog = cached
+            return [XPathParser.ProgHeader(modelObject, name, element, sourceStr, traceType)] + prog
+        if key is None:
+            return _parse(modelObject, xpathExpression, element, name, traceType)
+        prog, nLogged = parseLogged(modelObject, xpathExpression, element, name, traceType)
+        if prog and isinstance(prog[0], XPathParser.ProgHeader) and nLogged == 0:
+            if len(cache) > 100000:
+                cache.clear()
+            # header is not kept, it references model objects of the current instance
+            cache[key] = (getattr(prog[0], 'sourceStr', xpathExpression), prog[1:])
+        return prog
+
+    parse.arellepyOriginalParse = _parse
+    for module in _modulesReferencing(_parse):
+        module.parse = parse
+
+def disableFormulaCompileCache():
+    '''Restores the XPath parser replaced by `enableFormulaCompileCache`'''
+    XPathParser = _xpathParserModule()
+    parse = XPathParser.parse
+    _parse = getattr(parse, 'arellepyOriginalParse', None)
+    if _parse:
+        for module in _modulesReferencing(parse):
+            module.parse = _parse
+
+def formulaErrorResult(url, formulaId, msg):
+    '''Returns a result dict shaped like `extractFormulaOutput` output for an instance that could not be processed'''
+    return {'filingId': url[0],
+            'formulaId': formulaId,
+            'inlineXBRL': url[2] if url[2] else 0,
+            'formulaOutput': '',
+            'assertionsResults': '',
+            'dateTimeProcessed': datetime.datetime.now().replace(microsecond=0),
+            'processingLog': msg,
+            'errors': msg}
+
+def runFormulaOnUrl(b, argsDict, inSubProcess=True):
+    '''Runs formula from `argsDict` on a single instance url using cntlr `b`, returns the result dict.
+
+    Loading is retried up to 3 times if the instance is not loadable, an error result is returned if it still fails or if
+    anything goes wrong while running. `inSubProcess` unloads Edgar Renderer from `b`, should only be used if `b` does not
+    share the plugin manager of the calling process.
+    '''
     url = argsDict['url']
-    b = CntlrPy(instConfigDir=argsDict['configDir'], useResDir=argsDict['resDir'], logFileName="logToBuffer")
-    n=0
-    badUrl = True
+    formulaId = argsDict['formulaId']
+    runArgs = dict(file= url[1], logFile= 'logToBuffer', validate=True, imports= argsDict['inputFile'], rssDBFormulaRemoveDups=True)
+    if argsDict.get('removeInputDuplicates', False):
+        # consistent duplicate facts are dropped by arellepy xbrlLoaded hook before formula is evaluated
+        runArgs['arellepyRemoveInputDuplicates'] = True
+    if inSubProcess:
+        runArgs['plugins'] = '-Edgar Renderer'
+    n = 0
     errors = set()
-    while badUrl and n<=3:
-        errorResult=None
+    result = None
+    while result is None:
         try:
-            b.runKwargs(file= url[1], logFile= 'logToBuffer', validate=True, imports= argsDict['inputFile'], rssDBFormulaRemoveDups=True, plugins='-Edgar Renderer')
+            b.runKwargs(**runArgs)
         except Exception as e:
-            _msg = 'Something went wrong while processing {}:\n{}'.format(url[1], str(e)) 
-            errorResult = {'filingId': url[0],
-                        'formulaId': argsDict['formulaId'],
-                        'inlineXBRL': url[2] if url[2] else 0,
-                        'formulaOutput': '',
-                        'assertionsResults': '',
-                        'dateTimeProcessed': datetime.datetime.now().replace(microsecond=0),
-                        'processingLog': _msg,
-                        'errors': _msg}
+            _msg = 'Something went wrong while processing {}:\n{}'.format(url[1], str(e))
             b.showStatus(_msg)
             b.modelManager.close()
-            res = False
-        if n == 3 and errorResult:
-            q.put(errorResult)
-        if 'FileNotLoadable' in b.modelManager.modelXbrl.errors:
-            res= False
-            badUrl = True
-            n +=1
-            for e in b.modelManager.modelXbrl.errors:
-                errors.add(e)
+            result = formulaErrorResult(url, formulaId, _msg)
+            break
+        modelXbrl = b.modelManager.modelXbrl
+        if 'FileNotLoadable' in modelXbrl.errors:
+            errors.update(str(e) for e in modelXbrl.errors)
             b.modelManager.close()
-            b.showStatus(_('Retrying to process {} after errors {}'.format(url[1], ','.join(errors))))
+            if n >= 3:
+                result = formulaErrorResult(url, formulaId, _('Could not load {} after errors {}').format(url[1], ','.join(errors)))
+            else:
+                n += 1
+                b.showStatus(_('Retrying to process {} after errors {}'.format(url[1], ','.join(errors))))
         else:
-            res = True
-            badUrl = False
-            q.put(extractFormulaOutput(b.modelManager.modelXbrl, formulaId=argsDict['formulaId'], filingId=url[0], inlineXbrl=url[2] if url[2] else 0))
+            result = extractFormulaOutput(modelXbrl, formulaId=formulaId, filingId=url[0], inlineXbrl=url[2] if url[2] else 0, 
+                                          compress=argsDict.get('compress', None))
+    return result
+
+def runFormulaHelper(argsDict, q):
+    '''Runs formula on one instance in a new cntlr and puts the result on queue `q`, meant to be the target of a subprocess'''
+    b = CntlrPy(instConfigDir=argsDict['configDir'], useResDir=argsDict['resDir'], logFileName="logToBuffer")
+    res = runFormulaOnUrl(b, argsDict)
+    q.put(res)
     b.modelManager.close()
     b.close()
+    return not res.get('errors', False)
+
+def initFormulaWorker(configDir, resDir, reuseCompiledFormula=False):
+    '''Creates the cntlr used by a formula worker process for all instances it processes'''
+    if reuseCompiledFormula:
+        enableFormulaCompileCache()
+    return CntlrPy(instConfigDir=configDir, useResDir=resDir, logFileName="logToBuffer")
+
+def formulaWorkerTask(b, argsDict):
+    '''Runs formula on one instance using formula worker cntlr `b`'''
+    # processing log must only contain messages for this instance
+    clearLogBuffer = getattr(b.logHandler, 'clearLogBuffer', None)
+    if clearLogBuffer:
+        clearLogBuffer()
+    res = runFormulaOnUrl(b, argsDict)
+    b.modelManager.close()
     return res
 
-def runFormulaFromDBonRssItems(conn, rssItems, formulaId, additionalImports=None, insertResultIntoDb=False, updateExistingResults=False, saveResultsToFolder=False, folderPath=None, returnResults=True):
-    '''Runs formula with id `formulaId` on selected rssItems
-
-    rssItems are checked against db formulaeResults table to see if an entry exist for the same formula applied to those filings, if `updateExistingResults` is set
-    to False, formula will not be applied again to the same filings, if set to True, formula will be applied again. 
+def closeFormulaWorker(b):
+    b.modelManager.close()
+    b.close()
 
-    To touch db (insert or update) `insertResultIntoDb` must be set to True, this will trigger updating db existing formula results for same filings and inserting
-    new results to db, if `insertResultIntoDb` is set to False, formula will be ran and result returned within the return dict with key "output".
+def formulaWorkerError(key, argsDict, msg):
+    return formulaErrorResult(argsDict['url'], argsDict['formulaId'], 'Something went wrong while processing {}:\n{}'.format(argsDict['url'][1], msg))
+
+# formula worker pool settings, a setting not given (None) to `iterFormulaRuns` is taken from `cntlr.arellepyFormulaPoolOptions` (set by
+# arellepy plugin from arellepyRunFormula command line options, so runs started by other plugins use them) or else from these defaults
+FORMULA_POOL_DEFAULTS = {'workers': 1, 'maxFilingsPerWorker': None, 'maxWorkerMemory': None, 'reuseCompiledFormula': False, 
+                         'filingTimeout': None, 'maxWorkerAddressSpace': None, 'maxFilingCpuTime': None}
+
+def formulaPoolSettings(cntlr, **settings):
+    '''Returns dict of formula worker pool settings (keys of `FORMULA_POOL_DEFAULTS`), settings that are None in `settings` are taken
+    from `cntlr.arellepyFormulaPoolOptions` if set there or else from `FORMULA_POOL_DEFAULTS`'''
+    fromOptions = getattr(cntlr, 'arellepyFormulaPoolOptions', None) or dict()
+    res = dict()
+    for k, default in FORMULA_POOL_DEFAULTS.items():
+        v = settings.get(k)
+        if v is None:
+            v = fromOptions.get(k)
+        res[k] = default if v is None else v
+    return res
 
-    To make sure to apply formula to ALL selected filings (even if applied before and stored in db), set `updateExistingResults` to True. 
+def iterFormulaRuns(cntlr, urlsDict, keys, inputRes, workers=None, maxFilingsPerWorker=None, maxWorkerMemory=None, reuseCompiledFormula=None, compress=None,
+                    filingTimeout=None, maxWorkerAddressSpace=None, maxFilingCpuTime=None, quarantined=None, removeInputDuplicates=False,
+                    onIdle=None):
+    '''Yields `(key, result)` for each key in `keys` as soon as the formula run on its instance is done.
+
+    `urlsDict` maps keys to url tuples (filingId, url, inlineXBRL, ...) and `inputRes` is the formula dict from `makeFormulaDict`.
+    On linux instances are processed by up to `workers` concurrent subprocesses (that also gets rid of lxml leftovers) and
+    results are yielded as they complete, which is not necessarily the order of `keys`. Each subprocess initializes a cntlr
+    once and processes instances until it is recycled after `maxFilingsPerWorker` instances (0 for no limit) or when
+    its memory exceeds `maxWorkerMemory` MB. On other platforms instances are processed one at a time in the calling process
+    using a cntlr that is renewed every `maxFilingsPerWorker` instances.
+
+    If `reuseCompiledFormula` is True formula XPath expressions are parsed once per worker (see `enableFormulaCompileCache`), the
+    formula linkbase is still loaded with each instance, if `maxFilingsPerWorker` is not given workers process up to
+    `REUSE_COMPILED_FILINGS_PER_WORKER` instances (otherwise 1) so that parsed expressions are reused.
+    If `compress` is a codec ('zlib' or 'zstd') results text is compressed in the worker (see `extractFormulaOutput`).
+    If `removeInputDuplicates` is True consistent duplicate facts (except the most precise of each set) are removed from each instance
+    before formula is evaluated (see `arellepy.removeConsistentDuplicateFacts`).
+
+    On linux a subprocess processing an instance for more than `filingTimeout` seconds or using more than `maxFilingCpuTime` CPU seconds
+    for an instance is killed and replaced, `maxWorkerAddressSpace` limits address space of each subprocess in MB (allocations beyond
+    that fail). An error result is yielded for the instance that was being processed by a killed (or crashed) subprocess, and
+    (key, reason) is appended to `quarantined` list if given, the instance is not retried. `onIdle` is an optional function called
+    about every second while waiting for subprocesses results (such as flushing buffered db writes).
+
+    Worker pool settings (`workers` to `maxFilingCpuTime`) that are None are taken from the command line options or defaults (see
+    `formulaPoolSettings`).
+    '''
+    configDir = cntlr.userAppDir
+    resDir = os.path.dirname(cntlr.configDir)
+    poolSettings = formulaPoolSettings(cntlr, workers=workers, maxFilingsPerWorker=maxFilingsPerWorker, maxWorkerMemory=maxWorkerMemory, 
+                               reuseCompiledFormula=reuseCompiledFormula, filingTimeout=filingTimeout, 
+                               maxWorkerAddressSpace=maxWorkerAddressSpace, maxFilingCpuTime=maxFilingCpuTime)
+    workers = max(1, int(poolSettings['workers'] or 1))
+    maxFilingsPerWorker, maxWorkerMemory, reuseCompiledFormula = poolSettings['maxFilingsPerWorker'], poolSettings['maxWorkerMemory'], poolSettings['reuseCompiledFormula']
+    filingTimeout, maxWorkerAddressSpace, maxFilingCpuTime = poolSettings['filingTimeout'], poolSettings['maxWorkerAddressSpace'], poolSettings['maxFilingCpuTime']
+    if maxFilingsPerWorker is None:
+        # parsed XPath programs are kept by the worker process, a worker running one instance would never reuse them
+        maxFilingsPerWorker = REUSE_COMPILED_FILINGS_PER_WORKER if reuseCompiledFormula else 1
+    elif reuseCompiledFormula and maxFilingsPerWorker == 1:
+        cntlr.addToLog(_('Each worker processes one instance, compiled formula is not reused across instances'), 
+                        messageCode="arellepy.Info", file='', level=logging.INFO)
+    if sys.platform.lower().startswith('lin'):
+        # rssItems are not picklable, only (filingId, url, inlineXBRL) are passed on to the subprocess
+        tasks = [(_k, {'url': tuple(urlsDict[_k][:3]), 'inputFile': inputRes['inputFile'], 'formulaId': inputRes['formulaId'], 'compress': compress,
+                        'removeInputDuplicates': removeInputDuplicates}) for _k in keys]
+        pool = WorkerPool(workers, formulaWorkerTask, initFunc=initFormulaWorker, initArgs=(configDir, resDir, reuseCompiledFormula), closeFunc=closeFormulaWorker,
+                          maxTasksPerWorker=maxFilingsPerWorker, maxWorkerMemory=maxWorkerMemory, errorFunc=formulaWorkerError,
+                          taskTimeout=filingTimeout, maxAddressSpace=maxWorkerAddressSpace, maxCpuTime=maxFilingCpuTime)
+        nQuarantined = 0
+        for _k, res in pool.imap(tasks, onIdle=onIdle):
+            if len(pool.quarantined) > nQuarantined:
+                for _qk, _reason in pool.quarantined[nQuarantined:]:
+                    cntlr.addToLog(_('Filing {} quarantined: {}').format(_qk[0], _reason), messageCode="arellepy.Error", file='', level=logging.ERROR)
+                    if quarantined is not None:
+                        quarantined.append((_qk, _reason))
+                nQuarantined = len(pool.quarantined)
+            yield _k, res
+    else:
+        if filingTimeout or maxWorkerAddressSpace or maxFilingCpuTime:
+            cntlr.addToLog(_('Formula filing timeout and resource limits are only available on linux, instances will be processed without limits'), 
+                            messageCode="arellepy.Info", file='', level=logging.INFO)
+        if workers > 1:
+            cntlr.addToLog(_('Running formula with {} workers is only available on linux, instances will be processed one at a time').format(workers), 
+                            messageCode="arellepy.Info", file='', level=logging.INFO)
+        b = None
+        n = 0
+        if reuseCompiledFormula:
+            enableFormulaCompileCache()
+        try:
+            for _k in keys:
+                url = urlsDict[_k]
+                argsDict = {'url': url, 'inputFile': inputRes['inputFile'], 'formulaId': inputRes['formulaId'], 'compress': compress,
+                            'removeInputDuplicates': removeInputDuplicates}
+                # Do not need to load plugins, using same parent Plugin Manager
+                if b is None:
+                    b = CntlrPy(instConfigDir=configDir, useResDir=resDir, logFileName="logToBuffer")
+                clearLogBuffer = getattr(b.logHandler, 'clearLogBuffer', None)
+                if clearLogBuffer:
+                    clearLogBuffer()
+                res = runFormulaOnUrl(b, argsDict, inSubProcess=False)
+                b.modelManager.close()
+                n += 1
+                if maxFilingsPerWorker and n >= maxFilingsPerWorker:
+                    b = None
+                    n = 0
+                yield _k, res
+        finally:
+            if reuseCompiledFormula:
+                disableFormulaCompileCache()
+
+def iterCachedFormulaRuns(cntlr, urlsDict, keys, inputRes, cache, compress=None, removeInputDuplicates=False, **kwargs):
+    '''Same as `iterFormulaRuns` but results found in `cache` (`FormulaResultCache`) are yielded first without loading the instances,
+    results of the instances that are run without errors are added to the cache. `kwargs` are passed on to `iterFormulaRuns`.
+    '''
+    cacheKeys = dict()
+    keysToRun = []
+    for _k in keys:
+        try:
+            cacheKeys[_k] = cache.makeKey(urlsDict[_k][1], inputRes.get('formulaLinkbase'), compress, bool(removeInputDuplicates),
+                                          imports=inputRes.get('inputFile'))
+        except Exception:
+            cacheKeys[_k] = None
+        res = cache.get(cacheKeys[_k]) if cacheKeys[_k] else None
+        if res is None:
+            keysToRun.append(_k)
+            continue
+        res['filingId'], res['formulaId'] = _k[0], inputRes['formulaId']
+        yield _k, res
+    if cache.hits:
+        cntlr.addToLog(_('Got formula results for {} instance(s) from cache {}').format(cache.hits, cache.cacheDir), 
+                        messageCode="arellepy.Info", file='', level=logging.INFO)
+    for _k, res in iterFormulaRuns(cntlr, urlsDict, keysToRun, inputRes, compress=compress, removeInputDuplicates=removeInputDuplicates, **kwargs):
+        if cacheKeys.get(_k) and not res.get('errors', False):
+            try:
+                cache.put(cacheKeys[_k], res)
+            except Exception as e:
+                cntlr.addToLog(_('Error caching formula result for filingId {}: {}').format(_k[0], str(e)), 
+                                messageCode="arellepy.Error", file='', level=logging.ERROR)
+        yield _k, res
+
+# result keys that are not written to db (sql writes only `formulaeResults` table columns, mongodb documents are given the same shape)
+FORMULA_RESULTS_NON_DB_KEYS = ('errors',)
+
+def isUnsupportedUpsertError(e):
+    '''Returns True if db error `e` means the db cannot run the bulk upsert (syntax not supported, no unique constraint on
+    filingId, formulaId), rather than a failure of the write itself (such as a lock, timeout or lost connection)'''
+    if isinstance(e, ImportError):
+        return True
+    pgcode = getattr(e, 'pgcode', None)
+    if pgcode is not None:
+        # syntax_error, invalid_column_reference (no constraint matching ON CONFLICT), feature_not_supported
+        return pgcode in ('42601', '42P10', '0A000')
+    if isinstance(e, sqlite3.OperationalError):
+        return 'syntax error' in str(e) or 'ON CONFLICT' in str(e)
+    return False
+
+class FormulaResultsWriter:
+    '''Buffers formula results and writes them to rssDB `formulaeResults` table in batches.
+
+    Results are added by `add(row)` for new results or `add(row, update=True)` for results replacing existing ones
+    (matched by filingId and formulaId), buffered rows are written when `batchSize` rows are buffered or when `flushInterval`
+    seconds passed since the last write, so that if something goes wrong at most one batch is lost. `flushIfDue` writes
+    buffered rows if `flushInterval` passed, it is meant to be called while waiting for results (such as `WorkerPool.imap`
+    onIdle), so rows are not held back by a slow filing. `flush` must be called after the last row is added (or use as a
+    context manager).
+
+    Each write is one native bulk upsert committed as one transaction: `INSERT ... ON CONFLICT ("filingId", "formulaId")
+    DO UPDATE` run with `executemany` for sqlite and postgres, `bulk_write` of upserts for mongodb. If the db does not
+    support it (such as a `formulaeResults` table without a unique constraint on filingId, formulaId) the writer falls back
+    to one bulk insert and one bulk update through `conn.insertUpdateRssDB`, this is only decided on the first write (see
+    `isUnsupportedUpsertError`). Other write errors (such as a locked db or lost connection) are retried `retries` times
+    waiting `retryDelay` seconds more after each attempt, then raised with the rows kept buffered.
+
+    `onFlush` is an optional function(rows, ok) called after each write with the rows written and whether the write succeeded.
+    '''
+    def __init__(self, conn, batchSize=100, flushInterval=60, onFlush=None, retries=2, retryDelay=1):
+        self.conn = conn
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.onFlush = onFlush
+        self.batchSize = max(1, int(batchSize or 1))
+        self.flushInterval = flushInterval
+        self.inserts = []
+        self.updates = []
+        self.stats = []
+        self.errors = defaultdict(list)
+        self.lastFlush = time.perf_counter()
+        self.nativeUpsert = getattr(conn, 'product', None) in ('sqlite', 'postgres', 'mongodb')
+        self.upsertChecked = False
+        self._columns = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def add(self, row, update=False):
+        if update:
+            self.updates.append(row)
+        else:
+            self.inserts.append(row)
+        if len(self.inserts) + len(self.updates) >= self.batchSize:
+            self.flush()
+        else:
+            self.flushIfDue()
+
+    def flushIfDue(self):
+        '''Writes buffered rows if `flushInterval` seconds passed since the last write'''
+        if (self.inserts or self.updates) and self.flushInterval is not None and \
+            time.perf_counter() - self.lastFlush >= self.flushInterval:
+            self.flush()
+
+    def tableColumns(self):
+        '''Returns list of `formulaeResults` table columns (sqlite and postgres)'''
+        if self._columns is None:
+            if self.conn.product == 'sqlite':
+                self._columns = [x[1] for x in self.conn.execute('PRAGMA table_info("formulaeResults")', fetch=True)]
+            else:
+                self._columns = [x[0] for x in self.conn.execute("SELECT column_name FROM information_schema.columns "
+                                                                 "WHERE table_name = 'formulaeResults'", fetch=True)]
+        return self._columns
 
-    Formula output can be saved to files if `saveResultsToFolder` is set to True, but a valid path to a folder to save the files to must be set by `folderPath`.
+    def dbRow(self, row):
+        '''Returns copy of result `row` without the keys that are not written to db'''
+        return {k: v for k, v in row.items() if k not in FORMULA_RESULTS_NON_DB_KEYS}
 
-    insertResultIntoDb = True AND updateExistingResults= True : process ALL filings and inserts/updates db
-    insertResultIntoDb = True AND updateExistingResults= False : process filings NOT previously processed with this formula and inserts into db
-    insertResultIntoDb = False AND updateExistingResults= True : process ALL filings
+    def dbRows(self, rows):
+        '''Returns `rows` as written by `conn.insertUpdateRssDB`, mongodb documents are given the shape of sql table rows'''
+        return [self.dbRow(x) for x in rows] if self.conn.product == 'mongodb' else rows
 
-    Returns a dict containing formula outputs, formula information, ids of new filings processed, ids of existing filings processed, stats, errors.
+    def upsertRetrying(self, rows):
+        '''Runs `upsert(rows)` retrying write errors that are not `isUnsupportedUpsertError`'''
+        for attempt in range(self.retries + 1):
+            try:
+                return self.upsert(rows)
+            except Exception as e:
+                if attempt == self.retries or isUnsupportedUpsertError(e):
+                    raise
+                self.conn.cntlr.addToLog(_('Bulk upsert of formula results failed ({}), retrying').format(str(e)), 
+                                         messageCode="arellepy.Info", file=self.conn.conParams.get('database', ''), level=logging.WARNING)
+                time.sleep(self.retryDelay * (attempt + 1))
+
+    def upsert(self, rows):
+        '''Writes `rows` with one native bulk upsert committed as one transaction'''
+        if self.conn.product == 'mongodb':
+            from pymongo import ReplaceOne
+            # copies, so yielded results are not given an _id
+            self.conn.dbConn.formulaeResults.bulk_write([ReplaceOne({'filingId': x['filingId'], 'formulaId': x['formulaId']}, self.dbRow(x), upsert=True) 
+                                                         for x in rows], ordered=False)
+            return
+        keyCols = ('filingId', 'formulaId')
+        cols = [c for c in self.tableColumns() if any(c in x for x in rows)]
+        placeholder = '?' if self.conn.product == 'sqlite' else '%s'
+        sql = 'INSERT INTO "formulaeResults" ({}) VALUES ({}) ON CONFLICT ("filingId", "formulaId") DO UPDATE SET {}'.format(
+                ', '.join('"{}"'.format(c) for c in cols), ', '.join([placeholder] * len(cols)),
+                ', '.join('"{0}" = excluded."{0}"'.format(c) for c in cols if c not in keyCols))
+        dbConn = self.conn.dbConn
+        cur = dbConn.cursor()
+        try:
+            cur.executemany(sql, [tuple(x.get(c) for c in cols) for x in rows])
+            dbConn.commit()
+        except Exception:
+            dbConn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def flush(self):
+        gettext.install('arelle')
+        if self.nativeUpsert and (self.inserts or self.updates):
+            rows = self.inserts + self.updates
+            try:
+                self.upsertRetrying(rows)
+            except Exception as e:
+                if self.upsertChecked or not isUnsupportedUpsertError(e):
+                    self.errors['dbUpsert'].append(e)
+                    self.conn.cntlr.addToLog(_('Bulk upsert of {} formula results failed ({})').format(len(rows), str(e)), 
+                                             messageCode="arellepy.Error", file=self.conn.conParams.get('database', ''), level=logging.ERROR)
+                    raise
+                self.nativeUpsert = False
+                self.conn.cntlr.addToLog(_('Bulk upsert of formula results is not supported by db ({}), using inserts and updates').format(str(e)), 
+                                         messageCode="arellepy.Info", file=self.conn.conParams.get('database', ''), level=logging.INFO)
+            else:
+                self.upsertChecked = True
+                self.stats.append({'insert': len(self.inserts), 'update': len(self.updates)})
+                if self.onFlush:
+                    self.onFlush(rows, True)
+                self.inserts = []
+                self.updates = []
+        if self.inserts:
+            ok = True
+            try:
+                self.stats.append(self.conn.insertUpdateRssDB(self.dbRows(self.inserts), 'formulaeResults', action='insert', commit=True, returnStat=True))
+            except Exception as e:
+                ok = False
+                self.errors['dbInsert'].append(e)
+            if self.onFlush:
+                self.onFlush(self.inserts, ok)
+            self.inserts = []
+        if self.updates:
+            ok = True
+            try:
+                self.stats.append(self.conn.insertUpdateRssDB(self.dbRows(self.updates), 'formulaeResults', 'update', None, ['filingId','formulaId'], commit=True, returnStat=True))
+            except Exception as e:
+                ok = False
+                self.errors['dbUpdate'].append(e)
+            if self.onFlush:
+                self.onFlush(self.updates, ok)
+            self.updates = []
+        self.lastFlush = time.perf_counter()
+
+def getExistingFormulaResultsKeys(conn, formulaId, filingIds, chunkSize=500):
+    '''Returns set of keys (filingId, formulaId) of results existing in db `formulaeResults` for formula `formulaId` and filings `filingIds`.
+
+    filingIds are looked up in chunks of `chunkSize` ids (`IN` for sql dbs, `$in` for mongodb) to keep queries small regardless
+    of the number of filings.
+    '''
+    existing = set()
+    filingIds = list(filingIds)
+    for i in range(0, len(filingIds), chunkSize):
+        chunk = filingIds[i:i + chunkSize]
+        if conn.product in ('sqlite', 'postgres'):
+            # dateTimeProcessed could be useful to retrive and compare to formula dateTimeAdded
+            db = conn.execute('SELECT "filingId", "formulaId" from "formulaeResults" WHERE "formulaId"={} AND "filingId" IN ({})'.format(
+                                int(formulaId), ','.join(str(int(x)) for x in chunk)), fetch=True)
+            existing.update(tuple(x) for x in db)
+        elif conn.product == 'mongodb':
+            db = conn.dbConn.formulaeResults.find({"formulaId": formulaId, "filingId": {"$in": chunk}}, {"_id":0, "filingId":1, "formulaId":1})
+            existing.update((x['filingId'], x['formulaId']) for x in db)
+    return existing
+
+def openFormulaRunJournal(cntlr, journalPath=None):
+    '''Returns `RunJournal` for formula runs at `journalPath`, defaults to "arellepyFormulaRuns.db" in cntlr user app dir'''
+    return RunJournal(journalPath if journalPath else os.path.join(cntlr.userAppDir, 'arellepyFormulaRuns.db'))
+
+def journalFormulaResults(journal, runId, results, ok=True, message=None):
+    '''Records formula results (dicts with filingId and formulaId) in run journal, results with errors or not `ok` are recorded as errors'''
+    done = [(x['filingId'], x['formulaId']) for x in results if ok and not x.get('errors', False)]
+    failed = [(x['filingId'], x['formulaId']) for x in results if not ok or x.get('errors', False)]
+    journal.recordMany(runId, done, RunJournal.DONE)
+    journal.recordMany(runId, failed, RunJournal.ERROR, message)
+
+def saveFormulaOutputToFolder(cntlr, result, folderPath, errors, logFile='', compress=None):
+    '''Saves `formulaOutput` of a single formula result dict to a file in `folderPath`, errors are appended to `errors['saveFiles']`.
+    
+    If `compress` is a codec ('zlib' or 'zstd') the file is compressed (.xml.gz or .xml.zst), use `HelperFuncs.readTextFile` to read it.
+    '''
+    if not folderPath:
+        errors['saveFiles'].append('No folderPath entered')
+        cntlr.addToLog(_('folderPath must be a valid path to a dir to save formulae output to files'), messageCode="arellepy.Error", 
+                            file=logFile,  level=logging.ERROR)
+        return None
+    if not os.path.isdir(folderPath):
+        os.mkdir(folderPath)
+    try:
+        fileName = 'rssDBFormula_'
+        fileName += 'formulaId_{}_'.format(str(result.get('formulaId',False))) if result.get('formulaId',False) else ''
+        fileName += 'filingId_{}_'.format(str(result.get('filingId',False))).replace('.','_') if result.get('filingId',False) else '' 
+        fileName += 'on_{}.xml'.format(datetime.datetime.now().strftime("%Y%m%d%H%M"))
+        fileName += compressedFileExtension(compress) if compress else ''
+        filePath = os.path.join(folderPath, fileName)
+        cntlr.addToLog(_('Saving formula output for filing {} to {}').format(result.get('filingId'), filePath), messageCode="arellepy.Info", 
+                         file=logFile,  level=logging.INFO)
+        if compress:
+            writeTextFile(filePath, result['formulaOutput'], compress)
+        else:
+            fHandle = xmlFileFromString(decompressText(result['formulaOutput']), temp=False, filepath=filePath)
+            fHandle.seek(0)
+            fHandle.close()
+        return filePath
+    except Exception as e:
+        errors['saveFiles'].append(e)
+        cntlr.addToLog(_('Error saving formula output for filingId {}, formulaId {}: {}').format(result.get('filingId'), result.get('formulaId'), str(e)), 
+                            messageCode="arellepy.Error",  file=logFile,  level=logging.ERROR)
+    return None
+
+def iterFormulaResultsFromDBonRssItems(conn, rssItems, formulaId, additionalImports=None, insertResultIntoDb=False, updateExistingResults=False, 
+                                       saveResultsToFolder=False, folderPath=None, workers=None, maxFilingsPerWorker=None, maxWorkerMemory=None, 
+                                       reuseCompiledFormula=None, dbBatchSize=100, dbFlushInterval=60, compress=None, resumeRunId=None, 
+                                       journalPath=None, filingTimeout=None, maxWorkerAddressSpace=None, maxFilingCpuTime=None, 
+                                       removeInputDuplicates=False, runInfo=None):
+    '''Generator version of `runFormulaFromDBonRssItems`, yields each formula result dict as soon as it is done (inserted into db/saved to file
+    as requested), results are not kept after they are yielded, so memory used does not grow with the number of filings.
+
+    If `runInfo` dict is given it is updated with the run information: run id ('runId'), formula information ('input'), ids of new 
+    filings ('insert'), ids of existing filings ('update'), db stats ('stats'), errors ('errors') and quarantined filings ('quarantined').
+    
+    See `runFormulaFromDBonRssItems` for the other arguments.
     '''
     # get formula by id
     startTime = time.perf_counter()
     cntlr = conn.cntlr
-    configDir = cntlr.userAppDir
-    resDir = os.path.dirname(cntlr.configDir)
     formulaDict= dict()
     inputRes = dict()
-    outputRes = dict()
-    finalRes = dict()
     errors = defaultdict(list)
     newKeys = []
     existingKeys = []
     urlsToProcess = []
     stats = []
+    quarantined = []
+    countFilings = 0
+    compress = chkCompressionCodec(compress)
+    if runInfo is None:
+        runInfo = dict()
 
     if formulaId is None or not isinstance(formulaId, int):
         cntlr.addToLog(_('A valid formulaId must be selected to run'), messageCode="arellepy.Error", file=conn.conParams['database'], level=logging.ERROR)
@@ -902,7 +1709,13 @@ def runFormulaFromDBonRssItems(conn, rssItems, formulaId, additionalImports=None
                              file=conn.conParams.get('database',''),  level=logging.INFO)
         return
 
+    runInfo.update({'input': inputRes, 'update': existingKeys, 'insert':newKeys, 'stats':stats, 'errors':errors, 'quarantined': quarantined})
+
     if formulaDict:
+        journal = openFormulaRunJournal(cntlr, journalPath)
+        runId = journal.startRun(resumeRunId, description='formulaId {} from db {}'.format(formulaId, conn.conParams.get('database', '')))
+        runInfo['runId'] = runId
+
         # make sure we have XBRL or Extracted XBRL to be able to run the formula
         urls = []
         for x in rssItems:
@@ -912,8 +1725,8 @@ def runFormulaFromDBonRssItems(conn, rssItems, formulaId, additionalImports=None
             f_url = getExtractedXbrlInstance(x) if x.find('isInlineXBRL').text=='true' else x.url
             urls.append((f_id, f_url, f_inlineXbrl, x))
 
-        inputRes = makeFormulaDict(formulaString=formulaDict.get('formulaLinkbase', None), formulaSourceFile=formulaDict.get('fileName', None), 
-                                    writeFormulaToSourceFile=False, formulaId=formulaDict.get('formulaId', None), tempDir=conn.cntlr.userAppTempDir)
+        inputRes.update(makeFormulaDict(formulaString=formulaDict.get('formulaLinkbase', None), formulaSourceFile=formulaDict.get('fileName', None), 
+                                    writeFormulaToSourceFile=False, formulaId=formulaDict.get('formulaId', None), tempDir=conn.cntlr.userAppTempDir))
         if inputRes['inputFile']:
             inputRes['inputFile'] = inputRes['inputFile'] + '|' + additionalImports if additionalImports else ''
 
@@ -924,20 +1737,11 @@ def runFormulaFromDBonRssItems(conn, rssItems, formulaId, additionalImports=None
         urlsDict = {(x[0], formulaId): x for x in _urls}
         keys = urlsDict.keys()
 
-        whereClause = ''
-        if conn.product in ('sqlite', 'postgres'):
-            whereClause = ' OR '.join(['("filingId"={0} AND "formulaId"={1})'.format(x,y) for x,y in keys])
-            # dateTimeProcessed could be useful to retrive and compare to formula dateTimeAdded
-            db = conn.execute('SELECT "filingId", "formulaId" from "formulaeResults" WHERE {}'.format(whereClause), fetch=True)
-            _db = [tuple(x) for x in db]
-            newKeys = [x for x in keys if x not in _db]
-            existingKeys = [x for x in _db if x in keys]
-        elif conn.product == 'mongodb':
-            whereClause ={"$or": [{"$and": [{"filingId": x}, {"formulaId":y}]} for x,y in keys]}
-            db = [(x['filingId'], x['formulaId']) for x in conn.dbConn.formulaeResults.find(whereClause, {"_id":0, "filingId":1, "formulaId":1})]
-            _db = [tuple(x) for x in db]
-            newKeys = [x for x in keys if x not in _db]
-            existingKeys = [x for x in _db if x in keys]
+        _db = getExistingFormulaResultsKeys(conn, formulaId, [x[0] for x in keys])
+        newKeys.extend(x for x in keys if x not in _db)
+        existingKeys.extend(x for x in keys if x in _db)
+        _newKeys = set(newKeys)
+        _existingKeys = set(existingKeys)
 
         if updateExistingResults:
             urlsToProcess=keys
@@ -950,152 +1754,172 @@ def runFormulaFromDBonRssItems(conn, rssItems, formulaId, additionalImports=None
                 cntlr.addToLog(_('Entries for filingId(s) {} previously processed by formulaId "{}" will NOT be processed').format(str([x[0] for x in existingKeys]), 
                                     formulaId), messageCode="arellepy.Info",  file=conn.conParams.get('database', ''),  level=logging.INFO)
 
-        manager = None
-        q = None
-        if sys.platform.lower().startswith('lin'):
-            # Runs are processed in sequence, multiprocessing is used just to get rid of lxml leftovers in the subprocess
-            manager = multiprocessing.Manager()
-            q = manager.Queue()
-
-        for _k in urlsToProcess:
-            url = urlsDict[_k]
-            _rssItem = url[-1]
-            if sys.platform.lower().startswith('lin') and manager and q:
-                try:
-                    # Do not need to load plugins, using same parent Plugin Manager
-                    argsDict = {'url': url, 'configDir': configDir, 'resDir': resDir, 'inputFile': inputRes['inputFile'], 'formulaId': inputRes['formulaId']}
-                    p = multiprocessing.Process(target=runFormulaHelper, args=(argsDict, q), daemon=True)
-                    # Update item stat if in GUI
-                    if conn.cntlr.hasGui:
-                        _rssItem.status = 'Run Formula {}'.format(formulaId)
-                        conn.cntlr.modelManager.viewModelObject(_rssItem.modelXbrl, _rssItem.objectId())
-                    p.start()
-                    p.join()
-                    outputRes[_k] = q.get()
-                    if outputRes[_k].get('errors', False):
-                        errors['formulaProcessing'].append((_k, outputRes[_k].get('errors', False)))
-                        cntlr.addToLog(_('Processing formulaId "{}" with filingId "{}" caused error:\n {}').format( _k[1], _k[0],outputRes[_k].get('errors', '')), 
-                                            messageCode="arellepy.Error", file=conn.conParams.get('database', ''),  level=logging.ERROR)
-                    if conn.cntlr.hasGui:
-                        _rssItem.results = ['Formula {} processed'.format(formulaId)]
-                        conn.cntlr.modelManager.viewModelObject(_rssItem.modelXbrl, _rssItem.objectId())
-
-                except Exception as e:
-                    errors['formulaProcessing'].append((_k, e))
-                    cntlr.addToLog(_('Processing formulaId "{}" with filingId "{}" caused error:\n {}').format(_k[1], _k[0], str(e)), 
+        urlsToProcess = list(urlsToProcess)
+        if resumeRunId:
+            doneKeys = journal.doneKeys(runId)
+            _n = len(urlsToProcess)
+            urlsToProcess = [x for x in urlsToProcess if not journal.isDone(doneKeys, x)]
+            cntlr.addToLog(_('Resuming run {}, {} filing(s) already processed will NOT be processed').format(runId, _n - len(urlsToProcess)), 
+                                messageCode="arellepy.Info",  file=conn.conParams.get('database', ''),  level=logging.INFO)
+
+        # Update items stat if in GUI
+        if conn.cntlr.hasGui:
+            for _k in urlsToProcess:
+                _rssItem = urlsDict[_k][-1]
+                _rssItem.status = 'Run Formula {}'.format(formulaId)
+                conn.cntlr.modelManager.viewModelObject(_rssItem.modelXbrl, _rssItem.objectId())
+
+        # filings written to db are recorded in the journal only after they are committed
+        dbWriter = FormulaResultsWriter(conn, batchSize=dbBatchSize, flushInterval=dbFlushInterval, 
+                                        onFlush=lambda rows, ok: journalFormulaResults(journal, runId, rows, ok, message='db write failed'))
+        try:
+            for _k, _res in iterFormulaRuns(cntlr, urlsDict, urlsToProcess, inputRes, workers=workers, 
+                                             maxFilingsPerWorker=maxFilingsPerWorker, maxWorkerMemory=maxWorkerMemory, 
+                                             reuseCompiledFormula=reuseCompiledFormula, compress=compress, filingTimeout=filingTimeout, 
+                                             maxWorkerAddressSpace=maxWorkerAddressSpace, maxFilingCpuTime=maxFilingCpuTime, 
+                                             quarantined=quarantined, removeInputDuplicates=removeInputDuplicates, 
+                                             onIdle=dbWriter.flushIfDue):
+                url = urlsDict[_k]
+                _rssItem = url[-1]
+                countFilings += 1
+                if _res.get('errors', False):
+                    errors['formulaProcessing'].append((_k, _res.get('errors', False)))
+                    cntlr.addToLog(_('Processing formulaId "{}" with filingId "{}" caused error:\n {}').format( _k[1], _k[0],_res.get('errors', '')), 
                                         messageCode="arellepy.Error", file=conn.conParams.get('database', ''),  level=logging.ERROR)
-            else:
-                # for windows
-                try:
-                    # Update item stat if in GUI
-                    if conn.cntlr.hasGui:
-                        _rssItem.status = 'Run Formula {}'.format(formulaId)
-                        conn.cntlr.modelManager.viewModelObject(_rssItem.modelXbrl, _rssItem.objectId())
-                    # Do not need to load plugins, using same parent Plugin Manager
-                    b = CntlrPy(instConfigDir=configDir, useResDir=resDir, logFileName="logToBuffer")
-                    b.runKwargs(file= url[1], logFile= 'logToBuffer', validate=True, imports= inputRes['inputFile'], rssDBFormulaRemoveDups=True)
-                    outputRes[(url[0], formulaId)] = extractFormulaOutput(b.modelManager.modelXbrl, formulaId=formulaId, filingId=url[0], 
-                                                                            inlineXbrl=url[2] if url[2] else 0)
-                    b.modelManager.close()
-                    if conn.cntlr.hasGui:
-                        _rssItem.results = ['Formula {} processed'.format(formulaId)]
-                        conn.cntlr.modelManager.viewModelObject(_rssItem.modelXbrl, _rssItem.objectId())
-                except Exception as e:
-                    errors['formulaProcessing'].append((_k, e))
-                    cntlr.addToLog(_('Processing formulaId "{}" with filingId "{}" caused error:\n {}').format(_k[1], _k[0], str(e)), 
-                                        messageCode="arellepy.Info",  file=conn.conParams.get('database', ''),  level=logging.INFO)
-
-            # insert/update DB (insert as completed so not to lose everything one something goes wrong)
-            if insertResultIntoDb:
-                if _k in newKeys:
-                    try:
-                        gettext.install('arelle')
-                        _s = conn.insertUpdateRssDB([outputRes[_k]], 'formulaeResults', action='insert', commit=True, returnStat=True)
-                        stats.append(_s)
-                    except Exception as e:
-                        errors['dbInsert'].append(e)
-
-            if updateExistingResults and insertResultIntoDb:
-                if _k in existingKeys:
-                    try:
-                        gettext.install('arelle')
-                        _s = conn.insertUpdateRssDB([outputRes[_k]], 'formulaeResults', 'update', None, ['filingId','formulaId'], commit=True, returnStat=True)
-                        stats.append(_s)
-                    except Exception as e:
-                        errors['dbUpdate'].append(e)
-
-            if saveResultsToFolder:
-                if folderPath:
-                    if not os.path.isdir(folderPath):
-                        os.mkdir(folderPath)
-
-                    k = _k
-                    src = outputRes[_k]
-                    try:
-                        fileName = 'rssDBFormula_'
-                        fileName += 'formulaId_{}_'.format(str(src.get('formulaId',False))) if src.get('formulaId',False) else ''
-                        fileName += 'filingId_{}_'.format(str(src.get('filingId',False))).replace('.','_') if src.get('filingId',False) else '' 
-                        fileName += 'on_{}.xml'.format(datetime.datetime.now().strftime("%Y%m%d%H%M"))
-                        filePath = os.path.join(folderPath, fileName)
-                        cntlr.addToLog(_('Saving formula output for filing {} to {}').format(k[0], filePath), messageCode="arellepy.Info", 
-                                         file=conn.conParams.get('database', ''),  level=logging.INFO)
-                        fHandle = xmlFileFromString(src['formulaOutput'], temp=False, filepath=filePath)
-                        fHandle.seek(0)
-                        fHandle.close()
-                    except Exception as e:
-                        errors['saveFiles'].append(e)
-                        cntlr.addToLog(_('Error saving formula output for filingId {}, formulaId {}: {}').format(k[0], k[1], str(e)), 
-                                            messageCode="arellepy.Error",  file=conn.conParams.get('database', ''),  level=logging.ERROR)
+                if conn.cntlr.hasGui:
+                    _rssItem.results = ['Formula {} processed'.format(formulaId)]
+                    conn.cntlr.modelManager.viewModelObject(_rssItem.modelXbrl, _rssItem.objectId())
+
+                # insert/update DB (written in batches as completed so not to lose everything if something goes wrong)
+                if insertResultIntoDb and _k in _newKeys:
+                    dbWriter.add(_res)
+                elif insertResultIntoDb and updateExistingResults and _k in _existingKeys:
+                    dbWriter.add(_res, update=True)
                 else:
-                    errors['saveFiles'].append('No folderPath entered')
-                    cntlr.addToLog(_('folderPath must be a valid path to a dir to save formulae output to files'), messageCode="arellepy.Error", 
-                                        file=conn.conParams.get('database', ''),  level=logging.ERROR)
-    if returnResults:
-        finalRes = {'output':outputRes, 'input': inputRes, 'update': existingKeys, 'insert':newKeys, 'stats':stats, 'errors':errors}
+                    journalFormulaResults(journal, runId, [_res])
+
+                if saveResultsToFolder:
+                    saveFormulaOutputToFolder(cntlr, _res, folderPath, errors, logFile=conn.conParams.get('database', ''), compress=compress)
+
+                yield _res
+                _res = None
+        finally:
+            dbWriter.flush()
+            stats.extend(dbWriter.stats)
+            for _e, _v in dbWriter.errors.items():
+                errors[_e].extend(_v)
+            journal.close()
 
     endTime = time.perf_counter()
     allTime = str(round(endTime - startTime, 3)) + ' sec(s)'
-    countFilings = 'on ' + str(len(outputRes)) + ' filings' if len(outputRes) else ''
+    countFilings = 'on ' + str(countFilings) + ' filings' if countFilings else ''
     countErrors = sum([len(x) for x in errors.values()])
     countInserts = sum([x.get('insert', 0) for x in stats])            
     countUpdates = sum([x.get('update', 0) for x in stats])            
     cntlr.addToLog(_('Finished runing formula {} in {} with {} errors,'
-                     '{} db inserts, {} db updates').format(countFilings, allTime, countErrors, countInserts, countUpdates), 
+                     '{} db inserts, {} db updates, run id {}').format(countFilings, allTime, countErrors, countInserts, countUpdates, runInfo.get('runId')), 
                      messageCode="arellepy.Info",  file=conn.conParams.get('database', ''),  level=logging.INFO)
 
-    return finalRes
+def runFormulaFromDBonRssItems(conn, rssItems, formulaId, additionalImports=None, insertResultIntoDb=False, updateExistingResults=False, saveResultsToFolder=False, folderPath=None, returnResults=True, 
+                               workers=None, maxFilingsPerWorker=None, maxWorkerMemory=None, reuseCompiledFormula=None, dbBatchSize=100, dbFlushInterval=60,
+                               compress=None, resumeRunId=None, journalPath=None, filingTimeout=None, maxWorkerAddressSpace=None, 
+                               maxFilingCpuTime=None, removeInputDuplicates=False):
+    '''Runs formula with id `formulaId` on selected rssItems
 
-def runFormula(cntlr, instancesUrls, formulaString=None, formulaSourceFile=None, formulaId=None, writeFormulaToSourceFile=False, 
-               saveResultsToFolder=False, folderPath=None):
-    '''Runs formula from string or file on list of instances urls or rssItems WITHOUT depending on DB
+    rssItems are checked against db formulaeResults table to see if an entry exist for the same formula applied to those filings, if `updateExistingResults` is set
+    to False, formula will not be applied again to the same filings, if set to True, formula will be applied again. 
 
-    `instancesUrls` ideally a list of XBRL (.xml) documents, if inlineXBRL is in the list, tries to guess the url of the extracted XBRL instance and use it.
+    To touch db (insert or update) `insertResultIntoDb` must be set to True, this will trigger updating db existing formula results for same filings and inserting
+    new results to db, if `insertResultIntoDb` is set to False, formula will be ran and result returned within the return dict with key "output".
+
+    To make sure to apply formula to ALL selected filings (even if applied before and stored in db), set `updateExistingResults` to True. 
 
-    At least one of `formulaString` or formulaSourceFile (valid formula linkbase) must be entered, if both are entered and `writeFormulaToSourceFile`
-    is `True`, the `formulaString` will be written back to the `formulaSourceFile` and if `writeFormulaToSourceFile` is False the `formulaString` will 
-    be used and `formulaSourceFile` ignored but reported as name of formula file, if only `formulaString` is entered then the formula will be saved to 
-    a temp file, and will disappear on exit unless the result is inserted into rssDB. formulaId can be whatever identifier given to this formula, it will
-    be used for file name if `saveResultsToFolder` is chosen.
-    
     Formula output can be saved to files if `saveResultsToFolder` is set to True, but a valid path to a folder to save the files to must be set by `folderPath`.
 
-    Returns a dict containing formula outputs, formula information, ids of new filings processed, ids of existing filings processed, stats, errors.
+    insertResultIntoDb = True AND updateExistingResults= True : process ALL filings and inserts/updates db
+    insertResultIntoDb = True AND updateExistingResults= False : process filings NOT previously processed with this formula and inserts into db
+    insertResultIntoDb = False AND updateExistingResults= True : process ALL filings
+
+    `workers` is the number of filings processed concurrently (linux only) and results are handled (inserted into db/saved to file)
+    as they complete. Each worker subprocess processes filings using the same cntlr and is replaced by a new one after `maxFilingsPerWorker`
+    filings (1 is a new subprocess for each filing, 0 for no limit) or when its memory exceeds `maxWorkerMemory` MB.
+    `reuseCompiledFormula` parses formula XPath expressions once per worker instead of once per filing (the formula linkbase is
+    still loaded with each filing), workers then process up to `REUSE_COMPILED_FILINGS_PER_WORKER` filings unless `maxFilingsPerWorker`
+    is given (see `iterFormulaRuns`).
+    A worker processing a filing for more than `filingTimeout` seconds or using more than `maxFilingCpuTime` CPU seconds for a filing
+    is killed and replaced, `maxWorkerAddressSpace` limits the address space of each worker in MB (linux only), filings being processed
+    by a killed worker get an error result and are quarantined (listed in returned dict key "quarantined") and the batch goes on.
+    Worker settings left None are taken from arellepyRunFormula command line options if given or default to one filing at a time
+    (see `formulaPoolSettings`).
+
+    Results are written to db in batches of `dbBatchSize` results or every `dbFlushInterval` seconds whichever comes first (also while
+    waiting for a slow filing when `workers` run in subprocesses), each batch is one bulk upsert (see `FormulaResultsWriter`).
+
+    If `removeInputDuplicates` is True, consistent duplicate facts are removed from each filing before formula is evaluated keeping only
+    the most precise fact of each duplicate set (inconsistent duplicates are kept), so formulas bind fewer facts, this is different from
+    removing duplicates from formula output which is always done. Requires arellepy plugin to be enabled in arelle.
+
+    If `compress` is a codec ('zlib' or 'zstd'), 'formulaOutput' and 'processingLog' are stored compressed in db and returned results, and 
+    saved files are compressed, use `decompressFormulaResult` and `HelperFuncs.readTextFile` to read them.
+
+    Each filing processed is recorded in a run journal (sqlite file `journalPath`, defaults to "arellepyFormulaRuns.db" in cntlr user app dir)
+    as soon as it is done (after it is committed to db if `insertResultIntoDb`), if the run does not finish it can be run again with the same 
+    arguments and `resumeRunId` set to the run id of the unfinished run to skip filings already processed successfully.
+
+    Results are kept in memory until all filings are processed, use `iterFormulaResultsFromDBonRssItems` to get results as they are done.
+
+    Returns a dict containing formula outputs, formula information, ids of new filings processed, ids of existing filings processed, stats, errors, 
+    quarantined filings, run id.
+    '''
+    runInfo = dict()
+    outputRes = dict()
+    for _res in iterFormulaResultsFromDBonRssItems(conn, rssItems, formulaId, additionalImports=additionalImports, insertResultIntoDb=insertResultIntoDb, 
+                                                   updateExistingResults=updateExistingResults, saveResultsToFolder=saveResultsToFolder, 
+                                                   folderPath=folderPath, workers=workers, maxFilingsPerWorker=maxFilingsPerWorker, 
+                                                   maxWorkerMemory=maxWorkerMemory, reuseCompiledFormula=reuseCompiledFormula, 
+                                                   dbBatchSize=dbBatchSize, dbFlushInterval=dbFlushInterval, compress=compress, 
+                                                   resumeRunId=resumeRunId, journalPath=journalPath, filingTimeout=filingTimeout, 
+                                                   maxWorkerAddressSpace=maxWorkerAddressSpace, maxFilingCpuTime=maxFilingCpuTime, 
+                                                   removeInputDuplicates=removeInputDuplicates, runInfo=runInfo):
+        if returnResults:
+            outputRes[(_res['filingId'], _res['formulaId'])] = _res
+
+    if not runInfo:
+        return
+    if returnResults:
+        return {'output':outputRes, 'input': runInfo['input'], 'update': runInfo['update'], 'insert':runInfo['insert'], 
+                'stats':runInfo['stats'], 'errors':runInfo['errors'], 'quarantined': runInfo['quarantined'], 'runId': runInfo.get('runId')}
+    return {'runId': runInfo.get('runId')} if runInfo.get('runId') else dict()
+
+def iterFormulaResults(cntlr, instancesUrls, formulaString=None, formulaSourceFile=None, formulaId=None, writeFormulaToSourceFile=False, 
+                       saveResultsToFolder=False, folderPath=None, workers=None, maxFilingsPerWorker=None, maxWorkerMemory=None, 
+                       reuseCompiledFormula=None, compress=None, resumeRunId=None, journalPath=None, useCache=False, cacheDir=None, 
+                       cacheMaxSize=1024, filingTimeout=None, maxWorkerAddressSpace=None, maxFilingCpuTime=None, removeInputDuplicates=False, 
+                       runInfo=None):
+    '''Generator version of `runFormula`, yields each formula result dict as soon as it is done (saved to file if requested), results
+    are not kept after they are yielded, so memory used does not grow with the number of instances.
+
+    If `runInfo` dict is given it is updated with the run information: run id ('runId'), formula information ('input'), errors ('errors') and
+    quarantined instances ('quarantined').
+
+    See `runFormula` for the other arguments.
     '''
     # get formula by id
     if not formulaId:
         formulaId = '0000'
     startTime = time.perf_counter()
-    configDir = cntlr.userAppDir
-    resDir = os.path.dirname(cntlr.configDir)
-    inputRes = dict()
-    outputRes = dict()
-    finalRes = dict()
     errors = defaultdict(list)
     urlsToProcess = []
+    quarantined = []
+    countFilings = 0
+    compress = chkCompressionCodec(compress)
+    if runInfo is None:
+        runInfo = dict()
 
     #prep formula
     inputRes = makeFormulaDict(formulaString=formulaString, formulaSourceFile=formulaSourceFile, 
                                 writeFormulaToSourceFile=writeFormulaToSourceFile, formulaId=formulaId, tempDir=cntlr.userAppTempDir)
+    runInfo.update({'input': inputRes, 'errors':errors, 'quarantined': quarantined})
 
     # make tuples for urls (fileName, url, inlineXBRL)
     # make sure we have XBRL or Extracted XBRL to be able to run the formula
@@ -1119,85 +1943,122 @@ def runFormula(cntlr, instancesUrls, formulaString=None, formulaSourceFile=None,
 
 
         _urls =  chkToList(urls, tuple, lambda x: len(x)==3)
-        urlsToProcess = [(x[0], formulaId) for x in _urls]
+        # instances are keyed by filingId (file name), each key is run once
+        urlsToProcess = list(dict.fromkeys((x[0], formulaId) for x in _urls))
         if not urlsToProcess:
             cntlr.addToLog(_('No valid instances urls to process'), messageCode="arellepy.Info", file='', level=logging.INFO)
+            runInfo.clear()
             return
 
         urlsDict = {(x[0], formulaId): x for x in _urls}
 
-        manager = None
-        q = None
-        if sys.platform.lower().startswith('lin'):
-            # Runs are processed in sequence, multiprocessing is used just to get rid of lxml leftovers in the subprocess
-            manager = multiprocessing.Manager()
-            q = manager.Queue()
-
-        for _k in urlsToProcess:
-            url = urlsDict[_k]
-            if sys.platform.lower().startswith('lin') and manager and q:
-                try:
-                    # Do not need to load plugins, using same parent Plugin Manager
-                    argsDict = {'url': url, 'configDir': configDir, 'resDir': resDir, 'inputFile': inputRes['inputFile'], 'formulaId': inputRes['formulaId']}
-                    p = multiprocessing.Process(target=runFormulaHelper, args=(argsDict, q), daemon=True)
-                    p.start()
-                    p.join()
-                    outputRes[_k] = q.get()
-                    if outputRes[_k].get('errors', False):
-                        errors['formulaProcessing'].append((_k, outputRes[_k].get('errors', False)))
-                        cntlr.addToLog(_('Processing formulaId "{}" with filingId "{}" caused error:\n {}').format(_k[1], _k[0],outputRes[_k].get('errors', '')), 
-                                            messageCode="arellepy.Error", file=url[0], level=logging.ERROR)
-                except Exception as e:
-                    errors['formulaProcessing'].append((_k, e))
-                    cntlr.addToLog(_('Processing formulaId "{}" with filingId "{}" caused error:\n {}').format(_k[1], _k[0], str(e)), 
-                                        messageCode="arellepy.Error", file=url[0], level=logging.ERROR)
+        journal = openFormulaRunJournal(cntlr, journalPath)
+        try:
+            runId = journal.startRun(resumeRunId, description='formulaId {} from {}'.format(formulaId, inputRes.get('fileName')))
+            runInfo['runId'] = runId
+            if resumeRunId:
+                doneKeys = journal.doneKeys(runId)
+                _n = len(urlsToProcess)
+                urlsToProcess = [x for x in urlsToProcess if not journal.isDone(doneKeys, x)]
+                cntlr.addToLog(_('Resuming run {}, {} instance(s) already processed will NOT be processed').format(runId, _n - len(urlsToProcess)), 
+                                    messageCode="arellepy.Info", file='', level=logging.INFO)
+
+            runKwargs = dict(workers=workers, maxFilingsPerWorker=maxFilingsPerWorker, maxWorkerMemory=maxWorkerMemory, 
+                             reuseCompiledFormula=reuseCompiledFormula, compress=compress, filingTimeout=filingTimeout, 
+                             maxWorkerAddressSpace=maxWorkerAddressSpace, maxFilingCpuTime=maxFilingCpuTime, quarantined=quarantined,
+                             removeInputDuplicates=removeInputDuplicates)
+            if useCache:
+                cache = FormulaResultCache(cacheDir if cacheDir else os.path.join(cntlr.userAppDir, 'arellepyFormulaCache'), maxSize=cacheMaxSize)
+                formulaRuns = iterCachedFormulaRuns(cntlr, urlsDict, urlsToProcess, inputRes, cache, **runKwargs)
             else:
-                # for windows
-                try:
-                    # Do not need to load plugins, using same parent Plugin Manager
-                    b = CntlrPy(instConfigDir=configDir, useResDir=resDir, logFileName="logToBuffer")
-                    b.runKwargs(file= url[1], logFile= 'logToBuffer', validate=True, imports= inputRes['inputFile'], rssDBFormulaRemoveDups=True)
-                    outputRes[(url[0], formulaId)] = extractFormulaOutput(b.modelManager.modelXbrl, formulaId=formulaId, filingId=url[0], 
-                                                                            inlineXbrl=url[2] if url[2] else 0)
-                    b.modelManager.close()
-                except Exception as e:
-                    errors['formulaProcessing'].append((_k, e))
-                    cntlr.addToLog(_('Processing formulaId "{}" with filingId "{}" caused error:\n {}').format(_k[1], _k[0], str(e)), 
-                                        messageCode="arellepy.Info",  level=logging.INFO)
-    
-            if saveResultsToFolder:
-                if folderPath:
-                    if not os.path.isdir(folderPath):
-                        os.mkdir(folderPath)
-
-                    k = _k
-                    src = outputRes[_k]
-                    try:
-                        fileName = 'rssDBFormula_'
-                        fileName += 'formulaId_{}_'.format(str(src.get('formulaId',False))) if src.get('formulaId',False) else ''
-                        fileName += 'filingId_{}_'.format(str(src.get('filingId',False))).replace('.','_') if src.get('filingId',False) else '' 
-                        fileName += 'on_{}.xml'.format(datetime.datetime.now().strftime("%Y%m%d%H%M"))
-                        filePath = os.path.join(folderPath, fileName)
-                        cntlr.addToLog(_('Saving formula output for filing {} to {}').format(k[0], filePath), messageCode="arellepy.Info", 
-                                         level=logging.INFO)
-                        fHandle = xmlFileFromString(src['formulaOutput'], temp=False, filepath=filePath)
-                        fHandle.seek(0)
-                        fHandle.close()
-                    except Exception as e:
-                        errors['saveFiles'].append(e)
-                        cntlr.addToLog(_('Error saving formula output for filingId {}, formulaId {}: {}').format(k[0], k[1], str(e)), 
-                                            messageCode="arellepy.Error",  level=logging.ERROR)
+                formulaRuns = iterFormulaRuns(cntlr, urlsDict, urlsToProcess, inputRes, **runKwargs)
+
+            for _k, _res in formulaRuns:
+                url = urlsDict[_k]
+                countFilings += 1
+                if _res.get('errors', False):
+                    errors['formulaProcessing'].append((_k, _res.get('errors', False)))
+                    cntlr.addToLog(_('Processing formulaId "{}" with filingId "{}" caused error:\n {}').format(_k[1], _k[0],_res.get('errors', '')), 
+                                        messageCode="arellepy.Error", file=url[0], level=logging.ERROR)
+
+                if saveResultsToFolder:
+                    _nErrors = len(errors['saveFiles'])
+                    saveFormulaOutputToFolder(cntlr, _res, folderPath, errors, compress=compress)
+                    journalFormulaResults(journal, runId, [_res], ok=len(errors['saveFiles']) == _nErrors, message='saving to file failed')
                 else:
-                    errors['saveFiles'].append('No folderPath given')
-                    cntlr.addToLog(_('folderPath must be a valid path to a dir to save formulae output to files'), messageCode="arellepy.Error",  level=logging.ERROR)
+                    journalFormulaResults(journal, runId, [_res])
 
-    finalRes = {'output':outputRes, 'input': inputRes, 'errors':errors}
+                yield _res
+                _res = None
+        finally:
+            journal.close()
 
     endTime = time.perf_counter()
     allTime = str(round(endTime - startTime, 3)) + ' sec(s)'
-    countFilings = 'on ' + str(len(outputRes)) + ' filings' if len(outputRes) else ''
+    countFilings = 'on ' + str(countFilings) + ' filings' if countFilings else ''
     countErrors = sum([len(x) for x in errors.values()])           
-    cntlr.addToLog(_('Finished runing formula {} in {} with {} errors').format(countFilings, allTime, countErrors), messageCode="arellepy.Info", 
+    cntlr.addToLog(_('Finished runing formula {} in {} with {} errors, run id {}').format(countFilings, allTime, countErrors, runInfo.get('runId')), 
+                     messageCode="arellepy.Info", 
                      level=logging.INFO)            
 
-    return finalRes
+def runFormula(cntlr, instancesUrls, formulaString=None, formulaSourceFile=None, formulaId=None, writeFormulaToSourceFile=False, 
+               saveResultsToFolder=False, folderPath=None, workers=None, maxFilingsPerWorker=None, maxWorkerMemory=None, 
+               reuseCompiledFormula=None, compress=None, resumeRunId=None, journalPath=None, useCache=False, cacheDir=None, 
+               cacheMaxSize=1024, filingTimeout=None, maxWorkerAddressSpace=None, maxFilingCpuTime=None, removeInputDuplicates=False):
+    '''Runs formula from string or file on list of instances urls or rssItems WITHOUT depending on DB
+
+    `instancesUrls` ideally a list of XBRL (.xml) documents, if inlineXBRL is in the list, tries to guess the url of the extracted XBRL instance and use it.
+
+    At least one of `formulaString` or formulaSourceFile (valid formula linkbase) must be entered, if both are entered and `writeFormulaToSourceFile`
+    is `True`, the `formulaString` will be written back to the `formulaSourceFile` and if `writeFormulaToSourceFile` is False the `formulaString` will 
+    be used and `formulaSourceFile` ignored but reported as name of formula file, if only `formulaString` is entered then the formula will be saved to 
+    a temp file, and will disappear on exit unless the result is inserted into rssDB. formulaId can be whatever identifier given to this formula, it will
+    be used for file name if `saveResultsToFolder` is chosen.
+    
+    Formula output can be saved to files if `saveResultsToFolder` is set to True, but a valid path to a folder to save the files to must be set by `folderPath`.
+
+    `workers` is the number of instances processed concurrently (linux only), each worker subprocess is replaced by a new one after
+    `maxFilingsPerWorker` instances (1 is a new subprocess for each instance, 0 for no limit) or when its memory exceeds
+    `maxWorkerMemory` MB. Worker settings left None are taken from arellepyRunFormula command line options if given or default to one
+    instance at a time (see `formulaPoolSettings`).
+    `reuseCompiledFormula` parses formula XPath expressions once per worker instead of once per instance (the formula linkbase is
+    still loaded with each instance), workers then process up to `REUSE_COMPILED_FILINGS_PER_WORKER` instances unless `maxFilingsPerWorker`
+    is given (see `iterFormulaRuns`).
+    A worker processing an instance for more than `filingTimeout` seconds or using more than `maxFilingCpuTime` CPU seconds for an instance
+    is killed and replaced, `maxWorkerAddressSpace` limits the address space of each worker in MB (linux only), instances being processed
+    by a killed worker get an error result and are quarantined (listed in returned dict key "quarantined") and the batch goes on.
+
+    If `compress` is a codec ('zlib' or 'zstd'), 'formulaOutput' and 'processingLog' of returned results and saved files are compressed, 
+    use `decompressFormulaResult` and `HelperFuncs.readTextFile` to read them.
+
+    If `removeInputDuplicates` is True, consistent duplicate facts are removed from each instance before formula is evaluated keeping only
+    the most precise fact of each duplicate set (inconsistent duplicates are kept), so formulas bind fewer facts, this is different from
+    removing duplicates from formula output which is always done. Requires arellepy plugin to be enabled in arelle.
+
+    Each instance processed is recorded in a run journal (sqlite file `journalPath`, defaults to "arellepyFormulaRuns.db" in cntlr user app dir)
+    as soon as it is done, if the run does not finish it can be run again with the same arguments and `resumeRunId` set to the run id of the 
+    unfinished run to skip instances already processed successfully (results of skipped instances are not returned).
+
+    If `useCache` is True, results are stored in a result cache in `cacheDir` (defaults to "arellepyFormulaCache" in cntlr user app dir)
+    limited to `cacheMaxSize` MB (least recently used results are removed), a result is reused without loading the instance when the same
+    formula is run on the same instance (same content for local files, same url otherwise) with the same arelle version and plugins.
+
+    Results are kept in memory until all instances are processed, use `iterFormulaResults` to get results as they are done.
+
+    Returns a dict containing formula outputs, formula information, errors, quarantined instances, run id.
+    '''
+    runInfo = dict()
+    outputRes = dict()
+    for _res in iterFormulaResults(cntlr, instancesUrls, formulaString=formulaString, formulaSourceFile=formulaSourceFile, formulaId=formulaId, 
+                                   writeFormulaToSourceFile=writeFormulaToSourceFile, saveResultsToFolder=saveResultsToFolder, folderPath=folderPath, 
+                                   workers=workers, maxFilingsPerWorker=maxFilingsPerWorker, maxWorkerMemory=maxWorkerMemory, 
+                                   reuseCompiledFormula=reuseCompiledFormula, compress=compress, resumeRunId=resumeRunId, 
+                                   journalPath=journalPath, useCache=useCache, cacheDir=cacheDir, cacheMaxSize=cacheMaxSize, 
+                                   filingTimeout=filingTimeout, maxWorkerAddressSpace=maxWorkerAddressSpace, maxFilingCpuTime=maxFilingCpuTime, 
+                                   removeInputDuplicates=removeInputDuplicates, runInfo=runInfo):
+        outputRes[(_res['filingId'], _res['formulaId'])] = _res
+
+    if not runInfo:
+        return
+    return {'output':outputRes, 'input': runInfo['input'], 'errors':runInfo['errors'], 'quarantined': runInfo['quarantined'], 
+            'runId': runInfo.get('runId')}
@@ -0,0 +1,198 @@
+""" :mod: `Downloader`
+Streaming downloads through the arelle web cache
+
+Downloads are made over kept-alive connections (one per host per thread) and streamed in chunks to a temp file that is
+moved into place when complete, so a file is either complete or not there. Files are downloaded into the arelle web cache
+(same location `webCache.getfilename` uses) and later requests for the same url are served from the cache without any
+network access, a copy can be placed in another folder (such as a report folder).
+"""
+
+import os, shutil, tempfile, threading, http.client
+from urllib import parse, request
+
+_retryErrors = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionError, BrokenPipeError)
+
+
+class DownloadError(Exception):
+    '''Raised when a url can not be downloaded, `status` is the http status if a response was received'''
+    def __init__(self, url, message, status=None):
+        super().__init__('Could not download {}: {}'.format(url, message))
+        self.url = url
+        self.status = status
+
+
+class Downloader:
+    '''Downloads urls into the arelle web cache of `webCache` (or `cacheDir` if no webCache) over pooled connections
+
+    args:
+        webCache -- arelle `WebCache` (cntlr.webCache), gives cache location, user agent and offline mode
+        cacheDir -- cache folder used when there is no webCache
+        userAgent -- http user agent, defaults to webCache user agent (SEC requires a user agent identifying the requester)
+        timeout -- connection timeout in seconds
+        chunkSize -- bytes read and written at a time
+
+    usage:
+        downloader = Downloader(cntlr.webCache)
+        localPath = downloader.download('https://www.sec.gov/.../doc.htm', destPath='/path/to/reportFolder/doc.htm')
+    '''
+    maxRedirects = 5
+
+    def __init__(self, webCache=None, cacheDir=None, userAgent=None, timeout=60, chunkSize=1024*1024):
+        self.webCache = webCache
+        self.cacheDir = cacheDir if cacheDir else getattr(webCache, 'cacheDir', None)
+        self.userAgent = userAgent or getattr(webCache, 'httpUserAgent', None) or 'arellepy'
+        self.timeout = timeout
+        self.chunkSize = chunkSize
+        self._local = threading.local()
+
+    def _connections(self):
+        conns = getattr(self._local, 'conns', None)
+        # connections inherited from a parent process (fork) are not used
+        if conns is None or self._local.pid != os.getpid():
+            conns = self._local.conns = dict()
+            self._local.pid = os.getpid()
+        return conns
+
+    def _connection(self, scheme, netloc, renew=False):
+        conns = self._connections()
+        conn = conns.get((scheme, netloc))
+        if conn is not None and renew:
+            conn.close()
+            conn = None
+        if conn is None:
+            connClass = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            conn = conns[(scheme, netloc)] = connClass(netloc, timeout=self.timeout)
+        return conn
+
+    def _request(self, method, url):
+        '''Returns (response, final url) following redirects, connection is retried once if the server closed it'''
+        for _ in range(self.maxRedirects + 1):
+            parts = parse.urlsplit(url)
+            path = parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+            headers = {'User-Agent': self.userAgent, 'Accept-Encoding': 'identity', 'Connection': 'keep-alive'}
+            for attempt in (0, 1):
+                conn = self._connection(parts.scheme, parts.netloc, renew=attempt > 0)
+                try:
+                    conn.request(method, path, headers=headers)
+                    resp = conn.getresponse()
+                    break
+                except _retryErrors:
+                    if attempt:
+                        raise
+            if resp.status in (301, 302, 303, 307, 308) and resp.getheader('Location'):
+                resp.read()
+                url = parse.urljoin(url, resp.getheader('Location'))
+                continue
+            return resp, url
+        raise DownloadError(url, 'too many redirects')
+
+    def _useUrllib(self, url):
+        '''True if url should be fetched by the web cache (proxy configured or not http)'''
+        scheme = parse.urlsplit(url).scheme
+        return scheme not in ('http', 'https') or scheme in request.getproxies()
+
+    def cachePath(self, url):
+        '''Returns path of `url` in the web cache'''
+        if self.webCache is not None and hasattr(self.webCache, 'urlToCacheFilepath'):
+            return self.webCache.urlToCacheFilepath(url)
+        if not self.cacheDir:
+            raise DownloadError(url, 'no web cache or cache folder')
+        parts = parse.urlsplit(url)
+        return os.path.join(self.cacheDir, parts.scheme, parts.netloc, *[x for x in parts.path.split('/') if x])
+
+    def exists(self, url):
+        '''True if `url` is in the cache or the server responds with status 200 to a HEAD request'''
+        if os.path.isfile(self.cachePath(url)):
+            return True
+        if getattr(self.webCache, 'workOffline', False):
+            return False
+        if self._useUrllib(url):
+            try:
+                return request.urlopen(request.Request(url, method='HEAD', headers={'User-Agent': self.userAgent}), timeout=self.timeout).status == 200
+            except Exception:
+                return False
+        try:
+            resp, _url = self._request('HEAD', url)
+            resp.read()
+        except (DownloadError, OSError, http.client.HTTPException):
+            return False
+        return resp.status == 200
+
+    def download(self, url, destPath=None, reload=False):
+        '''Returns local path of `url` downloaded into the web cache (unless already there and not `reload`), if `destPath` is given
+        the file is also copied there and `destPath` is returned. Raises `DownloadError` if it can not be downloaded.
+        '''
+        cachePath = self.cachePath(url)
+        if reload or not os.path.isfile(cachePath):
+            if getattr(self.webCache, 'workOffline', False):
+                raise DownloadError(url, 'not in web cache and working offline')
+            if self._useUrllib(url) and self.webCache is not None:
+                cachePath = self.webCache.getfilename(url, reload=reload)
+                if not cachePath or not os.path.isfile(cachePath):
+                    raise DownloadError(url, 'web cache could not get file')
+            else:
+                self._stream(url, cachePath)
+        if destPath:
+            _atomicCopy(cachePath, destPath)
+            return destPath
+        return cachePath
+
+    def _stream(self, url, filePath):
+        try:
+            resp, _url = self._request('GET', url)
+        except (OSError, http.client.HTTPException) as e:
+            raise DownloadError(url, str(e))
+        if resp.status != 200:
+            resp.read()
+            raise DownloadError(url, 'http status {} {}'.format(resp.status, resp.reason), status=resp.status)
+        dirPath = os.path.dirname(filePath)
+        os.makedirs(dirPath, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=dirPath, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: resp.read(self.chunkSize), b''):
+                    f.write(chunk)
+            length = resp.getheader('Content-Length')
+            if length and os.path.getsize(tmpPath) != int(length):
+                raise DownloadError(url, 'incomplete download')
+            os.replace(tmpPath, filePath)
+        except (OSError, http.client.HTTPException) as e:
+            # connection is in unknown state, next request opens a new one
+            self._connection(*parse.urlsplit(url)[:2], renew=True)
+            raise DownloadError(url, str(e))
+        finally:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+
+    def close(self):
+        '''Closes connections opened by the calling thread'''
+        for conn in self._connections().values():
+            conn.close()
+        self._connections().clear()
+
+
+def _atomicCopy(srcPath, destPath):
+    dirPath = os.path.dirname(destPath)
+    if dirPath:
+        os.makedirs(dirPath, exist_ok=True)
+    fd, tmpPath = tempfile.mkstemp(dir=dirPath or None, suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copyfile(srcPath, tmpPath)
+        os.replace(tmpPath, destPath)
+    finally:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+
+_sharedDownloaders = dict()
+_sharedLock = threading.Lock()
+
+def sharedDownloader(cntlr=None):
+    '''Returns the downloader of this process for the web cache of `cntlr` (connections are shared by all its callers)'''
+    webCache = getattr(cntlr, 'webCache', None)
+    key = getattr(webCache, 'cacheDir', None)
+    with _sharedLock:
+        downloader = _sharedDownloaders.get(key)
+        if downloader is None:
+            downloader = _sharedDownloaders[key] = Downloader(webCache)
+        return downloader
@@ -0,0 +1,124 @@
+""" :mod: `DuplicateFactsEngine`
+Batched analysis of duplicate facts sets
+
+Attributes needed to analyze duplicate facts sets (precision, decimals, value) are extracted once for all facts in all
+sets, ordering of sets (most precise first) and consistency of rounding intervals (max lower bound vs min upper bound)
+are then computed for all sets together, with NumPy grouped array operations if NumPy is installed. Sets that can not
+be decided exactly with float arithmetic (values not exactly representable as float, NaN values or decimals, bounds
+too close to call) are checked one by one with the exact check, so results are the same as checking each set alone.
+"""
+
+from decimal import Decimal
+from math import isnan, isinf
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# relative margin between bounds under which float result is not trusted
+NEAR_TIE_EPSILON = 1e-9
+
+
+def _floatExact(v):
+    '''Returns float value of `v` if it is a finite number exactly representable as float, None otherwise'''
+    if type(v) not in (int, float, Decimal):
+        return None
+    try:
+        f = float(v)
+    except (ValueError, OverflowError):
+        return None
+    if isnan(f) or isinf(f) or f != v:
+        return None
+    return f
+
+def orderDuplicateGroups(groups):
+    '''Returns list of facts lists from `groups` (lists of duplicate facts) each sorted most precise first, numeric sets are
+    sorted by inferred precision (descending, stable) and others by objectIndex, same as sorting each set with python sort.'''
+    from arelle.ValidateXbrlCalcs import inferredPrecision
+    allNumeric = [all(f.isNumeric for f in dups) for dups in groups]
+    keys = [[inferredPrecision(f) for f in dups] if isNum else [f.objectIndex for f in dups]
+            for dups, isNum in zip(groups, allNumeric)]
+    if numpy is None:
+        ordered = []
+        for dups, k, isNum in zip(groups, keys, allNumeric):
+            pos = sorted(range(len(dups)), key=lambda i: k[i], reverse=isNum)
+            ordered.append([dups[i] for i in pos])
+        return ordered
+    sizes = numpy.fromiter((len(x) for x in groups), dtype=numpy.int64, count=len(groups))
+    gids = numpy.repeat(numpy.arange(len(groups)), sizes)
+    positions = numpy.arange(int(sizes.sum())) - numpy.repeat(numpy.cumsum(sizes) - sizes, sizes)
+    flatKeys = numpy.array([float(x) for k in keys for x in k], dtype=numpy.float64)
+    sign = numpy.repeat(numpy.where(allNumeric, -1.0, 1.0), sizes)
+    # stable sort: python reverse sort keeps original order of equal keys, so does lexsort with position as last key
+    order = numpy.lexsort((positions, flatKeys * sign, gids))
+    ordered = []
+    start = 0
+    flatFacts = [f for dups in groups for f in dups]
+    for g, size in enumerate(sizes.tolist()):
+        if allNumeric[g] and any(isnan(x) for x in keys[g]):
+            # order of python sort with nan keys depends on positions of nans, sort this set the python way
+            pos = sorted(range(size), key=lambda i: keys[g][i], reverse=True)
+            ordered.append([groups[g][i] for i in pos])
+        else:
+            ordered.append([flatFacts[i] for i in order[start:start + size].tolist()])
+        start += size
+    return ordered
+
+def inconsistentDuplicateGroups(orderedGroups, exactCheck):
+    '''Returns list of bools, True for inconsistent duplicate facts sets in `orderedGroups` (most precise first), `exactCheck`
+    is function(facts list) used for sets that can not be decided with float arithmetic or when NumPy is not installed.'''
+    from arelle.ValidateXbrlCalcs import inferredDecimals
+    result = [None] * len(orderedGroups)
+    vecGroups = [] # (group index, values, decimals)
+    for g, dups in enumerate(orderedGroups):
+        f0 = dups[0]
+        if not f0.concept.isNumeric:
+            result[g] = any(not f.isVEqualTo(f0) for f in dups[1:])
+            continue
+        nils = [f.isNil for f in dups]
+        if any(nils):
+            result[g] = not all(nils)
+            continue
+        if numpy is None:
+            result[g] = exactCheck(dups)
+            continue
+        vals = [_floatExact(f.xValue) for f in dups]
+        decs = [inferredDecimals(f) for f in dups]
+        if any(v is None for v in vals) or any(type(d) not in (int, float) or isnan(d) for d in decs):
+            result[g] = exactCheck(dups)
+            continue
+        vecGroups.append((g, vals, decs))
+
+    if vecGroups:
+        sizes = numpy.array([len(x[1]) for x in vecGroups], dtype=numpy.int64)
+        starts = numpy.cumsum(sizes) - sizes
+        gids = numpy.repeat(numpy.arange(len(vecGroups)), sizes)
+        vals = numpy.array([v for x in vecGroups for v in x[1]], dtype=numpy.float64)
+        decs = numpy.array([float(d) for x in vecGroups for d in x[2]], dtype=numpy.float64)
+        with numpy.errstate(over='ignore', invalid='ignore'):
+            half = numpy.where(numpy.isinf(decs), 0.0, 0.5 * numpy.power(10.0, -numpy.where(numpy.isinf(decs), 0.0, decs)))
+        lo = vals - half
+        hi = vals + half
+        aMax = numpy.maximum.reduceat(lo, starts)
+        bMin = numpy.minimum.reduceat(hi, starts)
+        # facts with same decimals must have same value
+        order = numpy.lexsort((vals, decs, gids))
+        sameDec = (gids[order][1:] == gids[order][:-1]) & (decs[order][1:] == decs[order][:-1])
+        diffVal = sameDec & (vals[order][1:] != vals[order][:-1])
+        sameDecDiffVal = numpy.zeros(len(vecGroups), dtype=bool)
+        sameDecDiffVal[gids[order][1:][diffVal]] = True
+        scale = numpy.maximum(numpy.maximum(numpy.abs(aMax), numpy.abs(bMin)), numpy.maximum.reduceat(half, starts))
+        nearTie = numpy.abs(bMin - aMax) <= NEAR_TIE_EPSILON * numpy.maximum(scale, 1.0)
+        inconsistent = sameDecDiffVal | (bMin < aMax)
+        for i, (g, _v, _d) in enumerate(vecGroups):
+            if not sameDecDiffVal[i] and (nearTie[i] or not numpy.isfinite(half[starts[i]:starts[i] + sizes[i]]).all()):
+                result[g] = exactCheck(orderedGroups[g])
+            else:
+                result[g] = bool(inconsistent[i])
+    return result
+
+def analyzeDuplicateGroups(groups, exactCheck):
+    '''Returns list of (facts sorted most precise first, is inconsistent) for each list of duplicate facts in `groups`'''
+    ordered = orderDuplicateGroups(groups)
+    return list(zip(ordered, inconsistentDuplicateGroups(ordered, exactCheck)))
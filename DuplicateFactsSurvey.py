@@ -0,0 +1,230 @@
+""" :mod: `DuplicateFactsSurvey`
+Duplicate facts survey across many filings
+
+Loads filings in a pool of worker processes, detects duplicate facts in each one and writes one row per duplicate
+facts set to a columnar file (Parquet or Arrow IPC if pyarrow is installed, csv otherwise) as results come in, so the
+survey can be queried with any columnar tool without loading filings again.
+"""
+
+import os, sys, csv, time, logging, warnings, importlib
+from math import isnan, isinf
+
+try:
+    from .WorkerPool import WorkerPool
+    from .HelperFuncs import CntlrPyWarning
+except:
+    from WorkerPool import WorkerPool
+    from HelperFuncs import CntlrPyWarning
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+SURVEY_COLUMNS = (('filingId', 'string'), ('entryPoint', 'string'), ('concept', 'string'), ('dupSetHash', 'int64'),
+                  ('contextRef', 'string'), ('unitRef', 'string'), ('factsCount', 'int64'), ('isConsistent', 'bool'),
+                  ('isNumeric', 'bool'), ('minDecimals', 'float64'), ('maxDecimals', 'float64'), ('precisionSpread', 'float64'))
+
+_fileFormats = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow', '.csv': 'csv'}
+
+
+class DuplicateFactsSurveyWriter:
+    '''Writes survey rows (dicts with `SURVEY_COLUMNS` keys) to `path` in batches of `batchSize` rows.
+
+    `fileFormat` is 'parquet', 'arrow' (Arrow IPC file) or 'csv', guessed from `path` extension if None, parquet and arrow
+    require pyarrow, csv is used instead if pyarrow is not installed (".csv" is appended to `path`).
+    '''
+    def __init__(self, path, fileFormat=None, batchSize=10000):
+        if fileFormat is None:
+            fileFormat = _fileFormats.get(os.path.splitext(path)[1].lower(), 'parquet')
+        if fileFormat not in ('parquet', 'arrow', 'csv'):
+            raise Exception('Unknown survey file format "{}", should be one of parquet, arrow, csv'.format(fileFormat))
+        if fileFormat != 'csv' and pyarrow is None:
+            warnings.warn('pyarrow package is not installed, writing survey to csv instead of {}'.format(fileFormat), CntlrPyWarning)
+            fileFormat = 'csv'
+            path += '.csv'
+        self.path = path
+        self.fileFormat = fileFormat
+        self.batchSize = batchSize
+        self.rows = []
+        self.rowsCount = 0
+        self._writer = None
+        self._fd = None
+        if fileFormat == 'csv':
+            self._fd = open(path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.DictWriter(self._fd, fieldnames=[x[0] for x in SURVEY_COLUMNS])
+            self._writer.writeheader()
+        else:
+            self.schema = pyarrow.schema([(name, getattr(pyarrow, typ)()) for name, typ in SURVEY_COLUMNS])
+            if fileFormat == 'parquet':
+                import pyarrow.parquet
+                self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+            else:
+                import pyarrow.ipc
+                self._writer = pyarrow.ipc.new_file(path, self.schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batchSize:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.fileFormat == 'csv':
+            self._writer.writerows(self.rows)
+        else:
+            batch = pyarrow.RecordBatch.from_pylist(self.rows, schema=self.schema)
+            if self.fileFormat == 'parquet':
+                self._writer.write_table(pyarrow.Table.from_batches([batch]))
+            else:
+                self._writer.write_batch(batch)
+        self.rowsCount += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        if self._writer is None:
+            return
+        self.flush()
+        if self.fileFormat == 'csv':
+            self._fd.close()
+        else:
+            self._writer.close()
+        self._writer = None
+
+
+def duplicateFactsSurveyRows(modelXbrl, filingId, entryPoint):
+    '''Returns survey rows (one dict per duplicate facts set) for a loaded `modelXbrl`'''
+    from arelle.ValidateXbrlCalcs import inferredDecimals
+    info = modelXbrl.duplicateFactsInfo
+    rows = []
+    if info is None:
+        return rows
+    modelObjects = modelXbrl.modelObjects
+    for dupSetHash, isInconsistent, indexes in info.iterDupSets():
+        facts = [modelObjects[i] for i in indexes]
+        f0 = facts[0]
+        isNumeric = bool(f0.isNumeric)
+        decimals = [float(inferredDecimals(f)) for f in facts] if isNumeric else []
+        decimals = [d for d in decimals if not isnan(d)]
+        # INF decimals (exact values) have no spread with other decimals
+        finiteDecimals = [d for d in decimals if not isinf(d)]
+        rows.append({'filingId': str(filingId),
+                     'entryPoint': entryPoint,
+                     'concept': str(f0.qname),
+                     'dupSetHash': dupSetHash,
+                     'contextRef': f0.contextID,
+                     'unitRef': f0.unitID,
+                     'factsCount': len(facts),
+                     'isConsistent': not isInconsistent,
+                     'isNumeric': isNumeric,
+                     'minDecimals': min(decimals) if decimals else None,
+                     'maxDecimals': max(decimals) if decimals else None,
+                     'precisionSpread': max(finiteDecimals) - min(finiteDecimals) if finiteDecimals else None})
+    return rows
+
+def initSurveyWorker(configDir, resDir):
+    '''Creates the cntlr used by a survey worker process for all filings it processes'''
+    try:
+        from .CntlrPy import CntlrPy
+        from . import installDuplicateFactsProperties
+    except:
+        from CntlrPy import CntlrPy
+        # plugin package as loaded by arelle plugin manager (named after its folder)
+        installDuplicateFactsProperties = importlib.import_module(os.path.basename(os.path.dirname(os.path.abspath(__file__)))).installDuplicateFactsProperties
+    installDuplicateFactsProperties()
+    return CntlrPy(instConfigDir=configDir, useResDir=resDir, logFileName="logToBuffer")
+
+def surveyWorkerTask(b, taskArgs, inSubProcess=True):
+    '''Loads one filing with cntlr `b` and returns its survey rows'''
+    filingId, entryPoint = taskArgs
+    clearLogBuffer = getattr(b.logHandler, 'clearLogBuffer', None)
+    if clearLogBuffer:
+        clearLogBuffer()
+    runArgs = dict(file=entryPoint, logFile='logToBuffer')
+    if inSubProcess:
+        runArgs['plugins'] = '-Edgar Renderer'
+    try:
+        b.runKwargs(**runArgs)
+        modelXbrl = b.modelManager.modelXbrl
+        if modelXbrl is None or 'FileNotLoadable' in modelXbrl.errors:
+            return {'rows': [], 'error': 'Could not load {}'.format(entryPoint)}
+        return {'rows': duplicateFactsSurveyRows(modelXbrl, filingId, entryPoint), 'error': None}
+    finally:
+        b.modelManager.close()
+
+def closeSurveyWorker(b):
+    b.modelManager.close()
+    b.close()
+
+def surveyWorkerError(key, taskArgs, msg):
+    return {'rows': [], 'error': msg}
+
+def surveyDuplicateFacts(cntlr, entryPoints, outputPath, fileFormat=None, workers=None, maxFilingsPerWorker=None,
+                         maxWorkerMemory=None, filingTimeout=None):
+    '''Detects duplicate facts in many filings and writes one row per duplicate facts set to `outputPath`.
+
+    `entryPoints` is a list of entry points urls/paths or rssItems, filings are loaded by up to `workers` worker processes
+    (defaults to number of CPUs, linux only, one at a time in this process on other platforms) each using one cntlr for
+    up to `maxFilingsPerWorker` filings or until it exceeds `maxWorkerMemory` MB, a worker spending more than `filingTimeout`
+    seconds on a filing is killed. Rows are written as filings are done (see `DuplicateFactsSurveyWriter` for `fileFormat`),
+    columns are `SURVEY_COLUMNS`.
+
+    Returns a dict with output path, file format, number of filings, number of rows and errors by filingId.
+    '''
+    startTime = time.perf_counter()
+    configDir = cntlr.userAppDir
+    resDir = os.path.dirname(cntlr.configDir)
+    # tasks are keyed by position, the same entry point may be listed more than once
+    tasks = []
+    labels = []
+    for i, x in enumerate(entryPoints):
+        if type(x).__name__ == 'ModelRssItem':
+            f_id = int(x.filingId) if hasattr(x, 'filingId') else int(x.find('filingId').text)
+            tasks.append((i, (f_id, x.url)))
+            labels.append(f_id)
+        else:
+            tasks.append((i, (os.path.basename(x), x)))
+            labels.append(x)
+    errors = dict()
+    nFilings = 0
+    workers = workers if workers else (os.cpu_count() or 1)
+
+    if sys.platform.lower().startswith('lin'):
+        pool = WorkerPool(workers, surveyWorkerTask, initFunc=initSurveyWorker, initArgs=(configDir, resDir), closeFunc=closeSurveyWorker,
+                          maxTasksPerWorker=maxFilingsPerWorker, maxWorkerMemory=maxWorkerMemory, errorFunc=surveyWorkerError,
+                          taskTimeout=filingTimeout)
+        results = pool.imap(tasks)
+    else:
+        def _results():
+            b = initSurveyWorker(configDir, resDir)
+            try:
+                for key, taskArgs in tasks:
+                    try:
+                        yield key, surveyWorkerTask(b, taskArgs, inSubProcess=False)
+                    except Exception as e:
+                        yield key, surveyWorkerError(key, taskArgs, str(e))
+            finally:
+                closeSurveyWorker(b)
+        results = _results()
+
+    with DuplicateFactsSurveyWriter(outputPath, fileFormat=fileFormat) as writer:
+        for key, res in results:
+            nFilings += 1
+            if res['error']:
+                errors[labels[key]] = res['error']
+                cntlr.addToLog(_('Duplicate facts survey of {} failed:\n{}').format(labels[key], res['error']), messageCode="arellepy.Error",
+                                file=str(labels[key]), level=logging.ERROR)
+            writer.add(res['rows'])
+            cntlr.showStatus(_('Duplicate facts survey: {} of {} filings done').format(nFilings, len(tasks)))
+
+    allTime = str(round(time.perf_counter() - startTime, 3)) + ' sec(s)'
+    cntlr.addToLog(_('Finished duplicate facts survey on {} filings in {} with {} errors, {} duplicate sets written to {}').format(
+                        nFilings, allTime, len(errors), writer.rowsCount, writer.path), messageCode="arellepy.Info", file=writer.path, level=logging.INFO)
+    return {'outputPath': writer.path, 'fileFormat': writer.fileFormat, 'filings': nFilings, 'rows': writer.rowsCount, 'errors': errors}
@@ -0,0 +1,201 @@
+""" :mod: `FormulaResultCache`
+On disk cache of formula results
+
+Formula results (as returned by `CntlrPy.extractFormulaOutput`) are stored in files named by a hash of everything
+that determines the result: the instance, the formula linkbase and the files imported with it (for local files the
+content of the file and of every local document it references such as extension schemas and linkbases, urls for
+documents that are not local such as published taxonomies), arelle version and the set of plugins in use, so a result
+is reused only if the same formula is run again on the same instance with the same arelle setup. Cache size is bounded,
+least recently used entries are removed first.
+"""
+
+import os, hashlib, json, pickle, tempfile
+from urllib.parse import urlsplit, unquote
+from lxml import etree
+
+# elements referencing other documents of a DTS and the attribute holding the reference
+REFERENCE_ELEMENTS = {'{http://www.xbrl.org/2003/linkbase}schemaRef': '{http://www.w3.org/1999/xlink}href',
+                      '{http://www.xbrl.org/2003/linkbase}linkbaseRef': '{http://www.w3.org/1999/xlink}href',
+                      '{http://www.xbrl.org/2003/linkbase}loc': '{http://www.w3.org/1999/xlink}href',
+                      '{http://www.w3.org/2001/XMLSchema}import': 'schemaLocation',
+                      '{http://www.w3.org/2001/XMLSchema}include': 'schemaLocation',
+                      '{http://www.w3.org/2001/XInclude}include': 'href'}
+XSI_SCHEMA_LOCATION = '{http://www.w3.org/2001/XMLSchema-instance}schemaLocation'
+
+
+def fileContentHash(filePath, chunkSize=1024*1024):
+    '''Returns sha256 hex digest of content of `filePath`'''
+    h = hashlib.sha256()
+    with open(filePath, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(chunkSize), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def textHash(text):
+    '''Returns sha256 hex digest of `text` (str or bytes)'''
+    return hashlib.sha256(text if type(text) is bytes else bytes(str(text), encoding='utf-8')).hexdigest()
+
+def referencedDocuments(filePath):
+    '''Returns set of documents referenced by xml document `filePath` (schemaRef, linkbaseRef, loc, xs:import, xs:include,
+    xi:include and xsi:schemaLocation), relative references are resolved to local paths against `filePath`, other references
+    are returned as urls. Returns an empty set if `filePath` is not xml (such as a zip file).
+    '''
+    refs = set()
+    try:
+        for event, el in etree.iterparse(filePath, events=('start',), huge_tree=True):
+            attr = REFERENCE_ELEMENTS.get(el.tag)
+            if attr and el.get(attr):
+                refs.add(el.get(attr))
+            if el.get(XSI_SCHEMA_LOCATION):
+                refs.update(el.get(XSI_SCHEMA_LOCATION).split()[1::2])
+    except (etree.XMLSyntaxError, ValueError):
+        pass
+    docs = set()
+    for ref in refs:
+        parts = urlsplit(ref.strip())
+        if parts.scheme in ('', 'file') and not parts.netloc:
+            docs.add(os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(filePath)), unquote(parts.path))))
+        elif len(parts.scheme) == 1: # windows drive letter
+            docs.add(os.path.normpath(ref.split('#')[0]))
+        else:
+            docs.add(ref.split('#')[0])
+    return docs
+
+def documentSetKey(filePath):
+    '''Returns sorted list of (document, content hash) for local document `filePath` and the local documents it references
+    directly or indirectly (see `referencedDocuments`), `filePath` itself is named "" and other local documents are named
+    relative to its folder so the key does not change if the files are moved or the root is a temp file, documents that are
+    not local files are listed with hash "url", missing local files with hash "missing".
+    '''
+    rootPath = os.path.abspath(filePath)
+    rootDir = os.path.dirname(rootPath)
+    docs = dict()
+    pending = [rootPath]
+    while pending:
+        doc = pending.pop()
+        if doc in docs:
+            continue
+        if not os.path.isabs(doc):
+            docs[doc] = 'url'
+        elif not os.path.isfile(doc):
+            docs[doc] = 'missing'
+        else:
+            docs[doc] = fileContentHash(doc)
+            pending.extend(referencedDocuments(doc))
+    return sorted(('' if k == rootPath else os.path.relpath(k, rootDir) if os.path.isabs(k) else k, v) for k, v in docs.items())
+
+def arelleSetupInfo():
+    '''Returns (arelle version, sorted tuple of plugin names and versions) for the current process'''
+    try:
+        from arelle.Version import __version__ as arelleVersion
+    except Exception:
+        try:
+            from arelle.Version import version as arelleVersion
+        except Exception:
+            arelleVersion = ''
+    try:
+        from arelle import PluginManager
+        plugins = tuple(sorted((name, str(info.get('version', ''))) for name, info in PluginManager.pluginConfig.get('modules', {}).items()))
+    except Exception:
+        plugins = tuple()
+    return arelleVersion, plugins
+
+
+class FormulaResultCache:
+    '''Size bounded on disk cache of formula results
+
+    args:
+        cacheDir -- folder where results are stored, created if it does not exist
+        maxSize -- maximum size of cached results in MB, least recently used results are removed when exceeded
+
+    usage:
+        cache = FormulaResultCache('/path/to/cache')
+        key = cache.makeKey(instanceUrl, formulaLinkbase, imports=formulaFile)
+        res = cache.get(key)
+        if res is None:
+            res = ... # run formula
+            cache.put(key, res)
+    '''
+    suffix = '.formulaResult'
+
+    def __init__(self, cacheDir, maxSize=1024):
+        self.cacheDir = cacheDir
+        self.maxSizeBytes = int(maxSize * 1024 * 1024) if maxSize else None
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        self.setupInfo = arelleSetupInfo()
+        self.hits = 0
+        self.misses = 0
+        self.size = sum(e.stat().st_size for e in os.scandir(cacheDir) if e.name.endswith(self.suffix))
+        self._importsKeys = dict()
+
+    def importsKey(self, imports):
+        '''Returns `documentSetKey` of each file in `imports` ("|" separated), kept for the life of the cache as the same
+        formula files are used for every instance of a run'''
+        if imports not in self._importsKeys:
+            self._importsKeys[imports] = [documentSetKey(x) if os.path.isfile(x) else x for x in imports.split('|') if x]
+        return self._importsKeys[imports]
+
+    def makeKey(self, instanceUrl, formulaLinkbase, *extra, imports=None):
+        '''Returns cache key for running `formulaLinkbase` (string or bytes) on `instanceUrl`, `imports` are the files ("|" separated)
+        imported with the instance (the formula linkbase file and any additional imports), `extra` are other json serializable
+        values affecting the result (such as compression codec).
+
+        Local instance and imports are keyed by `documentSetKey` so editing any local document of their DTS changes the key,
+        instances that are urls are keyed by url.
+        '''
+        instanceKey = ('file', documentSetKey(instanceUrl)) if os.path.isfile(instanceUrl) else ('url', instanceUrl)
+        importsKey = self.importsKey(imports) if imports else []
+        return textHash(json.dumps([instanceKey, textHash(formulaLinkbase or ''), importsKey, self.setupInfo, extra], default=str))
+
+    def _path(self, key):
+        return os.path.join(self.cacheDir, key + self.suffix)
+
+    def get(self, key):
+        '''Returns cached result for `key` or None'''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fd:
+                res = pickle.load(fd)
+            os.utime(path) # keep track of use for LRU eviction
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return res
+
+    def put(self, key, result):
+        '''Stores `result` for `key`, written to a temp file first and moved into place'''
+        path = self._path(key)
+        fd, tmpPath = tempfile.mkstemp(dir=self.cacheDir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            oldSize = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmpPath, path)
+        except Exception:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+            raise
+        self.size += os.path.getsize(path) - oldSize
+        if self.maxSizeBytes and self.size > self.maxSizeBytes:
+            self.evict()
+
+    def evict(self, targetSize=None):
+        '''Removes least recently used results until cache size is under `targetSize` bytes (defaults to 90% of max size)'''
+        if targetSize is None:
+            targetSize = int(self.maxSizeBytes * 0.9) if self.maxSizeBytes else 0
+        entries = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(self.cacheDir) if e.name.endswith(self.suffix))
+        self.size = sum(x[1] for x in entries)
+        for mtime, size, path in entries:
+            if self.size <= targetSize:
+                break
+            try:
+                os.remove(path)
+                self.size -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        '''Removes all cached results'''
+        self.evict(targetSize=0)
@@ -2,11 +2,12 @@
 Utility helper functions
 """ 
 
-import sys, os, zipfile, warnings, re, json, tempfile
+import sys, os, zipfile, warnings, re, json, tempfile, zlib, gzip, base64
 from lxml import etree, html
-from urllib import request, parse
+from urllib import parse
 from datetime import datetime
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import time
 
 
@@ -98,7 +99,125 @@ def chkToList(funcInput, originType: type, chkFunc=None, conversionFunc=None, ra
                     warnings.warn(chkMsg)
     return result
 
-def makeLocator(lookInPaths, extractInst: bool = False, CreateUpdatelocatorPath: str = None):
+def _scanFolder(folder):
+    '''Returns (dict of file name: entry, list of (subfolder path, is symlink)) of `folder` not including hidden subfolders'''
+    files = dict()
+    subDirs = []
+    with os.scandir(folder) as it:
+        for e in it:
+            try:
+                if e.is_dir():
+                    if not e.name.startswith('.'):
+                        subDirs.append((e.path, e.is_symlink()))
+                else:
+                    files[e.name] = e
+            except OSError:
+                continue
+    return files, subDirs
+
+def _scanTree(top, descend=True):
+    '''Returns list of (folder, files entries) of report folders in `top` (including `top`), report folders are not descended
+    into, symlinked folders are checked but not descended into (as os.walk)'''
+    res = []
+    stack = [(top, descend)]
+    while stack:
+        folder, descend = stack.pop()
+        try:
+            files, subDirs = _scanFolder(folder)
+        except OSError:
+            continue
+        if 'FilingSummary.xml' in files and 'additionalMeta.json' in files:
+            res.append((folder, files))
+        elif descend:
+            stack.extend((d, not isLink) for d, isLink in subDirs)
+    return res
+
+def scanReportFolders(lookInPaths, threads: int = 8):
+    """Finds folders containing EdgarRenderer reports within given paths
+
+    Scans folders with `os.scandir` fanning out across the subfolders of each path in a pool
+    of threads (each subfolder tree is scanned in one thread), hidden folders and folders
+    within report folders are not scanned. A report folder is a folder containing both
+    `FilingSummary.xml` and `additionalMeta.json`.
+
+    Arguments:
+        lookInPaths {list} -- List of paths
+
+    Keyword Arguments:
+        threads {int} -- number of threads scanning concurrently (default: {8})
+
+    Returns:
+        list -- of (folder path, dict of file name: `os.DirEntry` for files in folder) for
+        each report folder found, ordered by path.
+    """
+    tops = []
+    for i in chkToList(lookInPaths, str, os.path.exists) if lookInPaths else []:
+        try:
+            tops.extend(_scanFolder(i)[1])
+        except OSError:
+            continue
+    if not tops:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(int(threads or 1), len(tops)))) as executor:
+        found = executor.map(lambda x: _scanTree(x[0], descend=not x[1]), tops)
+        return sorted((r for res in found for r in res), key=lambda x: x[0])
+
+def readReportFolder(f, extractInst: bool = False, fileNames=None):
+    """Returns (locator data, instance path) of report folder `f`
+
+    Reads instance file name from `FilingSummary.xml` and locator data from `additionalMeta.json` in
+    report folder `f`, instance path is 'Not discoverable' if the instance is not in the folder or in
+    a zip file in the folder.
+
+    Keyword Arguments:
+        extractInst {bool} -- Extract zipped instance if found in report folder (default: {False})
+        fileNames {iterable} -- names of files in `f` if already known (such as from `scanReportFolders`),
+        saves listing the folder again (default: {None})
+    """
+    tree = etree.parse(os.path.join(f, 'FilingSummary.xml'))
+    instanceFile = tree.xpath('.//@instance')[0]
+    fileNames = set(fileNames) if fileNames is not None else set(os.listdir(f))
+    inst = 'Not discoverable'
+    if instanceFile in fileNames:
+        inst = os.path.join(f, instanceFile)
+    else:
+        zipFiles = [os.path.join(f, x)
+                    for x in sorted(fileNames) if x.endswith('.zip')]
+        if zipFiles:
+            for z in zipFiles:
+                with zipfile.ZipFile(z, 'r') as _zf:
+                    if instanceFile in _zf.namelist():
+                        if extractInst:
+                            inst = _zf.extract(instanceFile, f)
+                        else:
+                            inst = os.path.join(f, instanceFile)
+                        break
+    res_c = dict()
+    with open(os.path.join(f, 'additionalMeta.json'), 'r') as _addInfo:
+        res_c=json.load(_addInfo)
+        res_c['reportFolder'] = f
+    return res_c, inst
+
+def _dataAttrsKey(locator):
+    '''Returns hashable key of locator `dataAttrs`'''
+    attrs = locator.get('dataAttrs')
+    return json.dumps(attrs, sort_keys=True) if isinstance(attrs, (list, dict)) else attrs
+
+def _dumpJsonAtomic(obj, path):
+    '''Writes `obj` as json to a temp file next to `path` then moves it to `path`, so `path` is either the old or the new file'''
+    fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path) or None, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as j:
+            json.dump(obj, j)
+        if os.path.isfile(path):
+            os.chmod(tmpPath, os.stat(path).st_mode & 0o777)
+        os.replace(tmpPath, path)
+    finally:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+
+def makeLocator(lookInPaths, extractInst: bool = False, CreateUpdatelocatorPath: str = None, index: str = None,
+                scanThreads: int = 8):
     """Discover folders containing EdgarRenderer reports within given paths
 
     Looks into folders to discover which subfolders contains a valid EdgarRenderer reports and
@@ -113,51 +232,56 @@ def makeLocator(lookInPaths, extractInst: bool = False, CreateUpdatelocatorPath:
         (default: {False})
         CreateUpdatelocatorPath {str} -- A path to json file to save locator data to be used later
         OR is no file exists, create file (default: {None})
+        index {str} -- A path to sqlite index of report folders (see `LocatorIndex`), only folders
+        that are new or where FilingSummary.xml or additionalMeta.json changed since last scan are read,
+        folders no longer found are dropped from the index (default: {None}, all folders are read)
+        scanThreads {int} -- number of threads scanning folders (see `scanReportFolders`) (default: {8})
 
     Returns:
         dict -- with 2 values; savedLocatorFile path (False if no file is selected),
         'locators' for discovered reports info to be used by viewer.
     """
-    folders = []
-    if lookInPaths:
-        for i in chkToList(lookInPaths, str, os.path.exists):
-            for parent, dirs, files in os.walk(i):
-                for d in dirs:
-                    folders.append(os.path.join(parent, d))
+    try:
+        from .LocatorIndex import LocatorIndex, reportFolderStamps
+    except:
+        from LocatorIndex import LocatorIndex, reportFolderStamps
 
+    scanPaths = chkToList(lookInPaths, str, os.path.exists) if lookInPaths else []
+    folders = scanReportFolders(scanPaths, threads=scanThreads)
+
+    locIndex = LocatorIndex(index) if index else None
+    known = locIndex.stamps() if locIndex else dict()
+    found = []
+    nUpdated = 0
     finalDict = OrderedDict()
-    for f in folders:
-        filingSummary = os.path.join(f, 'FilingSummary.xml')
-        metaInfo = os.path.join(f, 'additionalMeta.json')
-        if os.path.isfile(filingSummary) and os.path.isfile(metaInfo):
-            tree = etree.parse(filingSummary)
-            instanceFile = tree.xpath('.//@instance')[0]
-            inst = 'Not discoverable'
-            if instanceFile in os.listdir(f):
-                inst = os.path.join(f, instanceFile)
+    try:
+        for f, entries in folders:
+            found.append(f)
+            stamps = reportFolderStamps(f, entries) if locIndex else None
+            cached = locIndex.get(f) if stamps and known.get(f) == stamps else None
+            if cached and not (extractInst and not os.path.isfile(cached[1])):
+                res_c = cached[0]
             else:
-                zipFiles = [os.path.join(f, x)
-                            for x in os.listdir(f) if x.endswith('.zip')]
-                if zipFiles:
-                    for z in zipFiles:
-                        with zipfile.ZipFile(z, 'r') as _zf:
-                            if instanceFile in _zf.namelist():
-                                if extractInst:
-                                    inst = _zf.extract(instanceFile, f)
-                                else:
-                                    inst = os.path.join(f, instanceFile)
-                                break
-            res_c = dict()
-            with open(metaInfo, 'r') as _addInfo:
-                res_c=json.load(_addInfo)
-                res_c['reportFolder'] = f
+                res_c, inst = readReportFolder(f, extractInst, fileNames=entries)
+                if stamps:
+                    locIndex.update(f, stamps, res_c, inst)
+                    # commit in batches so an interrupted scan keeps folders already read
+                    nUpdated += 1
+                    if nUpdated % 500 == 0:
+                        locIndex.commit()
             # make unique folders locators keys
             _i = 1
             _k = os.path.basename(f)
-            while _k in list(finalDict.keys()):
+            while _k in finalDict:
                 _k = os.path.basename(f) + '_{}'.format(_i)
-                _i += 1               
+                _i += 1
             finalDict[_k] = res_c
+        if locIndex:
+            locIndex.removeMissing(scanPaths, found)
+            locIndex.commit()
+    finally:
+        if locIndex:
+            locIndex.close()
     if CreateUpdatelocatorPath:
         if os.path.isfile(CreateUpdatelocatorPath):
             try:
@@ -183,18 +307,24 @@ def makeLocator(lookInPaths, extractInst: bool = False, CreateUpdatelocatorPath:
 
             warnings.warn('Updating existing file {}'.format(
                 CreateUpdatelocatorPath), CntlrPyWarning)
+            # hashed lookups of filings (dataAttrs) and keys already in locator file
+            locAttrs = set(_dataAttrsKey(loc[l]) for l in loc)
             m = 0
             for c in finalDict:
-                match = any([finalDict[c]['dataAttrs'] ==
-                             loc[l]['dataAttrs'] for l in loc])
-                if not match:
-                    loc[c] = finalDict[c]
+                attrs = _dataAttrsKey(finalDict[c])
+                if attrs not in locAttrs:
+                    _i = 1
+                    _k = c
+                    while _k in loc:
+                        _k = c + '_{}'.format(_i)
+                        _i += 1
+                    loc[_k] = finalDict[c]
+                    locAttrs.add(attrs)
                     print('adding {} to locator at {}'.format(
-                        c, CreateUpdatelocatorPath))
+                        _k, CreateUpdatelocatorPath))
                     m += 1
             if m > 0:
-                with open(CreateUpdatelocatorPath, 'w') as j:
-                    json.dump(loc, j)
+                _dumpJsonAtomic(loc, CreateUpdatelocatorPath)
             print('Added {} new items to {}'.format(m, CreateUpdatelocatorPath))
             return {'savedLocatorFile': CreateUpdatelocatorPath, 'locators': loc}
         else:
@@ -341,6 +471,26 @@ def selectRunEnv(env, workingDir=None, appDir=None, srcDir=None):
             raise Exception("Set env to either 'src' or 'app'!")
     return targetResDir
 
+DEI_NAMESPACE_PREFIX = 'http://xbrl.sec.gov/dei/'
+
+def getDeiFacts(modelXbrl, localNames=None):
+    '''Returns dict of dei concept local name: list of facts in document order (by sourceline) for dei facts (any dei taxonomy
+    version) in `modelXbrl`, collected in one pass over facts of the instance. If `localNames` is given only those concepts are
+    collected, names without facts are not in the returned dict (use `.get(name, [])`).
+    '''
+    names = set(localNames) if localNames is not None else None
+    res = dict()
+    for f in getattr(modelXbrl, 'factsInInstance', None) or []:
+        qname = f.qname
+        if qname is None or not (qname.namespaceURI or '').startswith(DEI_NAMESPACE_PREFIX):
+            continue
+        if names is not None and qname.localName not in names:
+            continue
+        res.setdefault(qname.localName, []).append(f)
+    for facts in res.values():
+        facts.sort(key=lambda z: (z.sourceline or 0, z.objectIndex))
+    return res
+
 def xmlFileFromString(xmlString, temp=True, filepath=None, filePrefix=None, identifier=None, tempDir=None, deleteF=True):
     '''Returns a file or tempfile handle for the xml string to be used later with arelle
     if 'temp' is False, a filePath must be entered, xmlString will be written to that file and will REPLACE it if it exists,
@@ -379,42 +529,139 @@ def xmlFileFromString(xmlString, temp=True, filepath=None, filePrefix=None, iden
     
     return fileHandle
 
+
+COMPRESSION_CODECS = ('zlib', 'zstd')
+COMPRESSED_TEXT_MARKER = 'arellepy:'
+_fileExtensions = {'zlib': '.gz', 'zstd': '.zst'}
+_fileMagic = {b'\x1f\x8b': 'zlib', b'\x28\xb5\x2f\xfd': 'zstd'}
+
+def _zstd():
+    '''Returns zstandard module if installed, None otherwise'''
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+def chkCompressionCodec(codec):
+    '''Returns a usable compression codec name for `codec`, None if no compression, falls back to zlib with a warning
+    if zstd is requested and zstandard package is not installed'''
+    if not codec:
+        return None
+    codec = str(codec).lower()
+    if codec not in COMPRESSION_CODECS:
+        raise Exception('Unknown compression codec "{}", should be one of {}'.format(codec, COMPRESSION_CODECS))
+    if codec == 'zstd' and _zstd() is None:
+        warnings.warn('zstandard package is not installed, using zlib instead of zstd', CntlrPyWarning)
+        codec = 'zlib'
+    return codec
+
+def compressText(text, codec='zlib', level=None):
+    '''Returns `text` compressed with `codec` as a text that can be stored in a text db column, the text is prefixed 
+    with a codec marker "arellepy:<codec>:" followed by the base64 encoded compressed bytes, use `decompressText` to get
+    the original text. Empty text and text that is already compressed are returned as is.
+    '''
+    codec = chkCompressionCodec(codec)
+    if not text or not codec or isCompressedText(text):
+        return text
+    data = text if type(text) is bytes else bytes(text, encoding='utf-8')
+    if codec == 'zstd':
+        data = _zstd().ZstdCompressor(level=level if level is not None else 3).compress(data)
+    else:
+        data = zlib.compress(data, level if level is not None else 6)
+    return COMPRESSED_TEXT_MARKER + codec + ':' + base64.b64encode(data).decode('ascii')
+
+def isCompressedText(text):
+    '''True if `text` was made by `compressText`'''
+    return type(text) is str and text.startswith(COMPRESSED_TEXT_MARKER) and text.split(':', 2)[1] in COMPRESSION_CODECS
+
+def decompressText(text):
+    '''Returns the original text of a text made by `compressText`, any other value is returned as is'''
+    if not isCompressedText(text):
+        return text
+    _, codec, data = text.split(':', 2)
+    data = base64.b64decode(data)
+    if codec == 'zstd':
+        zstd = _zstd()
+        if zstd is None:
+            raise Exception('zstandard package is required to decompress zstd compressed text')
+        data = zstd.ZstdDecompressor().decompressobj().decompress(data)
+    else:
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
+
+def compressedFileExtension(codec):
+    '''Returns file extension added to files compressed with `codec`'''
+    return _fileExtensions.get(chkCompressionCodec(codec), '')
+
+def writeTextFile(filePath, text, codec=None):
+    '''Writes `text` to `filePath`, compressed with `codec` (gzip file format for zlib) if given, compressed text made by
+    `compressText` is decompressed first. REPLACES the file if it exists.
+    '''
+    codec = chkCompressionCodec(codec)
+    text = decompressText(text)
+    data = text if type(text) is bytes else bytes(text, encoding='utf-8')
+    if codec == 'zstd':
+        data = _zstd().ZstdCompressor().compress(data)
+    elif codec == 'zlib':
+        data = gzip.compress(data)
+    with open(filePath, 'wb') as fd:
+        fd.write(data)
+    return filePath
+
+def readTextFile(filePath):
+    '''Returns text in `filePath`, transparently decompresses gzip and zstd compressed files'''
+    with open(filePath, 'rb') as fd:
+        data = fd.read()
+    for magic, codec in _fileMagic.items():
+        if data.startswith(magic):
+            if codec == 'zstd':
+                zstd = _zstd()
+                if zstd is None:
+                    raise Exception('zstandard package is required to read zstd compressed file {}'.format(filePath))
+                data = zstd.ZstdDecompressor().decompressobj().decompress(data)
+            else:
+                data = gzip.decompress(data)
+            break
+    return data.decode('utf-8')
+
         
 def getExtractedXbrlInstance(url, cntlr=None):
     '''Gets the url of extracted XBRL instance from the url of inlineXBRL form, used when XBRL instance is needed while inlineXBRL is reported'''
+    try:
+        from .Downloader import sharedDownloader
+    except:
+        from Downloader import sharedDownloader
     c = cntlr
     if c is None:
         from arelle import Cntlr
         c = Cntlr.Cntlr()
-    webcache = c.webCache
+    downloader = sharedDownloader(c)
     _url = url.url if type(url).__name__ == 'ModelRssItem' else url
     res_url = None
     # first guess url of extracted document
     url_i = os.path.splitext(_url)[0] + '_htm.xml'
     n = 0
     while not res_url and n<=3:
-        try:
-            test = webcache.opener.open(url_i)
-            if test.code == 200:
-                res_url = url_i
-        except:
-            pass
-        time.sleep(1)
+        if downloader.exists(url_i):
+            res_url = url_i
+        else:
+            n += 1
+            if n <= 3:
+                time.sleep(1)
    # if not found get it from index page
-    if not res_url:
+    if not res_url and type(url).__name__ == 'ModelRssItem':
         try:
             # parse index page
-            index = url.find('link').text # assumes modelRssItem
-            page = request.urlopen(index)
-            tree = html.parse(page)
+            index = url.find('link').text
+            tree = html.parse(downloader.download(index))
             extractedPath = tree.xpath('.//table[contains(@summary, "Data Files")]//*[contains(text(), "EXTRACTED")]/ancestor::tr/td[3]//@href')[0]
             # urlParts = parse.urlparse(index)
             # extractedInstanceUrl = urlParts._replace(path= extractedPath).geturl()
             extractedInstanceUrl = parse.urljoin(index, extractedPath)
-            test2 = request.urlopen(extractedInstanceUrl)
-            # if test2.code == 200:
-            res_url = extractedInstanceUrl
-        except:
+            if downloader.exists(extractedInstanceUrl):
+                res_url = extractedInstanceUrl
+        except Exception:
             pass
     if not res_url:
         res_url = url_i
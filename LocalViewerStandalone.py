@@ -56,7 +56,7 @@ def main():
     viewer = LocalViewerStandalone( appDir=opts.args.appDir, edgarDir=opts.args.edgarDir,
                                     lookInFolders=opts.args.lookInFolders, host=opts.args.host,
                                     quiet=opts.args.quiet, debug=opts.args.debug, reloader=opts.args.reloader,
-                                    port=opts.args.port)  
+                                    port=opts.args.port, locatorIndex=opts.args.locatorIndex)  
     x = viewer.startViewer()
     # print(x[1])
 
@@ -78,6 +78,9 @@ class optionsHandler:
         #                     help=_('Location of viewer local files'), default=pathToLocals)
         parser.add_argument('--lookinFolders', '-l', metavar='path', type=str, dest='lookInFolders', nargs='+', default=None,
                             help=_('Locations to look for reports folders generated by EdgarRenderer'))
+        parser.add_argument('--locatorIndex', metavar='path', type=str, dest='locatorIndex', default=None,
+                            help=_('Location of report folders index file, if given refreshing only reads report folders that are new or changed '
+                                   '(default: no index)'))
         parser.add_argument('--host', '-hst', metavar='host', type=str, dest='host', default='localhost',
                             help=_('Host for bottle app (default: localhost)'))
         parser.add_argument('--server', '-s', metavar='servertype', type=str, dest='server', default='cheroot',
@@ -113,7 +116,7 @@ def setEnv(workingDir=None, env=None, appDir=None, srcDir=None):
 
 class LocalViewerStandalone:
     def __init__(self, appDir, edgarDir=None, lookInFolders=None, host='localhost', 
-                    quiet=True, debug=False, reloader=False, port=None):
+                    quiet=True, debug=False, reloader=False, port=None, locatorIndex=None):
         # After setting up environment
         if not edgarDir:
             edgarDir = [os.path.join(appDir, 'plugin/EdgarRenderer')]
@@ -129,7 +132,9 @@ class LocalViewerStandalone:
         self.reportsFolders = chkToList(edgarDir,str) #[os.path.join(appDir, 'plugin/EdgarRenderer')]
         self.localsDir = pathToLocals
         self.viewerHome = 'viewerHome.html'
-        self.locator = makeLocator(self.lookInFolders)['locators'] if self.lookInFolders else dict()
+        # optional index of report folders found, so refreshing only reads folders that are new or changed
+        self.locatorIndex = locatorIndex or None
+        self.locator = makeLocator(self.lookInFolders, index=self.locatorIndex)['locators'] if self.lookInFolders else dict()
         self.server = 'cheroot'
         self.host = host #'localhost'
         self.quiet = quiet #True
@@ -219,7 +224,7 @@ class LocalViewerStandalone:
 
     # Click refresh button in viewer
     def refreshLocator(self):
-        self.locator = makeLocator(self.lookInFolders)['locators'] if self.lookInFolders else dict()
+        self.locator = makeLocator(self.lookInFolders, index=self.locatorIndex)['locators'] if self.lookInFolders else dict()
         return self.locator
 
     # tkinter select dir to select dir to look for filings
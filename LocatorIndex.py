@@ -0,0 +1,95 @@
+""" :mod: `LocatorIndex`
+Index of EdgarRenderer report folders
+
+Keeps a record in a local sqlite file of each report folder found by `HelperFuncs.makeLocator` (keyed by folder path) with
+the modification time and size of its marker files (FilingSummary.xml and additionalMeta.json) and the locator data read
+from it, so a later scan only reads folders that are new or whose marker files changed, and drops folders that are gone.
+"""
+
+import os, sqlite3, json
+from datetime import datetime
+
+MARKER_FILES = ('FilingSummary.xml', 'additionalMeta.json')
+
+
+def reportFolderStamps(folder, entries=None):
+    '''Returns (FilingSummary.xml mtime_ns, size, additionalMeta.json mtime_ns, size) of `folder`, None if it is not a report folder,
+    `entries` is dict of file name: `os.DirEntry` of folder if already scanned (see `HelperFuncs.scanReportFolders`)'''
+    stamps = []
+    for x in MARKER_FILES:
+        try:
+            st = entries[x].stat() if entries is not None else os.stat(os.path.join(folder, x))
+        except (OSError, KeyError):
+            return None
+        stamps.extend((st.st_mtime_ns, st.st_size))
+    return tuple(stamps)
+
+
+class LocatorIndex:
+    '''sqlite index of report folders, one row per folder path
+
+    args:
+        path -- path of the sqlite index file, created if it does not exist
+
+    usage:
+        index = LocatorIndex('/path/to/locatorIndex.db')
+        known = index.stamps()
+        stamps = reportFolderStamps(folder)
+        if known.get(folder) != stamps:
+            ... # read folder
+            index.update(folder, stamps, locator, instance)
+        index.close()
+    '''
+    def __init__(self, path):
+        self.path = path
+        dirPath = os.path.dirname(path)
+        if dirPath and not os.path.isdir(dirPath):
+            os.makedirs(dirPath)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS "folders" ("reportFolder" TEXT PRIMARY KEY, "summaryMtime" INTEGER, '
+                          '"summarySize" INTEGER, "metaMtime" INTEGER, "metaSize" INTEGER, "instance" TEXT, "locator" TEXT, '
+                          '"dateTimeIndexed" TEXT)')
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def stamps(self):
+        '''Returns dict of report folder: marker files stamps (as from `reportFolderStamps`) of all indexed folders'''
+        return {r[0]: tuple(r[1:]) for r in self.conn.execute(
+            'SELECT "reportFolder", "summaryMtime", "summarySize", "metaMtime", "metaSize" FROM "folders"')}
+
+    def get(self, folder):
+        '''Returns (locator dict, instance path) indexed for `folder` or None'''
+        row = self.conn.execute('SELECT "locator", "instance" FROM "folders" WHERE "reportFolder"=?', (folder,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def update(self, folder, stamps, locator, instance=None):
+        '''Indexes `locator` (dict) and `instance` path read from `folder` with marker files `stamps`, committed on `commit` or `close`'''
+        self.conn.execute('INSERT OR REPLACE INTO "folders" ("reportFolder", "summaryMtime", "summarySize", "metaMtime", "metaSize", '
+                          '"instance", "locator", "dateTimeIndexed") VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                          (folder,) + tuple(stamps) + (instance, json.dumps(locator), datetime.now().isoformat(timespec='seconds')))
+
+    def removeMissing(self, lookInPaths, foundFolders):
+        '''Drops indexed folders under any of `lookInPaths` that are not in `foundFolders`, returns number of folders dropped
+        (folders indexed from other paths are kept)'''
+        prefixes = tuple(os.path.join(os.path.normpath(p), '') for p in lookInPaths)
+        found = set(os.path.normpath(f) for f in foundFolders)
+        gone = [(f,) for f in self.stamps() if os.path.normpath(f).startswith(prefixes) and os.path.normpath(f) not in found]
+        self.conn.executemany('DELETE FROM "folders" WHERE "reportFolder"=?', gone)
+        return len(gone)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,74 @@
+""" :mod: `Prefetcher`
+Download ahead of processing
+
+Fetches items i+1..i+k (using a bounded pool of threads) while item i is being processed by the caller, so network
+latency is hidden behind processing time, requests made by fetch functions can be spaced out by a shared `RateLimiter`
+to stay within a request rate limit (such as SEC EDGAR fair access limit).
+"""
+
+import time, threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RateLimiter:
+    '''Thread safe request rate limiter, `wait()` blocks as needed so that calls are at least 1/`maxPerSecond` seconds apart,
+    no limit if `maxPerSecond` is None or 0.
+    '''
+    def __init__(self, maxPerSecond=None):
+        self.interval = 1.0 / maxPerSecond if maxPerSecond else 0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class Prefetcher:
+    '''Iterates over `items` yielding (item, fetch error or None) after `fetchFunc(item)` is done, fetching of the next
+    `lookAhead` items is started in `threads` threads before an item is yielded.
+
+    usage:
+        for item, err in Prefetcher(fetchFunc, items, lookAhead=4):
+            process(item) # next items are being fetched meanwhile
+    '''
+    def __init__(self, fetchFunc, items, lookAhead=4, threads=4):
+        self.fetchFunc = fetchFunc
+        self.items = list(items)
+        self.lookAhead = max(0, int(lookAhead or 0))
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(threads or 1)))
+        self.futures = dict()
+        self._submitted = 0
+
+    def _fill(self, i):
+        '''Starts fetching items up to item `i` + `lookAhead`'''
+        last = min(len(self.items), i + self.lookAhead + 1)
+        while self._submitted < last:
+            self.futures[self._submitted] = self.executor.submit(self.fetchFunc, self.items[self._submitted])
+            self._submitted += 1
+
+    def __iter__(self):
+        try:
+            for i, item in enumerate(self.items):
+                self._fill(i)
+                try:
+                    self.futures.pop(i).result()
+                    err = None
+                except Exception as e:
+                    err = e
+                yield item, err
+        finally:
+            self.close()
+
+    def close(self):
+        '''Cancels fetches not started yet and waits for running ones'''
+        for fut in self.futures.values():
+            fut.cancel()
+        self.futures.clear()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,161 @@
+""" :mod: `RenderManifest`
+Manifest of rendered Edgar reports
+
+Keeps a record in a local sqlite file of each filing rendered (keyed by entry point url) with the EdgarRenderer version and
+the set of plugins used, hashes of output files and status, so a rendering batch can tell in one lookup whether a filing
+already has a valid report and only renders filings that are new, rendered by another renderer setup or not finished.
+"""
+
+import os, sqlite3, json
+from datetime import datetime
+
+try:
+    from .FormulaResultCache import fileContentHash
+except:
+    from FormulaResultCache import fileContentHash
+
+
+def renderSetupInfo(useResDir, plugins):
+    '''Returns dict of arelle version ('arelleVersion'), EdgarRenderer version ('rendererVersion') and '|' separated "name:version"
+    of `plugins` ('plugins', paths absolute or relative to arelle plugin folder in `useResDir`), read without loading plugins.
+    '''
+    try:
+        from arelle.Version import __version__ as arelleVersion
+    except Exception:
+        try:
+            from arelle.Version import version as arelleVersion
+        except Exception:
+            arelleVersion = ''
+    from arelle import PluginManager
+    pluginsInfo = []
+    rendererVersion = ''
+    for x in plugins:
+        path = x if os.path.isabs(x) else os.path.join(useResDir, 'plugin', x)
+        try:
+            info = PluginManager.moduleModuleInfo(path) or dict()
+        except Exception:
+            info = dict()
+        version = str(info.get('version', ''))
+        pluginsInfo.append('{}:{}'.format(os.path.basename(os.path.normpath(x)), version))
+        if 'edgarrenderer' in x.lower().replace(' ', ''):
+            rendererVersion = version
+    return {'arelleVersion': str(arelleVersion), 'rendererVersion': rendererVersion, 'plugins': '|'.join(sorted(pluginsInfo))}
+
+def reportFilesHashes(reportFolder):
+    '''Returns dict of file name: sha256 hex digest for files in `reportFolder` (not recursive)'''
+    return {e.name: fileContentHash(e.path) for e in os.scandir(reportFolder) if e.is_file()}
+
+
+class RenderManifest:
+    '''sqlite manifest of rendered Edgar reports, one row per filing entry point url
+
+    args:
+        path -- path of the sqlite manifest file, created if it does not exist
+
+    usage:
+        manifest = RenderManifest('/path/to/manifest.db')
+        setup = renderSetupInfo(useResDir, ['validate/EFM','EdgarRenderer','transforms/SEC'])
+        if not manifest.isCurrent(entryPointUrl, setup):
+            ... # render
+            manifest.record(entryPointUrl, reportFolder, setup, RenderManifest.DONE, fileHashes=reportFilesHashes(reportFolder))
+        manifest.close()
+    '''
+    DONE = 'done'
+    FAILED = 'failed'
+    ADOPTED = 'adopted' # report found in place, rendered before it was recorded (renderer setup unknown)
+
+    # actions returned by `renderAction`
+    SKIP = 'skip'
+    RENDER = 'render'
+    RERENDER = 'rerender'
+
+    def __init__(self, path):
+        self.path = path
+        dirPath = os.path.dirname(path)
+        if dirPath and not os.path.isdir(dirPath):
+            os.makedirs(dirPath)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS "renders" ("entryPointUrl" TEXT PRIMARY KEY, "accessionNumber" TEXT, '
+                          '"reportFolder" TEXT, "arelleVersion" TEXT, "rendererVersion" TEXT, "plugins" TEXT, "fileHashes" TEXT, '
+                          '"status" TEXT, "message" TEXT, "dateTimeRendered" TEXT)')
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, entryPointUrl):
+        '''Returns dict of manifest entry for `entryPointUrl` or None'''
+        cur = self.conn.execute('SELECT * FROM "renders" WHERE "entryPointUrl"=?', (entryPointUrl,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        res = dict(zip([x[0] for x in cur.description], row))
+        res['fileHashes'] = json.loads(res['fileHashes']) if res['fileHashes'] else dict()
+        return res
+
+    def isCurrent(self, entryPointUrl, setupInfo, reportFolder=None, verifyFiles=False):
+        '''True if `entryPointUrl` was rendered successfully with the same renderer setup (`setupInfo` from `renderSetupInfo`) to
+        `reportFolder` (any folder if None) and its report is still there, if `verifyFiles` output files are also checked against
+        recorded hashes. Adopted reports (see `adopt`) are current for any setup.
+        '''
+        entry = self.get(entryPointUrl)
+        if entry is None or entry['status'] not in (self.DONE, self.ADOPTED):
+            return False
+        if entry['status'] == self.DONE and any(entry[k] != setupInfo.get(k) for k in ('arelleVersion', 'rendererVersion', 'plugins')):
+            return False
+        if reportFolder is not None and os.path.normpath(reportFolder) != os.path.normpath(entry['reportFolder'] or ''):
+            return False
+        reportFolder = entry['reportFolder']
+        if not reportFolder or not os.path.isfile(os.path.join(reportFolder, 'FilingSummary.xml')):
+            return False
+        if verifyFiles:
+            try:
+                return reportFilesHashes(reportFolder) == entry['fileHashes']
+            except OSError:
+                return False
+        return True
+
+    def record(self, entryPointUrl, reportFolder, setupInfo, status, fileHashes=None, accessionNumber=None, message=None):
+        '''Records render of `entryPointUrl` with `status`, committed right away'''
+        self.conn.execute('INSERT OR REPLACE INTO "renders" ("entryPointUrl", "accessionNumber", "reportFolder", "arelleVersion", '
+                          '"rendererVersion", "plugins", "fileHashes", "status", "message", "dateTimeRendered") '
+                          'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                          (entryPointUrl, accessionNumber, reportFolder, setupInfo.get('arelleVersion'), setupInfo.get('rendererVersion'),
+                           setupInfo.get('plugins'), json.dumps(fileHashes) if fileHashes else None, status, str(message) if message else None,
+                           datetime.now().isoformat(timespec='seconds')))
+        self.conn.commit()
+
+    def adopt(self, entryPointUrl, reportFolder, accessionNumber=None):
+        '''Records complete report in `reportFolder` that is not in the manifest (such as rendered before the manifest was used) as
+        ADOPTED with hashes of its files, adopted reports are current for any renderer setup (kept until rendered with `forceRender`)'''
+        self.record(entryPointUrl, reportFolder, dict(), self.ADOPTED, fileHashes=reportFilesHashes(reportFolder), accessionNumber=accessionNumber)
+
+    def renderAction(self, entryPointUrl, reportFolder, setupInfo, forceRender=False, accessionNumber=None):
+        '''Returns what to do with `entryPointUrl` to be rendered to `reportFolder` with renderer setup `setupInfo`:
+        `SKIP` if its report is current, `RERENDER` (render from scratch, replacing the report in `reportFolder`) if `forceRender`
+        or the manifest records it as stale (failed or rendered by another setup), `RENDER` otherwise. A complete report (with
+        FilingSummary.xml and additionalMeta.json) not recorded in the manifest is adopted (see `adopt`) and skipped.
+        '''
+        if forceRender:
+            return self.RERENDER
+        if self.isCurrent(entryPointUrl, setupInfo, reportFolder=reportFolder):
+            return self.SKIP
+        if self.get(entryPointUrl) is not None:
+            return self.RERENDER
+        if all(os.path.isfile(os.path.join(reportFolder, x)) for x in ('FilingSummary.xml', 'additionalMeta.json')):
+            self.adopt(entryPointUrl, reportFolder, accessionNumber)
+            return self.SKIP
+        return self.RENDER
+
+    def remove(self, entryPointUrl):
+        self.conn.execute('DELETE FROM "renders" WHERE "entryPointUrl"=?', (entryPointUrl,))
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,86 @@
+""" :mod: `RenderProgress`
+Progress events of rendering batches
+
+Each filing in a rendering batch goes through events queued, downloading (when downloaded ahead of rendering), rendering
+and done or failed. Events are dicts with the event name, filing key, time and whatever is known at that point (duration,
+bytes, memory), `RenderProgress` keeps batch counters to give live throughput and estimated time to finish, and passes each
+event with the current stats to a callback (such as `statusCallback` that shows a status line in cntlr status bar/console).
+"""
+
+import time, threading
+
+
+class RenderProgress:
+    '''Tracks progress events of a rendering batch of `total` filings, `callback(event, stats)` is called for each event.
+
+    Events can be emitted from several threads.
+    '''
+    QUEUED = 'queued'
+    DOWNLOADING = 'downloading'
+    RENDERING = 'rendering'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, total=0, callback=None):
+        self.total = total
+        self.callback = callback
+        self.startTime = time.time()
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.renderTime = 0.0
+        self.slowest = None # (duration, key)
+        self._lock = threading.Lock()
+
+    def emit(self, event, key=None, **info):
+        '''Records `event` for filing `key` with `info` (such as duration in seconds, bytes, memory in KB), returns the event dict'''
+        evt = dict(event=event, key=key, time=time.time(), **info)
+        with self._lock:
+            if event in (self.DONE, self.FAILED):
+                if event == self.DONE:
+                    self.done += 1
+                else:
+                    self.failed += 1
+                duration = info.get('duration')
+                if duration:
+                    self.renderTime += duration
+                    if self.slowest is None or duration > self.slowest[0]:
+                        self.slowest = (duration, key)
+            if info.get('bytes') and event in (self.DONE, self.DOWNLOADING):
+                self.bytes += info['bytes']
+            stats = self._stats()
+        if self.callback:
+            self.callback(evt, stats)
+        return evt
+
+    def _stats(self):
+        elapsed = time.time() - self.startTime
+        finished = self.done + self.failed
+        remaining = max(0, self.total - finished - self.skipped)
+        rate = finished / elapsed if elapsed > 0 else 0.0 # filings per second
+        return {'total': self.total, 'done': self.done, 'failed': self.failed, 'skipped': self.skipped, 'remaining': remaining,
+                'elapsed': elapsed, 'rate': rate, 'eta': remaining / rate if rate else None, 'bytes': self.bytes,
+                'slowest': self.slowest}
+
+    def stats(self):
+        '''Returns dict of batch counters, elapsed seconds, rate (filings per second), eta (seconds, None until a filing is finished),
+        total bytes and slowest filing (duration, key)'''
+        with self._lock:
+            return self._stats()
+
+
+def formatProgress(stats):
+    '''Returns status line for progress `stats`'''
+    eta = stats['eta']
+    return '{} done, {} failed, {} remaining of {} | {:.2f} filings/min | ETA {}'.format(
+        stats['done'], stats['failed'], stats['remaining'], stats['total'], stats['rate'] * 60,
+        time.strftime('%H:%M:%S', time.gmtime(eta)) if eta is not None else '--:--:--')
+
+def statusCallback(cntlr):
+    '''Returns progress callback showing status line through `cntlr.showStatus` (console for CntlrPy, status bar in GUI) when a filing
+    is finished'''
+    def _callback(evt, stats):
+        if evt['event'] in (RenderProgress.DONE, RenderProgress.FAILED):
+            cntlr.showStatus(formatProgress(stats))
+    return _callback
@@ -0,0 +1,103 @@
+""" :mod: `RunJournal`
+Journal of formula runs
+
+Keeps a record in a local sqlite file of each filing (instance) processed in a formula run as soon as it is done, so that
+a run that did not finish (crashed, killed, machine restarted) can be resumed by its run id, skipping filings that were
+already processed.
+"""
+
+import os, sqlite3, uuid
+from datetime import datetime
+
+
+class RunJournal:
+    '''sqlite journal of formula runs, one row per (runId, filingId, formulaId)
+
+    args:
+        path -- path of the sqlite journal file, created if it does not exist
+
+    Keys (filingId, formulaId) are stored as text, so filing ids given as numbers (rssDB filingId) or as strings (instance
+    file name) are both matched as text.
+
+    usage:
+        journal = RunJournal('/path/to/journal.db')
+        runId = journal.startRun(resumeRunId=None, description='my formula')
+        doneKeys = journal.doneKeys(runId)
+        ...
+        journal.record(runId, (filingId, formulaId), 'done')
+        journal.close()
+    '''
+    DONE = 'done'
+    ERROR = 'error'
+
+    def __init__(self, path):
+        self.path = path
+        dirPath = os.path.dirname(path)
+        if dirPath and not os.path.isdir(dirPath):
+            os.makedirs(dirPath)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS "runs" ("runId" TEXT PRIMARY KEY, "description" TEXT, '
+                          '"dateTimeStarted" TEXT, "dateTimeResumed" TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS "runItems" ("runId" TEXT NOT NULL, "filingId" TEXT NOT NULL, '
+                          '"formulaId" TEXT NOT NULL, "status" TEXT, "message" TEXT, "dateTimeProcessed" TEXT, '
+                          'PRIMARY KEY ("runId", "filingId", "formulaId"))')
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def _key(key):
+        return (str(key[0]), str(key[1]))
+
+    def startRun(self, resumeRunId=None, description=None):
+        '''Returns run id of a new run, or `resumeRunId` if given, a run id that is not in the journal is started as a new run'''
+        now = datetime.now().isoformat(timespec='seconds')
+        if resumeRunId:
+            if self.conn.execute('SELECT 1 FROM "runs" WHERE "runId"=?', (str(resumeRunId),)).fetchone():
+                self.conn.execute('UPDATE "runs" SET "dateTimeResumed"=? WHERE "runId"=?', (now, str(resumeRunId)))
+                self.conn.commit()
+                return str(resumeRunId)
+            runId = str(resumeRunId)
+        else:
+            runId = datetime.now().strftime('%Y%m%d%H%M%S') + '_' + uuid.uuid4().hex[:8]
+        self.conn.execute('INSERT INTO "runs" ("runId", "description", "dateTimeStarted") VALUES (?, ?, ?)',
+                          (runId, description, now))
+        self.conn.commit()
+        return runId
+
+    def doneKeys(self, runId):
+        '''Returns set of keys (filingId, formulaId) as text that were processed successfully in run `runId`'''
+        return set(self.conn.execute('SELECT "filingId", "formulaId" FROM "runItems" WHERE "runId"=? AND "status"=?',
+                                     (str(runId), self.DONE)).fetchall())
+
+    def isDone(self, doneKeys, key):
+        '''True if `key` (filingId, formulaId) is in `doneKeys` from `doneKeys`'''
+        return self._key(key) in doneKeys
+
+    def record(self, runId, key, status, message=None):
+        '''Records status of key (filingId, formulaId) in run `runId`, committed right away'''
+        self.recordMany(runId, [key], status, message)
+
+    def recordMany(self, runId, keys, status, message=None):
+        '''Records same status for many keys (filingId, formulaId) in run `runId` in one transaction'''
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [(str(runId),) + self._key(k) + (status, str(message) if message else None, now) for k in keys]
+        if rows:
+            self.conn.executemany('INSERT OR REPLACE INTO "runItems" ("runId", "filingId", "formulaId", "status", "message", '
+                                  '"dateTimeProcessed") VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self.conn.commit()
+
+    def runSummary(self, runId):
+        '''Returns dict of status: count of items recorded for run `runId`'''
+        return dict(self.conn.execute('SELECT "status", COUNT(*) FROM "runItems" WHERE "runId"=? GROUP BY "status"',
+                                      (str(runId),)).fetchall())
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
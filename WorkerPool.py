@@ -0,0 +1,282 @@
+""" :mod: `WorkerPool`
+Pool of persistent worker processes
+
+Each worker process initializes its state (usually a cntlr) once and then processes many tasks, workers are
+recycled (exit and get replaced by a fresh process) after a number of tasks or when the memory used by the worker
+exceeds a ceiling, that way the cost of initializing a cntlr is paid once per worker instead of once per task while
+memory leftovers (lxml) are still cleaned up by the operating system when the worker exits.
+
+Tasks can be limited in wall clock time (the worker is killed), CPU time and address space (the worker process gets
+killed or fails with MemoryError), tasks that were running in a worker that died are reported as errors and quarantined.
+Each worker reports results on its own pipe, so a worker killed while sending a result can only break its own pipe.
+"""
+
+import os, time, traceback, multiprocessing
+from multiprocessing.connection import wait
+from collections import deque
+
+
+def processMemoryUsed():
+    '''Returns resident memory used by the current process in KB, falls back to peak resident memory if not on linux'''
+    try:
+        with open('/proc/self/statm', 'r') as fd:
+            return int(fd.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except Exception:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return 0
+
+def setCpuTimeLimit(seconds):
+    '''Sets CPU time limit of the current process to `seconds` more than CPU time already used, the process gets killed
+    (SIGXCPU) when exceeded, does nothing where resource module is not available'''
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = int(usage.ru_utime + usage.ru_stime) + int(seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+def setAddressSpaceLimit(nBytes):
+    '''Sets address space limit of the current process to `nBytes`, allocations beyond the limit fail (MemoryError),
+    does nothing where resource module is not available'''
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        nBytes = min(nBytes, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (nBytes, hard))
+
+def workerMain(initFunc, initArgs, taskFunc, closeFunc, taskQ, resultConn, maxTasks, maxMemoryKB, maxAddressSpace=None, maxCpuTime=None):
+    '''Worker process loop, gets tasks from its own `taskQ` and reports to parent on its own `resultConn` (write end of a pipe)
+    by tuples (kind, pid, taskKey, payload, willExit), `willExit` tells the parent not to assign more tasks to this worker.
+    `maxAddressSpace` (bytes) limits the worker process, `maxCpuTime` (seconds) limits each task.
+    '''
+    pid = os.getpid()
+    try:
+        if maxAddressSpace:
+            setAddressSpaceLimit(maxAddressSpace)
+        state = initFunc(*initArgs) if initFunc else None
+    except BaseException:
+        resultConn.send(('initError', pid, None, traceback.format_exc(), True))
+        resultConn.close()
+        return
+    n = 0
+    willExit = False
+    while not willExit:
+        task = taskQ.get()
+        if task is None:
+            break
+        key, taskArgs = task
+        outOfMemory = False
+        try:
+            if maxCpuTime:
+                setCpuTimeLimit(maxCpuTime)
+            kind, payload = 'done', taskFunc(state, taskArgs)
+        except MemoryError:
+            # state of the worker can not be trusted anymore
+            kind, payload, outOfMemory = 'error', traceback.format_exc(), True
+        except Exception:
+            kind, payload = 'error', traceback.format_exc()
+        n += 1
+        willExit = bool(outOfMemory or (maxTasks and n >= maxTasks) or (maxMemoryKB and processMemoryUsed() > maxMemoryKB))
+        resultConn.send((kind, pid, key, payload, willExit))
+    if closeFunc:
+        try:
+            closeFunc(state)
+        except Exception:
+            pass
+    resultConn.close()
+
+
+class _Worker:
+    '''Parent side record of a worker process'''
+    def __init__(self, process, taskQ, conn):
+        self.process = process
+        self.taskQ = taskQ
+        self.conn = conn # read end of the worker result pipe
+        self.key = None # key of task assigned to this worker
+        self.startedAt = None
+        self.exiting = False
+
+
+class WorkerPool:
+    '''Bounded pool of persistent worker processes
+
+    args:
+        workers -- number of worker processes running concurrently
+        taskFunc -- function(state, taskArgs) that processes one task in the worker and returns a picklable result
+        initFunc, initArgs -- function(*initArgs) called once when a worker process starts, its return value is the
+                              `state` passed to taskFunc and closeFunc
+        closeFunc -- function(state) called before a worker exits
+        maxTasksPerWorker -- recycle worker after this number of tasks, None or 0 for no limit
+        maxWorkerMemory -- recycle worker when its resident memory exceeds this number of MB, None for no limit
+        errorFunc -- function(taskKey, taskArgs, message) returning the result reported for a task that raised an exception
+                     in the worker or that was running when the worker died, the default returns the message
+        taskTimeout -- seconds a task may run, the worker running a task for longer is killed and replaced, None for no limit
+        maxAddressSpace -- address space limit of worker processes in MB (RLIMIT_AS, linux/unix only), None for no limit
+        maxCpuTime -- CPU seconds a task may use, the worker is killed when exceeded (RLIMIT_CPU, linux/unix only), None for no limit
+
+    Keys of tasks that were running in a worker that was killed (timeout, CPU limit), died or failed to initialize (initFunc
+    raised, for instance when `maxAddressSpace` is too small) are added with the reason to `quarantined` list, they are reported
+    once as errors and never given to another worker.
+
+    All functions must be defined at module level (picklable).
+
+    usage:
+        pool = WorkerPool(workers=4, taskFunc=myTask, initFunc=makeCntlr, initArgs=(configDir, resDir))
+        for key, result in pool.imap([(key1, args1), (key2, args2)]):
+            ...
+    '''
+    def __init__(self, workers, taskFunc, initFunc=None, initArgs=(), closeFunc=None,
+                 maxTasksPerWorker=None, maxWorkerMemory=None, errorFunc=None, taskTimeout=None, maxAddressSpace=None, maxCpuTime=None):
+        self.workers = max(1, int(workers or 1))
+        self.taskFunc = taskFunc
+        self.initFunc = initFunc
+        self.initArgs = tuple(initArgs)
+        self.closeFunc = closeFunc
+        self.maxTasksPerWorker = maxTasksPerWorker
+        self.maxMemoryKB = int(maxWorkerMemory * 1024) if maxWorkerMemory else None
+        self.errorFunc = errorFunc if errorFunc else lambda key, taskArgs, msg: msg
+        self.taskTimeout = taskTimeout
+        self.maxAddressSpace = int(maxAddressSpace * 1024 * 1024) if maxAddressSpace else None
+        self.maxCpuTime = maxCpuTime
+        self.quarantined = []
+
+    def _startWorker(self):
+        taskQ = multiprocessing.Queue()
+        readConn, writeConn = multiprocessing.Pipe(duplex=False)
+        p = multiprocessing.Process(target=workerMain, daemon=True,
+                                    args=(self.initFunc, self.initArgs, self.taskFunc, self.closeFunc, taskQ, writeConn,
+                                          self.maxTasksPerWorker, self.maxMemoryKB, self.maxAddressSpace, self.maxCpuTime))
+        p.start()
+        # only the worker writes to its pipe, so reading gets EOF once it is gone
+        writeConn.close()
+        return _Worker(p, taskQ, readConn)
+
+    def imap(self, tasks, onIdle=None):
+        '''Yields `(key, result)` for each task as soon as a worker is done with it (order of completion).
+
+        `tasks` is an iterable of (key, taskArgs), keys must be unique and hashable. `onIdle` is an optional function called
+        (in the calling process) each time no result arrived for about a second.
+        '''
+        todo = deque(tasks)
+        taskArgsByKey = dict(todo)
+        if len(taskArgsByKey) != len(todo):
+            raise ValueError('WorkerPool tasks keys must be unique, {} tasks have {} distinct keys'.format(len(todo), len(taskArgsByKey)))
+        remaining = len(taskArgsByKey)
+        workers = dict() # pid: _Worker
+
+        def assign(w):
+            if todo and not w.exiting:
+                w.key, taskArgs = todo.popleft()
+                w.startedAt = time.time()
+                w.taskQ.put((w.key, taskArgs))
+
+        def fail(w, msg):
+            '''Returns error result for task `w` was processing if any and quarantines the task'''
+            nonlocal remaining
+            key, w.key = w.key, None
+            if key is None:
+                return []
+            remaining -= 1
+            self.quarantined.append((key, msg))
+            return [(key, self.errorFunc(key, taskArgsByKey[key], msg))]
+
+        def handle(w, msg):
+            nonlocal remaining
+            kind, pid, key, payload, willExit = msg
+            if kind == 'initError':
+                w.exiting = True
+                return fail(w, 'Worker process failed to initialize:\n{}'.format(payload))
+            if w.key != key:
+                return [] # late message for a task already dealt with
+            w.key = None
+            w.exiting = willExit
+            remaining -= 1
+            assign(w)
+            return [(key, payload if kind == 'done' else self.errorFunc(key, taskArgsByKey[key], payload))]
+
+        def receive(w):
+            '''Returns (results of messages waiting on the pipe of worker `w`, True if the pipe is closed or broken)'''
+            out = []
+            try:
+                while w.conn.poll():
+                    out.extend(handle(w, w.conn.recv()))
+            except Exception:
+                # EOF (worker exited) or message cut short by a killed worker
+                return out, True
+            return out, False
+
+        def reap(pid, msg):
+            '''Removes worker, returns error result for task it was processing if any and quarantines the task'''
+            w = workers.pop(pid)
+            if w.process.is_alive():
+                w.process.kill()
+            w.process.join()
+            w.taskQ.cancel_join_thread()
+            w.conn.close()
+            return fail(w, msg.format(exitcode=w.process.exitcode))
+
+        finished = False
+        try:
+            while remaining > 0:
+                # workers that exited (recycled or died) are replaced
+                for pid, w in list(workers.items()):
+                    if not w.process.is_alive():
+                        for res in receive(w)[0]:
+                            yield res
+                        for res in reap(pid, 'Worker process exited with code {exitcode} while processing this task'):
+                            yield res
+                # workers running a task for too long are killed
+                if self.taskTimeout:
+                    now = time.time()
+                    for pid, w in list(workers.items()):
+                        if w.key is not None and now - w.startedAt > self.taskTimeout:
+                            for res in receive(w)[0]:
+                                yield res
+                            if w.key is not None and now - w.startedAt > self.taskTimeout:
+                                for res in reap(pid, 'Task timed out after {} seconds, worker process was killed'.format(self.taskTimeout)):
+                                    yield res
+                while todo and len(workers) < self.workers:
+                    w = self._startWorker()
+                    workers[w.process.pid] = w
+                    assign(w)
+                if remaining <= 0:
+                    break
+                byConn = {w.conn: pid for pid, w in workers.items()}
+                ready = wait(list(byConn), timeout=1)
+                if not ready:
+                    if onIdle is not None:
+                        onIdle()
+                    continue
+                for conn in ready:
+                    pid = byConn[conn]
+                    results, broken = receive(workers[pid])
+                    for res in results:
+                        yield res
+                    if broken:
+                        for res in reap(pid, 'Worker process exited with code {exitcode} while processing this task'):
+                            yield res
+            finished = True
+        finally:
+            if finished:
+                # let idle workers exit normally (runs closeFunc)
+                for w in workers.values():
+                    w.taskQ.put(None)
+                for w in workers.values():
+                    w.process.join(timeout=10)
+            for w in workers.values():
+                if w.process.is_alive():
+                    w.process.terminate()
+                w.process.join()
+                w.taskQ.cancel_join_thread()
+                w.conn.close()
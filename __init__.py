@@ -17,8 +17,10 @@ This plugin provides another convenience in running formulae and capturing the r
 can be stored in a database generated by rssDB plugin and can be run on the search results from
 the same database, results can either be stored in the database or in file.
 '''
-import os, sys, pathlib, gettext, logging, atexit, time
+import os, sys, pathlib, gettext, logging, atexit, time, weakref
 from math import isnan
+from array import array
+from functools import cached_property
 from collections import defaultdict
 from .HelperFuncs import selectRunEnv, arellepyConfig
 
@@ -43,58 +45,115 @@ def arellepyToolBarExtender(cntlr, toolbar):
     toolBarExtender(cntlr, toolbar)
 
 class DuplicateFacts:
+    '''Duplicate facts sets of a modelXbrl
+
+    Results are kept in a compact store: `objectIndex` of all facts in duplicate sets in one array ordered by set (most
+    precise fact first in each set), an array of offsets where each set starts, and per set hash and inconsistent flag.
+    Indexes attributes are views over the store computed on first access, attributes returning facts are looked up from
+    the modelXbrl (weakly referenced, so facts are not kept alive by this object) each time they are accessed.
+    '''
     def __init__(self, modelXbrl, cntlr) -> None:
-        self.dupFactsIndexes = set()
-        self.dup_facts_sets_by_hash = dict()
-        self.dup_facts_sets_by_key = dict() # (dup_set_hash, is_inconsistent_dup_set, most_precise_fact)
-        self.most_precise_dup_facts_set = set()
+        self._modelXbrlRef = weakref.ref(modelXbrl) if modelXbrl is not None else lambda: None
+        self._factsIndexes = array('q') # objectIndex of facts in dup sets, ordered by set, most precise first
+        self._offsets = array('q', [0]) # set i facts are _factsIndexes[_offsets[i]:_offsets[i+1]]
+        self._hashes = [] # conceptContextUnitHash of each set
+        self._inconsistent = array('b') # 1 if set is inconsistent
 
         self._getDups(modelXbrl, cntlr)
 
-        self.dupFactsIndexes = {f.objectIndex for f_set in self.dup_facts_sets_by_hash.values() for f in f_set if not f in self.most_precise_dup_facts_set} # does not include most precise
-        self.all_dup_facts_indexes = {f.objectIndex for f_set in self.dup_facts_sets_by_hash.values() for f in f_set}
-        self.all_dup_facts_sets_indexes = [{f.objectIndex for f in f_set} for f_set in self.dup_facts_sets_by_hash.values()]
-        self.consistent_dup_facts_sets_indexes = [{f.objectIndex for f in f_set} for k, f_set in self.dup_facts_sets_by_key.items() if not k[1]]
-        self.inconsistent_dup_facts_sets_indexes = [{f.objectIndex for f in f_set} for k, f_set in self.dup_facts_sets_by_key.items() if k[1]]
-        self.most_precise_dup_facts_set_indexes = {x.objectIndex for x in self.most_precise_dup_facts_set}
-
-        self.all_dup_facts_sets_count = len(self.dup_facts_sets_by_hash) \
-                                                if not self.dup_facts_sets_by_hash is None else 0
-
-        self.all_dup_facts_count = len(self.all_dup_facts_indexes) \
-                                                if not self.all_dup_facts_indexes is None else 0
-
-        self.inconsistent_dup_facts_sets_count = len(self.inconsistent_dup_facts_sets_indexes) \
-                                                if not self.inconsistent_dup_facts_sets_indexes is None else 0
-
-        self.inconsistent_dup_facts_count = sum([len(x) for x in self.inconsistent_dup_facts_sets_indexes]) \
-                                                if not self.inconsistent_dup_facts_sets_indexes is None else 0
-
-        self.consistent_dup_facts_sets_count = len(self.consistent_dup_facts_sets_indexes) \
-                                                if not self.consistent_dup_facts_sets_indexes is None else 0
-
-        self.consistent_dup_facts_count = sum([len(x) for x in self.consistent_dup_facts_sets_indexes]) \
-                                                if not self.consistent_dup_facts_sets_indexes is None else 0
+        self.all_dup_facts_sets_count = len(self._hashes)
+        self.all_dup_facts_count = len(self._factsIndexes)
+        self.inconsistent_dup_facts_sets_count = sum(self._inconsistent)
+        self.inconsistent_dup_facts_count = sum(self._offsets[i+1] - self._offsets[i] for i in range(len(self._hashes)) if self._inconsistent[i])
+        self.consistent_dup_facts_sets_count = self.all_dup_facts_sets_count - self.inconsistent_dup_facts_sets_count
+        self.consistent_dup_facts_count = self.all_dup_facts_count - self.inconsistent_dup_facts_count
 
         stats_msg = _(f'Found {self.all_dup_facts_sets_count} '
                                     f'duplicate facts set(s) (including {self.all_dup_facts_count} fact(s)), '
                                     f'with {self.inconsistent_dup_facts_count} '
                                     f'inconsistent duplicate set(s) (including {self.inconsistent_dup_facts_count} facts)')
         # mx.modelManager.showStatus(stats_msg)
-        modelXbrl.dupFactsIndexes = self.dupFactsIndexes
         if modelXbrl is not None and len(getattr(modelXbrl, 'factsInInstance', [])) > 0:
             cntlr.addToLog(stats_msg, file=modelXbrl.uri, messageCode="info", level=logging.INFO)
 
+    def _setIndexes(self, i):
+        '''objectIndex of facts in set i, most precise first'''
+        return self._factsIndexes[self._offsets[i]:self._offsets[i+1]]
+
+    def _facts(self, indexes):
+        mx = self._modelXbrlRef()
+        modelObjects = getattr(mx, 'modelObjects', None) if mx is not None else None
+        if not modelObjects:
+            return None
+        return [modelObjects[x] for x in indexes]
+
+    @cached_property
+    def dupFactsIndexes(self):
+        '''objectIndex of duplicate facts, does not include most precise fact of each set'''
+        return {x for i in range(len(self._hashes)) for x in self._setIndexes(i)[1:]}
+
+    @cached_property
+    def all_dup_facts_indexes(self):
+        return set(self._factsIndexes)
+
+    @cached_property
+    def all_dup_facts_sets_indexes(self):
+        return [set(self._setIndexes(i)) for i in range(len(self._hashes))]
+
+    @cached_property
+    def consistent_dup_facts_sets_indexes(self):
+        return [set(self._setIndexes(i)) for i in range(len(self._hashes)) if not self._inconsistent[i]]
+
+    @cached_property
+    def inconsistent_dup_facts_sets_indexes(self):
+        return [set(self._setIndexes(i)) for i in range(len(self._hashes)) if self._inconsistent[i]]
+
+    @cached_property
+    def most_precise_dup_facts_set_indexes(self):
+        return {self._factsIndexes[self._offsets[i]] for i in range(len(self._hashes))}
+
+    def iterDupSets(self):
+        '''Yields (set hash, is inconsistent set, objectIndex of facts most precise first) for each duplicate facts set'''
+        for i, h in enumerate(self._hashes):
+            yield h, bool(self._inconsistent[i]), self._setIndexes(i)
+
+    @property
+    def dup_facts_sets_by_hash(self):
+        '''dict of set hash: set of facts, empty if modelXbrl is closed'''
+        res = dict()
+        for i, h in enumerate(self._hashes):
+            facts = self._facts(self._setIndexes(i))
+            if facts is None:
+                return dict()
+            res[h] = set(facts)
+        return res
+
+    @property
+    def dup_facts_sets_by_key(self):
+        '''dict of (set hash, is inconsistent set, most precise fact): set of facts, empty if modelXbrl is closed'''
+        res = dict()
+        for i, h in enumerate(self._hashes):
+            facts = self._facts(self._setIndexes(i))
+            if facts is None:
+                return dict()
+            res[(h, bool(self._inconsistent[i]), facts[0])] = set(facts)
+        return res
+
+    @property
+    def most_precise_dup_facts_set(self):
+        '''set of most precise fact of each set, empty if modelXbrl is closed'''
+        facts = self._facts(self._factsIndexes[self._offsets[i]] for i in range(len(self._hashes)))
+        return set(facts) if facts is not None else set()
+
     def _getDups(self, mx, cntlr):
         '''Detect duplicate facts ids in inline filings, duplicates facts are facts with lesser precision'''
-        from arelle.ModelValue import qname
-        from arelle.ValidateXbrlCalcs import inferredPrecision
         from arelle.XmlValidate import validate as xValidator
         from arelle.ModelInstanceObject import ModelInlineFact
+        try:
+            from .DuplicateFactsEngine import analyzeDuplicateGroups
+        except:
+            from DuplicateFactsEngine import analyzeDuplicateGroups
         factForConceptContextUnitHash = defaultdict(list)
-        most_precise_facts_set = set()
-        dup_facts_sets_by_hash = {}
-        dup_facts_sets_by_key = {} # (dup_set_hash, is_inconsistent_dup_set, most_precise_fact)
 
         # detect duplicates if we have facts.
         if not len(getattr(mx, 'factsInInstance', [])) > 0:
@@ -106,25 +165,18 @@ class DuplicateFacts:
             #     cntlr.showStatus(f'Invalid before dups check: {_f}')
             factForConceptContextUnitHash[_f.conceptContextUnitHash].append(_f)
 
-        for dup_set_hash, dups in factForConceptContextUnitHash.items():
-            if len(dups)>1:
-                x_valid_state = {fct:fct.xValid for fct in dups}
-                if all([d_f.isNumeric for d_f in dups]):
-                    dups.sort(key=lambda x: inferredPrecision(x), reverse=True)
-                else:
-                    dups.sort(key=lambda x: x.objectIndex, reverse=False)
-                most_precise_facts_set.add(dups[0])
-                is_inconsistent_dup_set = self._has_inconsistent_duplicates(dups)
-                dups_set = {x for x in dups}
-                dup_facts_sets_by_hash[dup_set_hash] = dups_set
-                dup_facts_sets_by_key[(dup_set_hash, is_inconsistent_dup_set, dups[0])] = dups_set
-                for fct in dups:
-                    if fct.xValid != x_valid_state[fct]:
-                        xValidator(mx, fct, ixFacts=isinstance(fct, ModelInlineFact))
-
-        self.dup_facts_sets_by_hash = dup_facts_sets_by_hash
-        self.dup_facts_sets_by_key = dup_facts_sets_by_key
-        self.most_precise_dup_facts_set = most_precise_facts_set
+        dup_sets_hashes = [h for h, dups in factForConceptContextUnitHash.items() if len(dups)>1]
+        x_valid_state = {fct:fct.xValid for h in dup_sets_hashes for fct in factForConceptContextUnitHash[h]}
+        # all dup sets are sorted (most precise first) and checked for consistency in one batch
+        analyzed = analyzeDuplicateGroups([factForConceptContextUnitHash[h] for h in dup_sets_hashes], self._has_inconsistent_duplicates)
+        for dup_set_hash, (dups, is_inconsistent_dup_set) in zip(dup_sets_hashes, analyzed):
+            self._factsIndexes.extend(f.objectIndex for f in dups)
+            self._offsets.append(len(self._factsIndexes))
+            self._hashes.append(dup_set_hash)
+            self._inconsistent.append(1 if is_inconsistent_dup_set else 0)
+            for fct in dups:
+                if fct.xValid != x_valid_state[fct]:
+                    xValidator(mx, fct, ixFacts=isinstance(fct, ModelInlineFact))
 
     @staticmethod
     def _has_inconsistent_duplicates(fact_dup_list):
@@ -139,9 +191,10 @@ class DuplicateFacts:
             else: # not all have same decimals
                 _d = inferredDecimals(f0)
                 _v = f0.xValue
-                _inConsistent = isnan(_v) # NaN is incomparable, always makes dups inconsistent
+                if isnan(_v): # NaN is incomparable, always makes dups inconsistent
+                    return True
                 decVals[_d] = _v
-                aMax, bMin = rangeValue(_v, _d)
+                aMax, bMin = rangeValue(_v, _d)[:2] # newer arelle also returns bounds inclusiveness
                 for f in fList[1:]:
                     _d = inferredDecimals(f)
                     _v = f.xValue
@@ -152,7 +205,7 @@ class DuplicateFacts:
                         _inConsistent |= _v != decVals[_d]
                     else:
                         decVals[_d] = _v
-                    a, b = rangeValue(_v, _d)
+                    a, b = rangeValue(_v, _d)[:2]
                     if a > aMax: aMax = a
                     if b < bMin: bMin = b
                 if not _inConsistent:
@@ -161,6 +214,71 @@ class DuplicateFacts:
             _inConsistent = any(not f.isVEqualTo(f0) for f in fList[1:])
         return _inConsistent
 
+def getDuplicateFactsInfo(modelXbrl):
+    '''Getter of `ModelXbrl.duplicateFactsInfo` (installed by `initFunc`), duplicate facts are detected on first access and
+    kept with the modelXbrl, returns None if duplicate facts detection is turned off for this modelXbrl'''
+    info = modelXbrl.__dict__.get('_arellepyDuplicateFactsInfo')
+    if info is None and getattr(modelXbrl, 'arellepyDetectDuplicates', True):
+        startedAt = time.time()
+        info = DuplicateFacts(modelXbrl, modelXbrl.modelManager.cntlr)
+        modelXbrl._arellepyDuplicateFactsInfo = info
+        modelXbrl.profileStat(("arellepy: detect-duplicates"), time.time() - startedAt)
+    return info
+
+def setDuplicateFactsInfo(modelXbrl, value):
+    modelXbrl._arellepyDuplicateFactsInfo = value
+
+def getDupFactsIndexes(modelXbrl):
+    '''Getter of `ModelXbrl.dupFactsIndexes`, indexes of duplicate facts except most precise ones, triggers duplicate facts detection'''
+    indexes = modelXbrl.__dict__.get('_arellepyDupFactsIndexes')
+    if indexes is None:
+        info = modelXbrl.duplicateFactsInfo
+        indexes = info.dupFactsIndexes if info is not None else set()
+    return indexes
+
+def setDupFactsIndexes(modelXbrl, value):
+    modelXbrl._arellepyDupFactsIndexes = value
+
+def installDuplicateFactsProperties():
+    '''Adds lazily computed `duplicateFactsInfo` and `dupFactsIndexes` properties to `arelle.ModelXbrl.ModelXbrl`'''
+    from arelle.ModelXbrl import ModelXbrl
+    if not isinstance(getattr(ModelXbrl, 'duplicateFactsInfo', None), property):
+        ModelXbrl.duplicateFactsInfo = property(getDuplicateFactsInfo, setDuplicateFactsInfo)
+        ModelXbrl.dupFactsIndexes = property(getDupFactsIndexes, setDupFactsIndexes)
+
+def removeConsistentDuplicateFacts(modelXbrl):
+    '''Removes consistent duplicate facts, except the most precise fact of each set, from `modelXbrl.facts` and `factsInInstance`
+    so they are not bound by formulas, inconsistent duplicates sets and duplicates that are tuple children are kept as is. Facts indexes (by qname, datatype...) built
+    before are dropped to be rebuilt without removed facts. Returns number of facts removed.
+    '''
+    info = getattr(modelXbrl, 'duplicateFactsInfo', None)
+    if info is None:
+        if not getattr(modelXbrl, 'arellepyDetectDuplicates', True):
+            return 0
+        info = DuplicateFacts(modelXbrl, modelXbrl.modelManager.cntlr)
+    toRemove = set()
+    for dupSetHash, isInconsistent, indexes in info.iterDupSets():
+        if not isInconsistent:
+            toRemove.update(indexes[1:])
+    if not toRemove:
+        return 0
+    modelObjects = modelXbrl.modelObjects
+    # tuple children are left in their tuple (and in factsInInstance), only top level facts are removed
+    topLevelFacts = set(modelXbrl.facts)
+    removeFacts = {modelObjects[i] for i in toRemove} & topLevelFacts
+    if not removeFacts:
+        return 0
+    modelXbrl.facts[:] = [f for f in modelXbrl.facts if f not in removeFacts]
+    modelXbrl.factsInInstance.difference_update(removeFacts)
+    nRemoved = len(removeFacts)
+    for attr in ('_factsByQname', '_factsByLocalName', '_factsByDatatype', '_factsByPeriodType', '_nonNilFactsInInstance'):
+        modelXbrl.__dict__.pop(attr, None)
+    if isinstance(modelXbrl.__dict__.get('_factsByDimQname'), dict):
+        modelXbrl._factsByDimQname.clear()
+    modelXbrl.modelManager.cntlr.addToLog(_('Removed {} consistent duplicate fact(s) from input instance before formula evaluation').format(nRemoved),
+                                          messageCode="arellepy.Info", file=modelXbrl.uri, level=logging.INFO)
+    return nRemoved
+
 def arellepyCmdLineOptionExtender(parser, *args, **kwargs):
     parser.add_option("--arellepyRunFormulaFromDB", action='store_true', dest="arellepyRunFormulaFromDB", default=False, 
                         help=_("Flag to initiate runing a formula on search results obtained from rssDB, must have search results and a valid formulaId to run"))
@@ -207,8 +325,133 @@ def arellepyCmdLineOptionExtender(parser, *args, **kwargs):
     
     parser.add_option("--arellepyRunFormulaFolderPath", action='store', dest="arellepyRunFormulaFolderPath", default=None, 
                         help=_("Path to folder to write formula results files, only valid if arellepyRunFormulaSaveResultsToFolder"))
+
+    parser.add_option("--arellepyRunFormulaWorkers", action='store', type="int", dest="arellepyRunFormulaWorkers", default=None, 
+                        help=_("Number of filings to process concurrently when running formula (linux only, default 1), each filing is processed in a "
+                                "subprocess, valid with both arellepyRunFormulaFromDB and arellepyRunFormula flags, also applies to formula runs "
+                                "started by other plugins (such as rssDB) on search results"))
+
+    parser.add_option("--arellepyRunFormulaMaxFilingsPerWorker", action='store', type="int", dest="arellepyRunFormulaMaxFilingsPerWorker", default=None, 
+                        help=_("Number of filings a formula worker subprocess processes with the same cntlr before it is replaced by a new subprocess, "
+                                "1 starts a new subprocess for each filing, 0 for no limit (default 1, or 100 with arellepyRunFormulaReuseCompiled)"))
+
+    parser.add_option("--arellepyRunFormulaMaxWorkerMemory", action='store', type="int", dest="arellepyRunFormulaMaxWorkerMemory", default=None, 
+                        help=_("Memory ceiling in MB for a formula worker subprocess, a worker exceeding this ceiling is replaced by a new subprocess "
+                                "after it is done with the current filing"))
+
+    parser.add_option("--arellepyRunFormulaReuseCompiled", action='store_true', dest="arellepyRunFormulaReuseCompiled", default=False, 
+                        help=_("Flag to parse formula XPath expressions once per formula worker and reuse them for all filings processed by the "
+                                "worker instead of parsing them again for each filing (the formula linkbase is still loaded with each filing), "
+                                "workers process up to 100 filings unless arellepyRunFormulaMaxFilingsPerWorker is given"))
+
+    parser.add_option("--arellepyRunFormulaDbBatchSize", action='store', type="int", dest="arellepyRunFormulaDbBatchSize", default=100, 
+                        help=_("Number of formula results written to db in one transaction, only valid if arellepyRunFormulaFromDBInsertResultIntoDb flag is set"))
+
+    parser.add_option("--arellepyRunFormulaCompress", action='store', dest="arellepyRunFormulaCompress", default=None, choices=['zlib', 'zstd'],
+                        help=_("Compress formula output and processing log stored in db and saved to files with the given codec, either 'zlib' or 'zstd' "
+                                "(zstd requires zstandard package, falls back to zlib if not installed)"))
+
+    parser.add_option("--arellepyRunFormulaResumeRunId", action='store', dest="arellepyRunFormulaResumeRunId", default=None, 
+                        help=_("Run id of an unfinished formula run to resume, filings recorded as processed successfully in the run journal for this run "
+                                "id are skipped, valid with both arellepyRunFormulaFromDB and arellepyRunFormula flags"))
+
+    parser.add_option("--arellepyRunFormulaUseCache", action='store_true', dest="arellepyRunFormulaUseCache", default=False,
+                        help=_("Flag to reuse cached formula results when the same formula is run on the same instances with the same arelle version and plugins, "
+                                "and to cache new results, only valid if arellepyRunFormula flag is set"))
+
+    parser.add_option("--arellepyRunFormulaCacheMaxSize", action='store', type="int", dest="arellepyRunFormulaCacheMaxSize", default=1024,
+                        help=_("Maximum size in MB of formula results cache, least recently used results are removed when exceeded, only valid if "
+                                "arellepyRunFormulaUseCache flag is set"))
+
+    parser.add_option("--arellepyRunFormulaFilingTimeout", action='store', type="int", dest="arellepyRunFormulaFilingTimeout", default=None,
+                        help=_("Seconds a formula worker subprocess may spend on one filing (linux only), the worker is killed when exceeded and the filing "
+                                "is reported as an error and quarantined"))
+
+    parser.add_option("--arellepyRunFormulaMaxFilingCpuTime", action='store', type="int", dest="arellepyRunFormulaMaxFilingCpuTime", default=None,
+                        help=_("CPU seconds a formula worker subprocess may use for one filing (linux only), the worker is killed when exceeded and the "
+                                "filing is reported as an error and quarantined"))
+
+    parser.add_option("--arellepyRunFormulaMaxWorkerAddressSpace", action='store', type="int", dest="arellepyRunFormulaMaxWorkerAddressSpace", default=None,
+                        help=_("Address space limit in MB for each formula worker subprocess (linux only), allocations beyond this limit fail and the "
+                                "filing being processed is reported as an error"))
     
 
+    parser.add_option("--arellepyNoDuplicateFacts", action='store_true', dest="arellepyNoDuplicateFacts", default=False,
+                        help=_("Flag to turn off duplicate facts detection, modelXbrl.duplicateFactsInfo will be None"))
+
+    parser.add_option("--arellepyRemoveInputDuplicates", action='store_true', dest="arellepyRemoveInputDuplicates", default=False,
+                        help=_("Flag to remove consistent duplicate facts (keeping the most precise fact of each set) from the loaded instance "
+                                "before validation and formula evaluation"))
+
+    parser.add_option("--arellepyDuplicateFactsEager", action='store_true', dest="arellepyDuplicateFactsEager", default=False,
+                        help=_("Flag to detect duplicate facts when the filing is loaded, by default duplicate facts are only detected when "
+                                "modelXbrl.duplicateFactsInfo is first accessed"))
+
+
+def formulaPoolOptions(options):
+    '''Returns dict of formula worker pool settings (see `CntlrPy.formulaPoolSettings`) given by arellepyRunFormula command line options'''
+    opts = dict(workers=options.arellepyRunFormulaWorkers,
+                maxFilingsPerWorker=options.arellepyRunFormulaMaxFilingsPerWorker,
+                maxWorkerMemory=options.arellepyRunFormulaMaxWorkerMemory,
+                reuseCompiledFormula=options.arellepyRunFormulaReuseCompiled or None,
+                filingTimeout=options.arellepyRunFormulaFilingTimeout,
+                maxFilingCpuTime=options.arellepyRunFormulaMaxFilingCpuTime,
+                maxWorkerAddressSpace=options.arellepyRunFormulaMaxWorkerAddressSpace)
+    return {k: v for k, v in opts.items() if v is not None}
+
+def formulaRunKwargs(options, fromDB=False):
+    '''Returns dict of keyword arguments for `CntlrPy.runFormula` (or `CntlrPy.runFormulaFromDBonRssItems` if `fromDB`) from
+    arellepyRunFormula command line options'''
+    runKwargs = dict(saveResultsToFolder=options.arellepyRunFormulaSaveResultsToFolder,
+                     folderPath=options.arellepyRunFormulaFolderPath,
+                     compress=options.arellepyRunFormulaCompress,
+                     resumeRunId=options.arellepyRunFormulaResumeRunId,
+                     removeInputDuplicates=options.arellepyRemoveInputDuplicates, 
+                     **formulaPoolOptions(options))
+    if fromDB:
+        runKwargs.update(insertResultIntoDb=options.arellepyRunFormulaFromDBInsertResultIntoDb,
+                         updateExistingResults=options.arellepyRunFormulaFromDBUpdateExistingResults,
+                         dbBatchSize=options.arellepyRunFormulaDbBatchSize)
+    else:
+        runKwargs.update(formulaString=options.arellepyRunFormulaString,
+                         formulaSourceFile=options.arellepyRunFormulaSourceFile,
+                         formulaId=options.arellepyRunFormulaId,
+                         writeFormulaToSourceFile=bool(options.arellepyRunFormulaWriteFormulaToSourceFile),
+                         useCache=options.arellepyRunFormulaUseCache,
+                         cacheMaxSize=options.arellepyRunFormulaCacheMaxSize)
+    return runKwargs
+
+def runFormulaFromOptions(cntlr, options, rssItems=None, conn=None):
+    '''Runs formula as set by arellepyRunFormula command line options, returns the run result dict or None if nothing was run.
+
+    With `--arellepyRunFormula` formula is run on pipe separated `--arellepyRunFormulaInstancesUrls`, or on `rssItems` if it is 'FROM_SEARCH',
+    with `--arellepyRunFormulaFromDB` formula `--arellepyRunFormulaId` in rssDB `conn` is run on `rssItems` (rssDB search results).
+    '''
+    try:
+        from .CntlrPy import runFormula, runFormulaFromDBonRssItems
+    except:
+        from CntlrPy import runFormula, runFormulaFromDBonRssItems
+
+    if options.arellepyRunFormulaFromDB:
+        if conn is None or not rssItems:
+            cntlr.addToLog(_('"--arellepyRunFormulaFromDB" requires rssDB connection and search results'),
+                    messageCode="arellepy.Error",  file=__name__,  level=logging.ERROR)
+            return None
+        try:
+            formulaId = int(options.arellepyRunFormulaId)
+        except (TypeError, ValueError):
+            formulaId = None
+        return runFormulaFromDBonRssItems(conn, rssItems, formulaId, returnResults=False, **formulaRunKwargs(options, fromDB=True))
+    if options.arellepyRunFormula:
+        urls = options.arellepyRunFormulaInstancesUrls or ''
+        instancesUrls = rssItems if urls.strip() == 'FROM_SEARCH' else [x.strip() for x in urls.split('|') if x.strip()]
+        if not instancesUrls:
+            cntlr.addToLog(_('No instances to run formula on, "--arellepyRunFormulaInstancesUrls" must be urls or FROM_SEARCH with search results'),
+                    messageCode="arellepy.Error",  file=__name__,  level=logging.ERROR)
+            return None
+        return runFormula(cntlr, instancesUrls, **formulaRunKwargs(options))
+    return None
+
 def utilityRun(cntlr, options, **kwargs):
     # print('arellepy utility run now!!')
     if options.arellepyRunFormula:
@@ -216,18 +459,22 @@ def utilityRun(cntlr, options, **kwargs):
             cntlr.addToLog(_('Only one of  "--arellepyRunFormulaFromDB" or "--arellepyRunFormula" can be chosen'),
                     messageCode="arellepy.Error",  file=__name__,  level=logging.ERROR)
             raise Exception(_('Only one of  "--arellepyRunFormulaFromDB" or "--arellepyRunFormula" can be chosen'))
+    # formula runs are started by the plugin holding the filings (such as rssDB on search results), worker pool options
+    # are kept with the cntlr so those runs use them (see `CntlrPy.formulaPoolSettings`)
+    cntlr.arellepyFormulaPoolOptions = formulaPoolOptions(options)
 
 
 def xbrlLoaded(cntlr, options, modelXbrl, *args, **kwargs):
-    # modelXbrl.duplicateFactsInfo = DuplicateFacts(modelXbrl, cntlr)
-    pass
+    # duplicate facts are detected on first access to modelXbrl.duplicateFactsInfo (or in filingEnd if eager)
+    modelXbrl.arellepyDetectDuplicates = not getattr(options, 'arellepyNoDuplicateFacts', False)
+    if getattr(options, 'arellepyRemoveInputDuplicates', False):
+        removeConsistentDuplicateFacts(modelXbrl)
 
 def filingEnd(cntlr, options, filesource, _entrypointFiles, *args, **kwargs):
     global memory_used_global, time_start_global
     modelXbrl = cntlr.modelManager.modelXbrl
-    startedAt = time.time()
-    modelXbrl.duplicateFactsInfo = DuplicateFacts(modelXbrl, cntlr)
-    modelXbrl.profileStat(("arellepy: detect-duplicates"), time.time() - startedAt)
+    if modelXbrl is not None and getattr(options, 'arellepyDuplicateFactsEager', False):
+        modelXbrl.duplicateFactsInfo # detect duplicates now, profile stat is recorded when detected
     modelXbrl.memory_change = cntlr.memoryUsed - memory_used_global
     modelXbrl.load_end_time = time.time()
     modelXbrl.load_start_time = time_start_global
@@ -241,6 +488,7 @@ def filingStart(cntlr, options, *args, **kwargs):
 
 def initFunc(cntlr, **kwargs):
     # print('arellepy init run now!!')
+    installDuplicateFactsProperties()
     # Add temps folder to config dir
     if not hasattr(cntlr, 'userAppTempDir'):
         cntlr.userAppTempDir = os.path.join(cntlr.userAppDir, 'temps')
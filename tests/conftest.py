@@ -0,0 +1,31 @@
+import os, sys, gettext, importlib, importlib.util
+
+import pytest
+
+gettext.install('arelle')
+# modules are imported as top level modules (same as when arellepy folder is in sys.path)
+repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repoDir)
+
+
+@pytest.fixture(scope='session')
+def arellepyPlugin():
+    '''The plugin package imported as `arellepy` (as by arelle plugin manager), arelle environment selection is skipped'''
+    if 'arellepy' not in sys.modules:
+        spec = importlib.util.spec_from_file_location('arellepy', os.path.join(repoDir, '__init__.py'), submodule_search_locations=[repoDir])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['arellepy'] = module
+        helpers = importlib.import_module('arellepy.HelperFuncs')
+        _config, _selectRunEnv = helpers.arellepyConfig, helpers.selectRunEnv
+        resourcesDir = os.environ.get('XDG_ARELLE_RESOURCES_DIR')
+        helpers.arellepyConfig = lambda parentDir: {'srcDir': None, 'appDir': None, 'env': None}
+        helpers.selectRunEnv = lambda **kwargs: resourcesDir or ''
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            helpers.arellepyConfig, helpers.selectRunEnv = _config, _selectRunEnv
+            if resourcesDir is None:
+                os.environ.pop('XDG_ARELLE_RESOURCES_DIR', None)
+        from arelle import ValidateXbrlCalcs
+        ValidateXbrlCalcs.init() # as done by arelle before validating, duplicate facts checks use its rangeValue
+    return sys.modules['arellepy']
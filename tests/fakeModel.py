@@ -0,0 +1,55 @@
+'''Minimal stand ins for arelle facts and modelXbrl used by duplicate facts tests'''
+from decimal import Decimal
+from types import SimpleNamespace as NS
+
+
+class Fact:
+    def __init__(self, objectIndex, isNumeric, value, decimals=None, precision=None, isNil=False, asFloat=False, hash=None):
+        self.objectIndex = objectIndex
+        self.concept = NS(isNumeric=isNumeric)
+        self.isNumeric = isNumeric
+        self.isNil = isNil
+        self.value = '' if isNil else value
+        self.decimals = decimals
+        self.precision = precision
+        self.conceptContextUnitHash = hash
+        self.xValid = 4
+        self.modelTupleFacts = []
+        if isNil:
+            self.xValue = None
+        elif isNumeric:
+            # NaN is only a value of float types, arelle has float xValue for it
+            self.xValue = float(value) if asFloat or value == 'NaN' else Decimal(value)
+        else:
+            self.xValue = value
+
+    def isVEqualTo(self, other):
+        return self.xValue == other.xValue
+
+    def __repr__(self):
+        return 'Fact({}, {}, d={}, p={}, nil={})'.format(self.objectIndex, self.value, self.decimals, self.precision, self.isNil)
+
+
+class ModelXbrl:
+    '''modelXbrl with `facts` (top level facts, tuples include their children in `modelTupleFacts`), `factsInInstance` of
+    all facts and `modelObjects` indexed by objectIndex'''
+    def __init__(self, facts):
+        self.uri = 'instance.xml'
+        self.facts = list(facts)
+        allFacts = []
+        def walk(facts):
+            for f in facts:
+                allFacts.append(f)
+                walk(f.modelTupleFacts)
+        walk(self.facts)
+        self.factsInInstance = set(allFacts)
+        self.modelObjects = [None] * (max(f.objectIndex for f in allFacts) + 1 if allFacts else 0)
+        for f in allFacts:
+            self.modelObjects[f.objectIndex] = f
+        self.messages = []
+        self.modelManager = NS(cntlr=NS(addToLog=lambda msg, **kwargs: self.messages.append(msg)))
+
+
+def numericSet(hash, startIndex, values):
+    '''Returns duplicate facts (value, decimals) with conceptContextUnitHash `hash`, objectIndex from `startIndex`'''
+    return [Fact(startIndex + i, True, v, d, hash=hash) for i, (v, d) in enumerate(values)]
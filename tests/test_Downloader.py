@@ -0,0 +1,104 @@
+import os, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace as NS
+
+import pytest
+
+from Downloader import Downloader, DownloadError
+
+BODY = b'<html>' + b'x' * 100000 + b'</html>'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append((self.path, self.client_address[1]))
+        if self.path == '/doc.htm':
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+        elif self.path == '/moved.htm':
+            self.send_response(301)
+            self.send_header('Location', '/doc.htm')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path == '/truncated.htm':
+            # connection dropped half way
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY[:len(BODY) // 2])
+            self.close_connection = True
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    Handler.requests = []
+    d = Downloader(cacheDir=str(tmp_path / 'cache'))
+    yield d
+    d.close()
+
+
+def filesIn(folder):
+    return sorted(os.path.relpath(os.path.join(root, x), folder) for root, dirs, files in os.walk(folder) for x in files)
+
+
+def test_download_cached_and_copied(server, downloader, tmp_path):
+    path = downloader.download(server + '/doc.htm')
+    with open(path, 'rb') as f:
+        assert f.read() == BODY
+    dest = downloader.download(server + '/doc.htm', destPath=str(tmp_path / 'report' / 'doc.htm'))
+    with open(dest, 'rb') as f:
+        assert f.read() == BODY
+    # second request served from cache, redirect followed over the same kept alive connection
+    assert downloader.download(server + '/moved.htm') != path
+    assert [p for p, port in Handler.requests] == ['/doc.htm', '/moved.htm', '/doc.htm']
+    assert len(set(port for p, port in Handler.requests)) == 1
+    assert downloader.exists(server + '/doc.htm')
+
+
+def test_failed_download_leaves_no_file(server, downloader, tmp_path):
+    with pytest.raises(DownloadError) as e:
+        downloader.download(server + '/missing.htm')
+    assert e.value.status == 404
+    with pytest.raises(DownloadError):
+        downloader.download(server + '/truncated.htm')
+    assert filesIn(str(tmp_path / 'cache')) == []
+    # file in cache is kept when reloading it fails
+    cachePath = downloader.cachePath(server + '/truncated.htm')
+    with open(cachePath, 'wb') as f:
+        f.write(b'old')
+    with pytest.raises(DownloadError):
+        downloader.download(server + '/truncated.htm', reload=True)
+    with open(cachePath, 'rb') as f:
+        assert f.read() == b'old'
+    assert len(filesIn(str(tmp_path / 'cache'))) == 1
+    # connection is renewed after the failure
+    assert downloader.download(server + '/doc.htm')
+
+
+def test_offline_not_in_cache(tmp_path):
+    d = Downloader(webCache=NS(cacheDir=str(tmp_path), workOffline=True))
+    with pytest.raises(DownloadError):
+        d.download('https://www.sec.gov/doc.htm')
+    assert not d.exists('https://www.sec.gov/doc.htm')
@@ -0,0 +1,88 @@
+from types import SimpleNamespace as NS
+
+import pytest
+
+from fakeModel import Fact, ModelXbrl, numericSet
+
+
+def makeModelXbrl():
+    # set h1 consistent (most precise is objectIndex 2), set h2 inconsistent (most precise is objectIndex 4), h3 not duplicated
+    return ModelXbrl(numericSet('h1', 1, [('1000', '-3'), ('1000', '0')]) + numericSet('h2', 3, [('5', '0'), ('6', '1')]) + 
+                     [Fact(5, True, '7', '0', hash='h3')])
+
+
+def test_detection_keeps_compact_store(arellepyPlugin):
+    mx = makeModelXbrl()
+    info = arellepyPlugin.DuplicateFacts(mx, mx.modelManager.cntlr)
+    # nothing is set on the modelXbrl and index views are only computed when read
+    assert 'dupFactsIndexes' not in mx.__dict__
+    assert 'dupFactsIndexes' not in info.__dict__
+    assert (info.all_dup_facts_sets_count, info.all_dup_facts_count) == (2, 4)
+    assert (info.inconsistent_dup_facts_sets_count, info.consistent_dup_facts_sets_count) == (1, 1)
+    assert info.dupFactsIndexes == {1, 3}
+    assert info.most_precise_dup_facts_set_indexes == {2, 4}
+    assert sorted((h, inconsistent, list(indexes)) for h, inconsistent, indexes in info.iterDupSets()) == [('h1', False, [2, 1]), ('h2', True, [4, 3])]
+
+
+def test_detection_without_modelXbrl(arellepyPlugin):
+    info = arellepyPlugin.DuplicateFacts(None, None)
+    assert info.all_dup_facts_sets_count == 0
+    assert info.dupFactsIndexes == set()
+    assert info.dup_facts_sets_by_hash == dict()
+
+
+def loadedModelXbrl(plugin, options):
+    '''Returns arelle ModelXbrl with the facts of `makeModelXbrl` passed through arellepy load hooks'''
+    from arelle.ModelXbrl import ModelXbrl as ArelleModelXbrl
+    plugin.installDuplicateFactsProperties()
+    mx = ArelleModelXbrl.__new__(ArelleModelXbrl)
+    mx.__dict__.update(makeModelXbrl().__dict__)
+    mx.profileStat = lambda *args, **kwargs: None
+    cntlr = NS(modelManager=NS(modelXbrl=mx), memoryUsed=0)
+    plugin.xbrlLoaded(cntlr, options, mx)
+    plugin.filingEnd(cntlr, options, None, None)
+    return mx
+
+
+@pytest.fixture
+def detections(arellepyPlugin, monkeypatch):
+    detected = []
+    _getDups = arellepyPlugin.DuplicateFacts._getDups
+    def getDups(self, mx, cntlr):
+        detected.append(mx)
+        return _getDups(self, mx, cntlr)
+    monkeypatch.setattr(arellepyPlugin.DuplicateFacts, '_getDups', getDups)
+    return detected
+
+
+def test_loading_does_not_detect_duplicates_until_read(arellepyPlugin, detections):
+    mx = loadedModelXbrl(arellepyPlugin, NS())
+    assert detections == []
+    assert '_arellepyDuplicateFactsInfo' not in mx.__dict__
+    assert mx.dupFactsIndexes == {1, 3}
+    info = mx.duplicateFactsInfo
+    assert info.all_dup_facts_sets_count == 2
+    assert detections == [mx]
+
+
+def test_detection_eager_or_off_by_options(arellepyPlugin, detections):
+    mx = loadedModelXbrl(arellepyPlugin, NS(arellepyDuplicateFactsEager=True))
+    assert detections == [mx]
+    mx = loadedModelXbrl(arellepyPlugin, NS(arellepyNoDuplicateFacts=True))
+    assert mx.duplicateFactsInfo is None
+    assert mx.dupFactsIndexes == set()
+    assert len(detections) == 1
+
+
+def test_remove_duplicates_keeps_tuple_children_in_sync(arellepyPlugin):
+    # h1 set has top level facts 1 and 2 (most precise) and 3, a child of tuple 4, h2 is inconsistent
+    child = Fact(3, True, '1000', '-6', hash='h1')
+    tupleFact = Fact(4, False, 'tuple', hash='t')
+    tupleFact.modelTupleFacts = [child]
+    mx = ModelXbrl(numericSet('h1', 1, [('1000', '-3'), ('1000', '0')]) + [tupleFact] + numericSet('h2', 5, [('5', '0'), ('6', '1')]))
+    mx.arellepyDetectDuplicates = True
+    assert arellepyPlugin.removeConsistentDuplicateFacts(mx) == 1
+    assert sorted(f.objectIndex for f in mx.facts) == [2, 4, 5, 6]
+    assert tupleFact.modelTupleFacts == [child]
+    # factsInInstance is still the top level facts and their tuple children
+    assert mx.factsInInstance == set(mx.facts) | {child}
@@ -0,0 +1,69 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+import DuplicateFactsEngine
+from fakeModel import Fact
+
+numpy = pytest.importorskip('numpy')
+
+VALUES = ['1000', '1000.4', '999.6', '1500', '1234567.891', '0.1', '0', '-250', '1E3', '2.5', '1000.5', 'NaN']
+DECIMALS = [('-3', None), ('-2', None), ('0', None), ('2', None), ('INF', None), (None, '3'), (None, '0'), (None, 'INF')]
+
+
+def randomGroups(seed, n=400):
+    rnd = random.Random(seed)
+    groups = []
+    i = 0
+    for g in range(n):
+        kind = rnd.choice(['numeric'] * 6 + ['nil', 'text'])
+        dups = []
+        base = rnd.choice(VALUES)
+        for _ in range(rnd.randint(2, 5)):
+            i += 1
+            if kind == 'text':
+                dups.append(Fact(i, False, rnd.choice(['a', 'a', 'b'])))
+                continue
+            decimals, precision = rnd.choice(DECIMALS)
+            value = base if rnd.random() < 0.6 else rnd.choice(VALUES)
+            isNil = kind == 'nil' and rnd.random() < 0.7
+            dups.append(Fact(i, True, value, decimals, precision, isNil=isNil, asFloat=rnd.random() < 0.1))
+        groups.append(dups)
+    # near ties: bounds meeting exactly or overlapping by less than float resolution
+    for d in ('-3', '-2', '0', '2'):
+        i += 2
+        half = Decimal(10) ** -int(d) / 2
+        groups.append([Fact(i, True, '1000', d), Fact(i + 1, True, str(Decimal('1000') + 2 * half), d)])
+        groups.append([Fact(i, True, '1000', '-3'), Fact(i + 1, True, str(Decimal('1000') + Decimal('500') + half), d)])
+    return groups
+
+
+@pytest.fixture
+def exactCheck(arellepyPlugin):
+    return arellepyPlugin.DuplicateFacts._has_inconsistent_duplicates
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_vectorized_results_same_as_exact_check(seed, exactCheck, monkeypatch):
+    from arelle.ValidateXbrlCalcs import inferredPrecision
+    groups = randomGroups(seed)
+    calls = []
+    def countedCheck(dups):
+        calls.append(dups)
+        return exactCheck(dups)
+
+    ordered = DuplicateFactsEngine.orderDuplicateGroups(groups)
+    vectorized = DuplicateFactsEngine.inconsistentDuplicateGroups(ordered, countedCheck)
+    assert 0 < len(calls) < len(groups) # some sets decided with arrays, others fall back to exact check
+    monkeypatch.setattr(DuplicateFactsEngine, 'numpy', None)
+    assert DuplicateFactsEngine.orderDuplicateGroups(groups) == ordered
+    assert DuplicateFactsEngine.inconsistentDuplicateGroups(ordered, exactCheck) == vectorized
+
+    for dups, sortedDups, inconsistent in zip(groups, ordered, vectorized):
+        if all(f.isNumeric for f in dups):
+            expected = sorted(dups, key=inferredPrecision, reverse=True)
+        else:
+            expected = sorted(dups, key=lambda f: f.objectIndex)
+        assert sortedDups == expected
+        assert inconsistent == exactCheck(sortedDups), sortedDups
@@ -0,0 +1,34 @@
+import math
+from types import SimpleNamespace as NS
+
+import DuplicateFactsSurvey
+
+
+class DupInfo:
+    def __init__(self, sets):
+        self.sets = sets
+
+    def iterDupSets(self):
+        return iter(self.sets)
+
+
+def fact(decimals):
+    return NS(isNumeric=True, qname='t:A', contextID='c', unitID='u', value='1000', decimals=decimals, precision=None)
+
+
+def surveyRows(decimalsOfSets):
+    objects = []
+    sets = []
+    for i, decs in enumerate(decimalsOfSets):
+        sets.append((i, False, list(range(len(objects), len(objects) + len(decs)))))
+        objects.extend(fact(d) for d in decs)
+    mx = NS(duplicateFactsInfo=DupInfo(sets), modelObjects=objects)
+    return DuplicateFactsSurvey.duplicateFactsSurveyRows(mx, 1, 'entry.xml')
+
+
+def test_precision_spread_ignores_inf_decimals():
+    rows = surveyRows([['INF', '-3', '0'], ['INF', 'INF'], ['-6', '-3']])
+    assert rows[0]['precisionSpread'] == 3.0
+    assert rows[0]['maxDecimals'] == math.inf
+    assert rows[1]['precisionSpread'] is None
+    assert rows[2]['precisionSpread'] == 3.0
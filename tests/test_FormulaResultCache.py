@@ -0,0 +1,64 @@
+import os
+
+from FormulaResultCache import FormulaResultCache, documentSetKey
+
+
+SCHEMA = '''<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:link="http://www.xbrl.org/2003/linkbase">
+  <xs:annotation><xs:appinfo><link:linkbaseRef xlink:href="ext_cal.xml" xmlns:xlink="http://www.w3.org/1999/xlink"/></xs:appinfo></xs:annotation>
+  <xs:import namespace="http://fasb.org/us-gaap/2023" schemaLocation="https://xbrl.fasb.org/us-gaap/2023/elts/us-gaap-2023.xsd"/>
+</xs:schema>'''
+
+INSTANCE = '''<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:link="http://www.xbrl.org/2003/linkbase"
+  xmlns:xlink="http://www.w3.org/1999/xlink"><link:schemaRef xlink:href="ext.xsd#frag" xlink:type="simple"/></xbrli:xbrl>'''
+
+FORMULA = '''<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+  xsi:schemaLocation="http://xbrl.org/2008/formula functions.xsd"/>'''
+
+
+def write(folder, name, text):
+    path = os.path.join(str(folder), name)
+    with open(path, 'w') as fd:
+        fd.write(text)
+    return path
+
+
+def makeFiling(folder):
+    os.makedirs(str(folder))
+    write(folder, 'ext.xsd', SCHEMA)
+    write(folder, 'ext_cal.xml', '<calc/>')
+    return write(folder, 'instance.xml', INSTANCE)
+
+
+def test_document_set_follows_local_references(tmp_path):
+    instance = makeFiling(tmp_path / 'a')
+    assert [x[0] for x in documentSetKey(instance)] == ['', 'ext.xsd', 'ext_cal.xml', 'https://xbrl.fasb.org/us-gaap/2023/elts/us-gaap-2023.xsd']
+    # same documents in another folder give the same key
+    assert documentSetKey(makeFiling(tmp_path / 'b')) == documentSetKey(instance)
+
+
+def test_editing_dts_document_changes_key(tmp_path):
+    cache = FormulaResultCache(str(tmp_path / 'cache'))
+    instance = makeFiling(tmp_path / 'filing')
+    key = cache.makeKey(instance, FORMULA)
+    assert cache.makeKey(instance, FORMULA) == key
+    write(tmp_path / 'filing', 'ext_cal.xml', '<calc changed="1"/>')
+    assert cache.makeKey(instance, FORMULA) != key
+
+
+def test_editing_formula_import_changes_key(tmp_path):
+    formulaDir = tmp_path / 'formula'
+    os.makedirs(str(formulaDir))
+    formulaFile = write(formulaDir, 'formula.xml', FORMULA)
+    write(formulaDir, 'functions.xsd', '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"/>')
+    extraImport = write(formulaDir, 'extra.xml', '<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase"/>')
+    imports = formulaFile + '|' + extraImport
+    key = FormulaResultCache(str(tmp_path / 'cache')).makeKey('https://example.com/instance.xml', FORMULA, imports=imports)
+    write(formulaDir, 'functions.xsd', '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" id="changed"/>')
+    assert FormulaResultCache(str(tmp_path / 'cache')).makeKey('https://example.com/instance.xml', FORMULA, imports=imports) != key
+    write(formulaDir, 'extra.xml', '<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" id="changed"/>')
+    cache = FormulaResultCache(str(tmp_path / 'cache'))
+    newKey = cache.makeKey('https://example.com/instance.xml', FORMULA, imports=imports)
+    assert newKey != key
+    # formula imports are keyed once per cache
+    write(formulaDir, 'extra.xml', '<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" id="again"/>')
+    assert cache.makeKey('https://example.com/instance.xml', FORMULA, imports=imports) == newKey
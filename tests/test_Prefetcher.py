@@ -0,0 +1,68 @@
+import threading, time
+
+from Prefetcher import Prefetcher, RateLimiter
+
+
+def test_rate_limit_spaces_requests_across_threads():
+    limiter = RateLimiter(maxPerSecond=20)
+    calls = []
+    lock = threading.Lock()
+    def call():
+        limiter.wait()
+        with lock:
+            calls.append(time.monotonic())
+    threads = [threading.Thread(target=call) for i in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    calls.sort()
+    assert all(b - a >= 0.05 - 0.005 for a, b in zip(calls, calls[1:]))
+    assert calls[-1] - calls[0] >= 0.45 - 0.01
+
+
+def test_no_rate_limit():
+    limiter = RateLimiter(None)
+    start = time.monotonic()
+    for i in range(1000):
+        limiter.wait()
+    assert time.monotonic() - start < 0.5
+
+
+def test_fetches_ahead_while_processing():
+    fetched = []
+    def fetch(item):
+        fetched.append(item)
+        if item == 2:
+            raise IOError('not found')
+    seen = []
+    for item, err in Prefetcher(fetch, range(6), lookAhead=2, threads=2):
+        # items up to 2 ahead are fetched (or being fetched) while an item is processed, never more
+        time.sleep(0.05)
+        assert set(fetched) <= set(range(item + 3))
+        assert set(range(item + 1)) <= set(fetched)
+        seen.append((item, str(err) if err else None))
+    # items are yielded in order, failed fetches are reported with their item
+    assert seen == [(0, None), (1, None), (2, 'not found'), (3, None), (4, None), (5, None)]
+
+
+def test_rate_limited_prefetch_hides_fetch_time():
+    limiter = RateLimiter(maxPerSecond=50)
+    def fetch(item):
+        limiter.wait()
+        time.sleep(0.1)
+    start = time.monotonic()
+    for item, err in Prefetcher(fetch, range(8), lookAhead=4, threads=4):
+        time.sleep(0.1)
+    # serial fetch and processing would take 1.6s
+    assert time.monotonic() - start < 1.2
+
+
+def test_stopping_early_cancels_pending_fetches():
+    fetched = []
+    prefetcher = Prefetcher(lambda item: fetched.append(item), range(100), lookAhead=3, threads=1)
+    for item, err in prefetcher:
+        if item == 1:
+            break
+    prefetcher.close()
+    assert len(fetched) <= 5
@@ -0,0 +1,51 @@
+import os
+
+from RenderManifest import RenderManifest, reportFilesHashes
+
+SETUP = {'arelleVersion': '2.0', 'rendererVersion': '3.0', 'plugins': 'EdgarRenderer'}
+URL = 'https://www.sec.gov/Archives/edgar/data/1/000000000124000001/a-20231231.htm'
+
+
+def makeReport(folder, complete=True):
+    os.makedirs(folder)
+    names = ['FilingSummary.xml', 'R1.htm'] + (['additionalMeta.json'] if complete else [])
+    for name in names:
+        with open(os.path.join(folder, name), 'w') as f:
+            f.write(name)
+
+
+def test_unrecorded_complete_report_adopted(tmp_path):
+    folder = str(tmp_path / 'a-20231231_htm')
+    makeReport(folder)
+    manifest = RenderManifest(str(tmp_path / 'manifest.db'))
+    assert manifest.renderAction(URL, folder, SETUP, accessionNumber='0000000001-24-000001') == RenderManifest.SKIP
+    entry = manifest.get(URL)
+    assert entry['status'] == RenderManifest.ADOPTED
+    assert entry['fileHashes'] == reportFilesHashes(folder)
+    assert entry['accessionNumber'] == '0000000001-24-000001'
+    # adopted report stays current for another setup, rendered again only if forced
+    assert manifest.renderAction(URL, folder, dict(SETUP, rendererVersion='3.1'), accessionNumber=None) == RenderManifest.SKIP
+    assert manifest.renderAction(URL, folder, SETUP, forceRender=True) == RenderManifest.RERENDER
+    manifest.close()
+
+
+def test_unrecorded_incomplete_report_rendered(tmp_path):
+    folder = str(tmp_path / 'a-20231231_htm')
+    makeReport(folder, complete=False)
+    manifest = RenderManifest(str(tmp_path / 'manifest.db'))
+    assert manifest.renderAction(URL, folder, SETUP) == RenderManifest.RENDER
+    assert manifest.renderAction(URL, str(tmp_path / 'missing'), SETUP) == RenderManifest.RENDER
+    assert manifest.get(URL) is None
+    manifest.close()
+
+
+def test_stale_entries_rerendered(tmp_path):
+    folder = str(tmp_path / 'a-20231231_htm')
+    makeReport(folder)
+    manifest = RenderManifest(str(tmp_path / 'manifest.db'))
+    manifest.record(URL, folder, SETUP, RenderManifest.DONE, fileHashes=reportFilesHashes(folder))
+    assert manifest.renderAction(URL, folder, SETUP) == RenderManifest.SKIP
+    assert manifest.renderAction(URL, folder, dict(SETUP, arelleVersion='2.1')) == RenderManifest.RERENDER
+    manifest.record(URL, folder, SETUP, RenderManifest.FAILED, message='failed')
+    assert manifest.renderAction(URL, folder, SETUP) == RenderManifest.RERENDER
+    manifest.close()
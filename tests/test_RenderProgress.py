@@ -0,0 +1,69 @@
+import threading
+from types import SimpleNamespace as NS
+
+import RenderProgress as progressModule
+from RenderProgress import RenderProgress, formatProgress, statusCallback
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_events_counters_rate_and_eta(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(progressModule, 'time', NS(time=clock.time, strftime=progressModule.time.strftime, gmtime=progressModule.time.gmtime))
+    received = []
+    progress = RenderProgress(total=6, callback=lambda evt, stats: received.append((evt, stats)))
+    progress.skipped = 1
+    for key in 'abcde':
+        progress.emit(RenderProgress.QUEUED, key)
+    progress.emit(RenderProgress.DOWNLOADING, 'a', duration=0.5, bytes=100)
+    progress.emit(RenderProgress.RENDERING, 'a', pid=1)
+    clock.now += 60
+    progress.emit(RenderProgress.DONE, 'a', duration=40, bytes=1000, memory=2048)
+    clock.now += 60
+    evt = progress.emit(RenderProgress.FAILED, 'b', duration=70, errors=['bad'])
+    assert (evt['event'], evt['key'], evt['errors'], evt['time']) == ('failed', 'b', ['bad'], 1120.0)
+    stats = received[-1][1]
+    assert [x[0]['event'] for x in received] == ['queued'] * 5 + ['downloading', 'rendering', 'done', 'failed']
+    assert (stats['done'], stats['failed'], stats['skipped'], stats['remaining']) == (1, 1, 1, 3)
+    # 2 filings in 2 minutes, 3 to go
+    assert stats['rate'] == 1 / 60 and stats['eta'] == 180
+    assert stats['bytes'] == 1100 and stats['slowest'] == (70, 'b')
+    assert formatProgress(stats) == '1 done, 1 failed, 3 remaining of 6 | 1.00 filings/min | ETA 00:03:00'
+    assert progress.stats() == stats
+
+
+def test_no_eta_before_first_filing():
+    stats = RenderProgress(total=3).stats()
+    assert stats['eta'] is None and stats['remaining'] == 3
+    assert formatProgress(stats).endswith('ETA --:--:--')
+
+
+def test_status_line_shown_when_filing_finished():
+    shown = []
+    progress = RenderProgress(total=2, callback=statusCallback(NS(showStatus=shown.append)))
+    progress.emit(RenderProgress.QUEUED, 'a')
+    progress.emit(RenderProgress.RENDERING, 'a')
+    assert shown == []
+    progress.emit(RenderProgress.DONE, 'a', duration=1)
+    progress.emit(RenderProgress.FAILED, 'b')
+    assert len(shown) == 2 and shown[-1].startswith('1 done, 1 failed, 0 remaining of 2')
+
+
+def test_events_from_threads():
+    progress = RenderProgress(total=800)
+    def emitMany(event):
+        for i in range(200):
+            progress.emit(event, i, duration=0.001, bytes=1)
+    threads = [threading.Thread(target=emitMany, args=(event,)) for event in ['done', 'done', 'failed', 'failed']]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = progress.stats()
+    assert (stats['done'], stats['failed'], stats['remaining'], stats['bytes']) == (400, 400, 0, 400)
@@ -0,0 +1,61 @@
+import importlib
+from types import SimpleNamespace as NS
+
+import pytest
+
+from RunJournal import RunJournal
+
+
+def test_resume_skips_only_done_keys(tmp_path):
+    path = str(tmp_path / 'journal' / 'runs.db')
+    with RunJournal(path) as journal:
+        runId = journal.startRun(description='formula 1')
+        journal.recordMany(runId, [(1, 7), (2, 7)], RunJournal.DONE)
+        journal.record(runId, (3, 7), RunJournal.ERROR, 'failed')
+        # done in another run
+        journal.record(journal.startRun(), (4, 7), RunJournal.DONE)
+    # journal is kept after the process that wrote it is gone
+    with RunJournal(path) as journal:
+        assert journal.startRun(runId) == runId
+        doneKeys = journal.doneKeys(runId)
+        # ids given as numbers or text are matched as text
+        assert [k for k in [(1, 7), ('2', '7'), (3, 7), (4, 7), (5, 7)] if not journal.isDone(doneKeys, k)] == [(3, 7), (4, 7), (5, 7)]
+        journal.record(runId, (3, 7), RunJournal.DONE)
+        assert journal.runSummary(runId) == {'done': 3}
+
+
+def test_unknown_resume_id_starts_new_run(tmp_path):
+    with RunJournal(str(tmp_path / 'runs.db')) as journal:
+        assert journal.startRun('myRun') == 'myRun'
+        assert journal.doneKeys('myRun') == set()
+        assert journal.startRun('myRun') == 'myRun'
+
+
+@pytest.fixture
+def CntlrPy(arellepyPlugin):
+    return importlib.import_module('arellepy.CntlrPy')
+
+
+def test_resumed_formula_run_skips_done_instances(CntlrPy, tmp_path, monkeypatch):
+    ran = []
+    failing = {'b.xml'}
+    def iterFormulaRuns(cntlr, urlsDict, keys, inputRes, **kwargs):
+        for _k in keys:
+            ran.append(_k[0])
+            yield _k, {'filingId': _k[0], 'formulaId': _k[1], 'errors': 'failed' if _k[0] in failing else False}
+            if _k[0] == 'c.xml':
+                raise KeyboardInterrupt
+    monkeypatch.setattr(CntlrPy, 'iterFormulaRuns', iterFormulaRuns)
+    cntlr = NS(userAppDir=str(tmp_path), userAppTempDir=str(tmp_path), addToLog=lambda *args, **kwargs: None)
+    kwargs = dict(formulaString='<linkbase/>', formulaId='f1', journalPath=str(tmp_path / 'journal.db'))
+    instances = ['a.xml', 'b.xml', 'c.xml', 'd.xml']
+    runInfo = dict()
+    with pytest.raises(KeyboardInterrupt):
+        for res in CntlrPy.iterFormulaResults(cntlr, instances, runInfo=runInfo, **kwargs):
+            pass
+    assert ran == ['a.xml', 'b.xml', 'c.xml']
+    ran.clear()
+    failing.clear()
+    results = [x['filingId'] for x in CntlrPy.iterFormulaResults(cntlr, instances, resumeRunId=runInfo['runId'], **kwargs)]
+    # failed and not run instances are run again
+    assert ran == results == ['b.xml', 'd.xml']
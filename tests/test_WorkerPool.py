@@ -0,0 +1,88 @@
+import os, sys, time
+
+import pytest
+
+from WorkerPool import WorkerPool
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='worker pool is linux only')
+
+
+def sleepTask(state, taskArgs):
+    time.sleep(taskArgs)
+    return taskArgs
+
+
+def test_onIdle_called_while_waiting():
+    idle = []
+    pool = WorkerPool(1, sleepTask)
+    assert list(pool.imap([('a', 2.5)], onIdle=lambda: idle.append(1))) == [('a', 2.5)]
+    assert idle
+
+
+def test_duplicate_keys_rejected():
+    pool = WorkerPool(2, sleepTask)
+    with pytest.raises(ValueError):
+        list(pool.imap([(0, 0), (0, 0), (1, 0)]))
+
+
+def test_all_tasks_returned():
+    pool = WorkerPool(2, sleepTask)
+    assert sorted(pool.imap([(0, 0), (1, 0.1), (2, 0)])) == [(0, 0), (1, 0.1), (2, 0)]
+
+
+def bigTask(state, taskArgs):
+    if taskArgs == 'hang':
+        time.sleep(60)
+    return 'x' * (8 * 1024 * 1024)
+
+
+def failInit():
+    raise MemoryError('address space too small')
+
+
+def test_killed_worker_does_not_stall_others():
+    pool = WorkerPool(3, bigTask, taskTimeout=2)
+    results = dict(pool.imap([('hang', 'hang')] + [(i, i) for i in range(6)]))
+    assert sorted(k for k in results if k != 'hang') == list(range(6))
+    assert all(len(results[i]) == 8 * 1024 * 1024 for i in range(6))
+    assert 'timed out' in results['hang']
+    assert [k for k, reason in pool.quarantined] == ['hang']
+
+
+def test_init_error_reported_per_task():
+    pool = WorkerPool(2, sleepTask, initFunc=failInit)
+    results = dict(pool.imap([(i, 0) for i in range(3)]))
+    assert sorted(results) == [0, 1, 2]
+    assert all('failed to initialize' in msg for msg in results.values())
+    assert sorted(k for k, reason in pool.quarantined) == [0, 1, 2]
+
+
+def initPid():
+    return os.getpid()
+
+
+def pidTask(state, taskArgs):
+    # state is set once per worker process
+    assert state == os.getpid()
+    return state
+
+
+def test_workers_kept_warm_across_tasks():
+    pool = WorkerPool(2, pidTask, initFunc=initPid)
+    pids = dict(pool.imap([(i, i) for i in range(10)]))
+    assert len(pids) == 10
+    assert len(set(pids.values())) <= 2
+
+
+def test_workers_recycled_after_max_tasks():
+    pool = WorkerPool(1, pidTask, initFunc=initPid, maxTasksPerWorker=3)
+    pids = dict(pool.imap([(i, i) for i in range(7)]))
+    assert [pids[i] for i in range(7)].count(pids[0]) == 3
+    assert len(set(pids.values())) == 3
+
+
+def test_workers_recycled_over_memory_ceiling():
+    # any worker uses more than 1MB, so each worker handles a single task
+    pool = WorkerPool(2, pidTask, initFunc=initPid, maxWorkerMemory=1)
+    pids = dict(pool.imap([(i, i) for i in range(4)]))
+    assert len(set(pids.values())) == 4
@@ -0,0 +1,60 @@
+from types import SimpleNamespace as NS
+from collections import defaultdict
+
+import pytest
+from lxml import etree
+
+import HelperFuncs
+import CntlrPy
+from HelperFuncs import compressText, decompressText, isCompressedText, writeTextFile, readTextFile, chkCompressionCodec
+
+TEXT = '<xbrl xmlns="http://www.xbrl.org/2003/instance">{}</xbrl>'.format('<fact>é</fact>' * 1000)
+
+
+def codecs():
+    return ['zlib', pytest.param('zstd', marks=pytest.mark.skipif(HelperFuncs._zstd() is None, reason='zstandard not installed'))]
+
+
+@pytest.mark.parametrize('codec', codecs())
+def test_text_round_trip(codec):
+    packed = compressText(TEXT, codec)
+    assert packed.startswith('arellepy:{}:'.format(codec)) and len(packed) < len(TEXT) / 10
+    assert isCompressedText(packed)
+    # compressing again does nothing
+    assert compressText(packed, codec) == packed
+    assert decompressText(packed) == TEXT
+
+
+def test_uncompressed_values_pass_through():
+    for value in (TEXT, '', None, 'arellepy:unknown:abc'):
+        assert decompressText(value) == value
+    assert compressText(TEXT, None) == TEXT
+
+
+@pytest.mark.parametrize('codec', [None] + codecs())
+def test_file_round_trip(codec, tmp_path):
+    path = writeTextFile(str(tmp_path / 'out.xml'), compressText(TEXT, 'zlib'), codec)
+    assert readTextFile(path) == TEXT
+    with open(path, 'rb') as fd:
+        assert (fd.read() == TEXT.encode('utf-8')) == (codec is None)
+
+
+def test_zstd_falls_back_to_zlib(monkeypatch):
+    monkeypatch.setattr(HelperFuncs, '_zstd', lambda: None)
+    with pytest.warns(HelperFuncs.CntlrPyWarning):
+        assert chkCompressionCodec('ZSTD') == 'zlib'
+    with pytest.raises(Exception):
+        chkCompressionCodec('lzma')
+
+
+def test_saved_formula_output_compressed(tmp_path):
+    cntlr = NS(addToLog=lambda *args, **kwargs: None)
+    result = {'filingId': 1, 'formulaId': 2, 'formulaOutput': compressText(TEXT, 'zlib'), 'processingLog': compressText('log', 'zlib')}
+    errors = defaultdict(list)
+    path = CntlrPy.saveFormulaOutputToFolder(cntlr, result, str(tmp_path), errors, compress='zlib')
+    assert path.endswith('.xml.gz') and not errors
+    assert readTextFile(path) == TEXT
+    assert CntlrPy.decompressFormulaResult(result) == {'filingId': 1, 'formulaId': 2, 'formulaOutput': TEXT, 'processingLog': 'log'}
+    path = CntlrPy.saveFormulaOutputToFolder(cntlr, result, str(tmp_path / 'plain'), errors)
+    # uncompressed files are written by lxml (non ascii characters as references)
+    assert path.endswith('.xml') and etree.tostring(etree.fromstring(readTextFile(path))) == etree.tostring(etree.fromstring(TEXT))
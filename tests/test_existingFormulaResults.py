@@ -0,0 +1,56 @@
+import sqlite3
+from types import SimpleNamespace as NS
+
+import CntlrPy
+
+
+class SqliteConn:
+    product = 'sqlite'
+
+    def __init__(self, keys):
+        self.dbConn = sqlite3.connect(':memory:')
+        self.dbConn.execute('CREATE TABLE "formulaeResults" ("filingId" INTEGER, "formulaId" INTEGER)')
+        self.dbConn.executemany('INSERT INTO "formulaeResults" VALUES (?, ?)', keys)
+        self.queries = []
+
+    def execute(self, sql, fetch=False):
+        self.queries.append(sql)
+        return self.dbConn.execute(sql).fetchall()
+
+
+class MongoConn:
+    product = 'mongodb'
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.queries = []
+        self.dbConn = NS(formulaeResults=NS(find=self.find))
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        return [{'filingId': f, 'formulaId': i} for f, i in self.keys
+                if i == query['formulaId'] and f in query['filingId']['$in']]
+
+
+KEYS = [(f, 1) for f in range(0, 50, 3)] + [(f, 2) for f in range(50)]
+
+
+def test_sql_lookup_in_chunks():
+    conn = SqliteConn(KEYS)
+    existing = CntlrPy.getExistingFormulaResultsKeys(conn, 1, range(40), chunkSize=7)
+    assert existing == {(f, 1) for f in range(0, 40, 3)}
+    assert len(conn.queries) == 6
+    assert all(' IN (' in q and ' OR ' not in q for q in conn.queries)
+
+
+def test_mongodb_lookup_in_chunks():
+    conn = MongoConn(KEYS)
+    existing = CntlrPy.getExistingFormulaResultsKeys(conn, 1, list(range(40)), chunkSize=7)
+    assert existing == {(f, 1) for f in range(0, 40, 3)}
+    assert [len(q['filingId']['$in']) for q in conn.queries] == [7] * 5 + [5]
+
+
+def test_no_filings_no_queries():
+    conn = SqliteConn(KEYS)
+    assert CntlrPy.getExistingFormulaResultsKeys(conn, 1, []) == set()
+    assert conn.queries == []
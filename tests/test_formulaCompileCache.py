@@ -0,0 +1,121 @@
+import importlib
+from types import SimpleNamespace as NS
+
+import pytest
+
+import CntlrPy
+
+TRACE_OPTIONS = CntlrPy.FORMULA_PARSE_TRACE_OPTIONS
+NSMAP = {'xff': 'http://www.xbrl.org/2010/function/formula', 'xs': 'http://www.w3.org/2001/XMLSchema', 
+         'xbrli': 'http://www.xbrl.org/2003/instance'}
+
+
+class ModelXbrl:
+    '''Stands in for modelXbrl of an instance DTS, messages are logged to `messages`'''
+    def __init__(self, customFunctions=(), pluginFunctions=(), **formulaOptions):
+        self.errors = []
+        self.messages = []
+        self.modelCustomFunctionSignatures = {f: None for f in customFunctions}
+        hooks = lambda name: [lambda: {f: None for f in pluginFunctions}] if name == 'Formula.CustomFunctions' else []
+        self.modelManager = NS(customTransforms={}, cntlr=NS(plugins=NS(hooks=hooks)),
+                               formulaOptions=NS(**{x: formulaOptions.get(x, False) for x in TRACE_OPTIONS}))
+
+    def log(self, level, codes, msg, **args):
+        self.messages.append(codes)
+        if level == 'ERROR':
+            self.errors.append(codes)
+
+    def error(self, codes, msg, **args):
+        self.log('ERROR', codes, msg, **args)
+
+    def info(self, codes, msg, **args):
+        self.log('INFO', codes, msg, **args)
+
+    def debug(self, codes, msg, **args):
+        self.log('DEBUG', codes, msg, **args)
+
+
+def element(localName='valueAssertion', uri='formula.xml'):
+    return NS(nsmap=NSMAP, localName=localName, namespaceURI='http://xbrl.org/2008/assertion/value', modelDocument=NS(uri=uri))
+
+
+@pytest.fixture
+def countingParser(monkeypatch):
+    XPathParser = CntlrPy._xpathParserModule()
+    calls = []
+
+    def parse(modelObject, xpathExpression, element, name, traceType):
+        calls.append(xpathExpression)
+        if xpathExpression == 'bad':
+            modelObject.modelXbrl.error('err:XPST0003', 'parse error')
+        return [XPathParser.ProgHeader(modelObject, name, element, xpathExpression, traceType), ('op', xpathExpression)]
+
+    monkeypatch.setattr(XPathParser, 'parse', parse)
+    CntlrPy.enableFormulaCompileCache()
+    yield XPathParser, calls
+    CntlrPy.disableFormulaCompileCache()
+    assert XPathParser.parse is parse
+
+
+@pytest.fixture
+def realParser():
+    XPathParser = CntlrPy._xpathParserModule()
+    _parse = XPathParser.parse
+    CntlrPy.enableFormulaCompileCache()
+    yield XPathParser
+    CntlrPy.disableFormulaCompileCache()
+    assert XPathParser.parse is _parse
+
+
+def test_programs_reused_across_instances_with_same_dts_bindings(countingParser):
+    XPathParser, calls = countingParser
+    for mx in (ModelXbrl(), ModelXbrl()):
+        prog = XPathParser.parse(NS(modelXbrl=mx), '$v gt 0', element(), 'test', 1)
+        assert prog[0].modelObject.modelXbrl is mx
+        assert prog[1:] == [('op', '$v gt 0')]
+    assert calls == ['$v gt 0']
+
+
+def test_cache_keyed_on_dts_and_errors_not_cached(countingParser):
+    XPathParser, calls = countingParser
+    for mx in (ModelXbrl(), ModelXbrl(), ModelXbrl(['my:f']), ModelXbrl(pluginFunctions=['my:g'])):
+        for expr in ('$v gt 0', 'bad'):
+            XPathParser.parse(NS(modelXbrl=mx), expr, element(), 'test', 1)
+        assert mx.errors == ['err:XPST0003']
+    assert calls == ['$v gt 0', 'bad', 'bad', '$v gt 0', 'bad', '$v gt 0', 'bad']
+
+
+def test_cache_keyed_on_element(countingParser):
+    XPathParser, calls = countingParser
+    for localName in ('valueAssertion', 'valueAssertion', 'factVariable'):
+        XPathParser.parse(NS(modelXbrl=ModelXbrl()), '$v gt 0', element(localName), 'test', 1)
+    XPathParser.parse(NS(modelXbrl=ModelXbrl()), '$v gt 0', element(uri='other.xml'), 'test', 1)
+    XPathParser.parse(NS(modelXbrl=ModelXbrl()), '$v gt 0', element(), 'test', 2)
+    assert len(calls) == 4
+
+
+def test_element_parse_errors_reported_after_cached(realParser):
+    from arelle.ModelFormulaObject import Trace
+    expr = "xff:uncovered-aspect(xs:QName('xbrli:unit')) eq 1"
+    allowed = ModelXbrl()
+    realParser.parse(NS(modelXbrl=allowed), expr, element('valueAssertion'), 'test', Trace.VARIABLE_SET)
+    assert allowed.errors == []
+    for i in range(2):
+        notAllowed = ModelXbrl()
+        realParser.parse(NS(modelXbrl=notAllowed), expr, element('factVariable'), 'test', Trace.VARIABLE)
+        assert notAllowed.errors == ['xffe:invalidFunctionUse']
+
+
+def test_trace_messages_logged_for_each_instance(realParser):
+    from arelle.ModelFormulaObject import Trace
+    for traced in (False, True, True):
+        mx = ModelXbrl(traceVariableSetExpressionSource=traced)
+        prog = realParser.parse(NS(modelXbrl=mx), '1 eq 1', element(), 'test', Trace.VARIABLE_SET)
+        assert mx.messages == (['formula:trace'] if traced else [])
+        assert len(prog) > 1
+
+
+def test_modules_importing_parse_by_name_patched(realParser):
+    ModelRenderingObject = importlib.import_module('arelle.ModelRenderingObject')
+    assert ModelRenderingObject.parse is realParser.parse
+    assert ModelRenderingObject.parse.arellepyOriginalParse
@@ -0,0 +1,91 @@
+import sys, optparse, importlib
+from types import SimpleNamespace as NS
+
+import pytest
+
+
+class RecordingPool:
+    '''Stands in for `WorkerPool`, records settings and returns each task args as result'''
+    created = []
+
+    def __init__(self, workers, taskFunc, **kwargs):
+        self.workers = workers
+        self.kwargs = kwargs
+        self.quarantined = []
+        RecordingPool.created.append(self)
+
+    def imap(self, tasks, onIdle=None):
+        return iter(list(tasks))
+
+
+@pytest.fixture
+def plugin(arellepyPlugin, monkeypatch):
+    RecordingPool.created = []
+    importlib.import_module('arellepy.CntlrPy')
+    monkeypatch.setattr(arellepyPlugin.CntlrPy, 'WorkerPool', RecordingPool)
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    return arellepyPlugin
+
+
+def parseOptions(plugin, args):
+    parser = optparse.OptionParser()
+    plugin.arellepyCmdLineOptionExtender(parser)
+    return parser.parse_args(args)[0]
+
+
+def runPoolWorkers(plugin, cntlr, **kwargs):
+    urlsDict = {(1, 7): (1, 'https://example.com/a.xml', 0), (2, 7): (2, 'https://example.com/b.xml', 0)}
+    inputRes = {'inputFile': 'formula.xml', 'formulaId': 7}
+    list(plugin.CntlrPy.iterFormulaRuns(cntlr, urlsDict, list(urlsDict), inputRes, **kwargs))
+    return RecordingPool.created[-1]
+
+
+def makeCntlr():
+    return NS(userAppDir='/tmp', configDir='/tmp/config', addToLog=lambda *args, **kwargs: None)
+
+
+def test_workers_option_sets_pool_of_runs_started_by_other_plugins(plugin):
+    cntlr = makeCntlr()
+    options = parseOptions(plugin, ['--arellepyRunFormulaFromDB', '--arellepyRunFormulaWorkers', '3', 
+                                    '--arellepyRunFormulaFilingTimeout', '30'])
+    plugin.utilityRun(cntlr, options)
+    # such as rssDB plugin running formula on search results without passing worker settings
+    pool = runPoolWorkers(plugin, cntlr)
+    assert pool.workers == 3
+    assert pool.kwargs['taskTimeout'] == 30
+    # settings given by the caller are kept
+    assert runPoolWorkers(plugin, cntlr, workers=2).workers == 2
+
+
+def test_default_is_one_worker(plugin):
+    cntlr = makeCntlr()
+    plugin.utilityRun(cntlr, parseOptions(plugin, []))
+    assert cntlr.arellepyFormulaPoolOptions == {}
+    pool = runPoolWorkers(plugin, cntlr)
+    assert pool.workers == 1
+    assert pool.kwargs['maxTasksPerWorker'] == 1
+
+
+def test_utilityRun_does_not_run_formula(plugin, monkeypatch):
+    def noRun(*args, **kwargs):
+        raise AssertionError('utilityRun started a formula run')
+    monkeypatch.setattr(plugin.CntlrPy, 'runFormula', noRun)
+    monkeypatch.setattr(plugin.CntlrPy, 'runFormulaFromDBonRssItems', noRun)
+    plugin.utilityRun(makeCntlr(), parseOptions(plugin, ['--arellepyRunFormula', '--arellepyRunFormulaInstancesUrls', 
+                                                         'https://example.com/a.xml', '--arellepyRunFormulaWorkers', '2']))
+
+
+def test_formulaRunKwargs_pass_pool_options(plugin):
+    options = parseOptions(plugin, ['--arellepyRunFormulaWorkers', '4', '--arellepyRunFormulaReuseCompiled'])
+    kwargs = plugin.formulaRunKwargs(options, fromDB=True)
+    assert kwargs['workers'] == 4 and kwargs['reuseCompiledFormula'] is True
+    assert 'maxFilingsPerWorker' not in kwargs
+
+
+def test_reuse_compiled_keeps_explicit_maxFilingsPerWorker(plugin, monkeypatch):
+    monkeypatch.setattr(plugin.CntlrPy, 'enableFormulaCompileCache', lambda: None)
+    cntlr = makeCntlr()
+    assert runPoolWorkers(plugin, cntlr, reuseCompiledFormula=True).kwargs['maxTasksPerWorker'] == plugin.CntlrPy.REUSE_COMPILED_FILINGS_PER_WORKER
+    assert runPoolWorkers(plugin, cntlr, reuseCompiledFormula=True, maxFilingsPerWorker=1).kwargs['maxTasksPerWorker'] == 1
+    plugin.utilityRun(cntlr, parseOptions(plugin, ['--arellepyRunFormulaReuseCompiled', '--arellepyRunFormulaMaxFilingsPerWorker', '1']))
+    assert runPoolWorkers(plugin, cntlr).kwargs['maxTasksPerWorker'] == 1
@@ -0,0 +1,145 @@
+import sqlite3
+
+import pytest
+from types import SimpleNamespace as NS
+
+import CntlrPy
+
+
+class SqliteConn:
+    '''Minimal stand in for rssDB sqlite connection'''
+    product = 'sqlite'
+
+    def __init__(self, unique=True):
+        self.dbConn = sqlite3.connect(':memory:')
+        self.dbConn.execute('CREATE TABLE "formulaeResults" ("filingId" INTEGER, "formulaId" INTEGER, "formulaOutput" TEXT{})'.format(
+                            ', UNIQUE ("filingId", "formulaId")' if unique else ''))
+        self.conParams = {'database': ':memory:'}
+        self.cntlr = NS(addToLog=lambda *args, **kwargs: None)
+        self.fallbackCalls = []
+
+    def execute(self, sql, fetch=False):
+        cur = self.dbConn.execute(sql)
+        return cur.fetchall() if fetch else None
+
+    def insertUpdateRssDB(self, rows, table, action='insert', *args, **kwargs):
+        self.fallbackCalls.append((action, len(rows)))
+        return {action: len(rows)}
+
+    def rows(self):
+        return sorted(self.dbConn.execute('SELECT "filingId", "formulaId", "formulaOutput" FROM "formulaeResults"').fetchall())
+
+
+def row(filingId, output):
+    # keys not in the table (errors) are not written
+    return {'filingId': filingId, 'formulaId': 1, 'formulaOutput': output, 'errors': False}
+
+
+def test_native_upsert_inserts_and_replaces_in_one_batch():
+    conn = SqliteConn()
+    flushed = []
+    with CntlrPy.FormulaResultsWriter(conn, batchSize=10, onFlush=lambda rows, ok: flushed.append((len(rows), ok))) as w:
+        w.add(row(1, 'a'))
+        w.add(row(2, 'b'))
+    with CntlrPy.FormulaResultsWriter(conn, batchSize=10) as w:
+        w.add(row(2, 'c'), update=True)
+        w.add(row(3, 'd'))
+    assert conn.rows() == [(1, 1, 'a'), (2, 1, 'c'), (3, 1, 'd')]
+    assert flushed == [(2, True)]
+    assert w.stats == [{'insert': 1, 'update': 1}]
+    assert conn.fallbackCalls == []
+
+
+def test_falls_back_without_unique_constraint():
+    conn = SqliteConn(unique=False)
+    with CntlrPy.FormulaResultsWriter(conn, batchSize=10) as w:
+        w.add(row(1, 'a'))
+        w.add(row(2, 'b'), update=True)
+    assert conn.fallbackCalls == [('insert', 1), ('update', 1)]
+    assert not w.nativeUpsert
+
+
+def test_flush_if_due():
+    conn = SqliteConn()
+    w = CntlrPy.FormulaResultsWriter(conn, batchSize=10, flushInterval=3600)
+    w.add(row(1, 'a'))
+    w.flushIfDue()
+    assert conn.rows() == []
+    w.flushInterval = 0
+    w.flushIfDue()
+    assert conn.rows() == [(1, 1, 'a')]
+
+
+class LockingConn(SqliteConn):
+    '''Sqlite stand in whose first `locks` upserts fail as if the db was locked'''
+    def __init__(self, locks):
+        super().__init__()
+        self.locks = locks
+        realConn = self.dbConn
+        conn = self
+        class Locking:
+            def cursor(self):
+                if conn.locks:
+                    conn.locks -= 1
+                    raise sqlite3.OperationalError('database is locked')
+                return realConn.cursor()
+            def __getattr__(self, name):
+                return getattr(realConn, name)
+        self.dbConn = Locking()
+
+
+def test_write_errors_are_retried_not_fallen_back():
+    conn = LockingConn(locks=2)
+    with CntlrPy.FormulaResultsWriter(conn, batchSize=10, retries=2, retryDelay=0) as w:
+        w.add(row(1, 'a'))
+    assert conn.rows() == [(1, 1, 'a')]
+    assert w.nativeUpsert and conn.fallbackCalls == []
+
+
+def test_write_errors_are_raised_with_rows_kept():
+    conn = LockingConn(locks=5)
+    flushed = []
+    w = CntlrPy.FormulaResultsWriter(conn, batchSize=10, retries=1, retryDelay=0, onFlush=lambda rows, ok: flushed.append(ok))
+    w.add(row(1, 'a'))
+    with pytest.raises(sqlite3.OperationalError):
+        w.flush()
+    assert w.nativeUpsert and conn.fallbackCalls == [] and flushed == []
+    assert len(w.errors['dbUpsert']) == 1 and len(w.inserts) == 1
+    conn.locks = 0
+    w.flush()
+    assert conn.rows() == [(1, 1, 'a')] and flushed == [True]
+
+
+def test_unsupported_upsert_only_detected_on_first_write():
+    conn = SqliteConn()
+    w = CntlrPy.FormulaResultsWriter(conn, batchSize=10)
+    w.add(row(1, 'a'))
+    w.flush()
+    conn.dbConn.execute('DROP TABLE "formulaeResults"')
+    conn.dbConn.execute('CREATE TABLE "formulaeResults" ("filingId" INTEGER, "formulaId" INTEGER, "formulaOutput" TEXT)')
+    w.add(row(2, 'b'))
+    with pytest.raises(sqlite3.OperationalError):
+        w.flush()
+    assert w.nativeUpsert and conn.fallbackCalls == []
+
+
+class MongoConn:
+    product = 'mongodb'
+
+    def __init__(self):
+        self.conParams = {'database': 'mongo'}
+        self.cntlr = NS(addToLog=lambda *args, **kwargs: None)
+        self.written = []
+        self.dbConn = NS(formulaeResults=NS(bulk_write=lambda ops, ordered: self.written.extend(x._doc for x in ops)))
+
+    def insertUpdateRssDB(self, rows, table, action='insert', *args, **kwargs):
+        self.written.extend(rows)
+        return {action: len(rows)}
+
+
+def test_mongodb_documents_have_sql_row_shape():
+    conn = MongoConn()
+    with CntlrPy.FormulaResultsWriter(conn, batchSize=10) as w:
+        w.add(row(1, 'a'))
+        w.add(row(2, 'b'), update=True)
+    assert conn.written == [{'filingId': 1, 'formulaId': 1, 'formulaOutput': 'a'}, {'filingId': 2, 'formulaId': 1, 'formulaOutput': 'b'}]
@@ -0,0 +1,38 @@
+from types import SimpleNamespace as NS
+
+from HelperFuncs import getDeiFacts
+
+
+class CountingFacts(list):
+    '''factsInInstance counting passes over the facts'''
+    passes = 0
+
+    def __iter__(self):
+        self.passes += 1
+        return super().__iter__()
+
+
+def fact(namespaceURI, localName, sourceline, objectIndex):
+    return NS(qname=NS(namespaceURI=namespaceURI, localName=localName), sourceline=sourceline, objectIndex=objectIndex)
+
+
+def test_dei_facts_collected_in_one_pass():
+    facts = CountingFacts([fact('http://xbrl.sec.gov/dei/2023', 'DocumentType', 20, 1),
+                           fact('http://xbrl.sec.gov/dei/2023', 'DocumentType', 10, 2),
+                           fact('http://xbrl.sec.gov/dei/2019-01-31', 'TradingSymbol', 5, 3),
+                           fact('http://fasb.org/us-gaap/2023', 'DocumentType', 1, 4),
+                           fact('http://xbrl.sec.gov/dei/2023', 'EntityRegistrantName', None, 5),
+                           fact('http://xbrl.sec.gov/dei/2023', 'AmendmentFlag', 7, 6),
+                           NS(qname=None, sourceline=1, objectIndex=7)])
+    mx = NS(factsInInstance=facts)
+    res = getDeiFacts(mx, ['DocumentType', 'TradingSymbol', 'EntityRegistrantName', 'EntityCentralIndexKey'])
+    assert facts.passes == 1
+    # facts in document order, other namespaces and names not asked for are left out, missing names are not in result
+    assert {k: [f.objectIndex for f in v] for k, v in res.items()} == {'DocumentType': [2, 1], 'TradingSymbol': [3], 'EntityRegistrantName': [5]}
+    assert res.get('EntityCentralIndexKey', []) == []
+    assert sorted(getDeiFacts(mx)) == ['AmendmentFlag', 'DocumentType', 'EntityRegistrantName', 'TradingSymbol']
+
+
+def test_no_facts():
+    assert getDeiFacts(NS(), ['DocumentType']) == {}
+    assert getDeiFacts(NS(factsInInstance=None)) == {}
@@ -0,0 +1,38 @@
+import gc, importlib, weakref
+from types import SimpleNamespace as NS
+
+import pytest
+
+
+class Result(dict):
+    '''result dict that can be weak referenced'''
+
+
+@pytest.fixture
+def CntlrPy(arellepyPlugin):
+    return importlib.import_module('arellepy.CntlrPy')
+
+
+def test_results_streamed_and_not_kept(CntlrPy, tmp_path, monkeypatch):
+    events = []
+    def iterFormulaRuns(cntlr, urlsDict, keys, inputRes, **kwargs):
+        for _k in keys:
+            events.append(('run', _k[0]))
+            yield _k, Result(filingId=_k[0], formulaId=_k[1], formulaOutput='<xbrl/>' * 1000, processingLog='')
+    monkeypatch.setattr(CntlrPy, 'iterFormulaRuns', iterFormulaRuns)
+    cntlr = NS(userAppDir=str(tmp_path), userAppTempDir=str(tmp_path), addToLog=lambda *args, **kwargs: None)
+    runInfo = dict()
+    results = CntlrPy.iterFormulaResults(cntlr, ['a.xml', 'b.xml', 'c.xml'], formulaString='<linkbase/>', formulaId='f1',
+                                         journalPath=str(tmp_path / 'journal.db'), runInfo=runInfo)
+    refs = []
+    for res in results:
+        # each result is yielded before the next instance is run, results yielded before are not kept
+        events.append(('yield', res['filingId']))
+        gc.collect()
+        assert all(x() is None for x in refs)
+        refs.append(weakref.ref(res))
+    res = None
+    gc.collect()
+    assert all(x() is None for x in refs)
+    assert events == [(kind, f) for f in ('a.xml', 'b.xml', 'c.xml') for kind in ('run', 'yield')]
+    assert runInfo['runId'] and not runInfo['errors']
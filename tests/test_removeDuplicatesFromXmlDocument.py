@@ -0,0 +1,114 @@
+import importlib, logging, random
+
+import pytest
+from lxml import etree
+
+
+# stand in for xbrl-instance-2003.xsd so instances load offline
+XBRLI = '''<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="http://www.xbrl.org/2003/instance" elementFormDefault="qualified">
+  <xs:attribute name="periodType"><xs:simpleType><xs:restriction base="xs:token"><xs:enumeration value="instant"/></xs:restriction></xs:simpleType></xs:attribute>
+  <xs:element name="item" abstract="true"/>
+  <xs:complexType name="monetaryItemType"><xs:simpleContent><xs:extension base="xs:decimal">
+    <xs:attribute name="contextRef" type="xs:IDREF" use="required"/><xs:attribute name="unitRef" type="xs:IDREF"/>
+    <xs:attribute name="decimals" type="xs:string"/></xs:extension></xs:simpleContent></xs:complexType>
+  <xs:complexType name="stringItemType"><xs:simpleContent><xs:extension base="xs:string">
+    <xs:attribute name="contextRef" type="xs:IDREF" use="required"/></xs:extension></xs:simpleContent></xs:complexType>
+</xs:schema>'''
+
+SCHEMA = '''<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:xbrli="http://www.xbrl.org/2003/instance" targetNamespace="http://t" elementFormDefault="qualified">
+  <xs:import namespace="http://www.xbrl.org/2003/instance" schemaLocation="xbrli.xsd"/>
+  <xs:element name="A" id="A" type="xbrli:monetaryItemType" substitutionGroup="xbrli:item" xbrli:periodType="instant"/>
+  <xs:element name="B" id="B" type="xbrli:monetaryItemType" substitutionGroup="xbrli:item" xbrli:periodType="instant"/>
+  <xs:element name="S" id="S" type="xbrli:stringItemType" substitutionGroup="xbrli:item" xbrli:periodType="instant"/>
+</xs:schema>'''
+
+CONTEXT = '''<xbrli:context id="{0}"><xbrli:entity><xbrli:identifier scheme="http://x">1</xbrli:identifier></xbrli:entity>
+  <xbrli:period><xbrli:instant>2020-01-0{1}</xbrli:instant></xbrli:period></xbrli:context>'''
+
+
+def randomInstance(rnd, n):
+    children = ['<link:schemaRef xlink:type="simple" xlink:href="s.xsd"/>', CONTEXT.format('c1', 1), CONTEXT.format('c2', 2),
+                '<xbrli:unit id="u1"><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unit>',
+                '<xbrli:unit id="u2"><xbrli:measure>iso4217:EUR</xbrli:measure></xbrli:unit>']
+    for i in range(n):
+        kind = rnd.choice('ABSN')
+        if kind in 'AB':
+            children.append('<t:{} contextRef="{}" unitRef="{}" decimals="{}">{}</t:{}>'.format(
+                kind, rnd.choice(('c1', 'c2')), rnd.choice(('u1', 'u2')), rnd.choice(('0', '-3')), rnd.choice(('1000', '2000')), kind))
+        elif kind == 'S':
+            children.append('<t:S contextRef="{}">{}</t:S>'.format(rnd.choice(('c1', 'c2')), rnd.choice(('x', ' x ', 'y'))))
+        else:
+            # elements that are not facts
+            children.append('<n:note kind="{}">{}</n:note>'.format(rnd.choice(('a', 'b')), rnd.choice(('p', ' p', 'q'))))
+    return ('<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:link="http://www.xbrl.org/2003/linkbase" '
+            'xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:t="http://t" xmlns:n="http://n" '
+            'xmlns:iso4217="http://www.xbrl.org/2003/iso4217">{}</xbrli:xbrl>').format('\n'.join(children))
+
+
+def quadraticRemoveDuplicates(modelXbrl):
+    '''removal done by `removeDuplicatesFromXmlDocument` before it was made single pass, without logging'''
+    from arelle.ModelInstanceObject import ModelFact
+    from arelle.ModelDtsObject import ModelObject
+    f1 = [x for x in modelXbrl.modelDocument.xmlRootElement.iterchildren() if x.localName not in ('schemaRef', 'context', 'unit')]
+    removed = set()
+    for obj in f1:
+        if obj in removed:
+            continue
+        for other in f1:
+            if other in removed or other is obj:
+                continue
+            if type(obj) is ModelFact and type(other) is ModelFact:
+                if other.isDuplicateOf(obj):
+                    removed.add(other)
+                    other.getparent().remove(other)
+            elif type(obj) is ModelObject and type(other) is ModelObject:
+                if obj.tag == other.tag and all(obj.attrib.get(att) == other.attrib.get(att) for att in obj.attrib.keys()) and \
+                    obj.text.strip() == other.text.strip():
+                    removed.add(other)
+                    other.getparent().remove(other)
+
+
+@pytest.fixture(scope='module')
+def cntlr(arellepyPlugin):
+    from arelle import Cntlr
+    c = Cntlr.Cntlr(logFileName='logToBuffer')
+    c.webCache.workOffline = True
+    c.rssDBFormulaRemoveDups = True
+    yield c
+    c.close()
+
+
+def load(cntlr, folder, text):
+    for name, content in (('xbrli.xsd', XBRLI), ('s.xsd', SCHEMA), ('i.xml', text)):
+        (folder / name).write_text(content)
+    return cntlr.modelManager.load(str(folder / 'i.xml'))
+
+
+def remainingChildren(modelXbrl):
+    return [etree.tostring(x) for x in modelXbrl.modelDocument.xmlRootElement.iterchildren()]
+
+
+@pytest.mark.parametrize('seed,logLevel', [(0, logging.INFO), (1, logging.INFO), (2, logging.DEBUG), (3, logging.DEBUG)])
+def test_same_result_as_quadratic_removal(cntlr, tmp_path, seed, logLevel, monkeypatch):
+    CntlrPy = importlib.import_module('arellepy.CntlrPy')
+    text = randomInstance(random.Random(seed), 60)
+    expected = load(cntlr, tmp_path, text)
+    quadraticRemoveDuplicates(expected)
+    mx = load(cntlr, tmp_path, text)
+    messages = []
+    monkeypatch.setattr(cntlr, 'addToLog', lambda msg, **kwargs: messages.append((msg, kwargs.get('level'))))
+    nBefore = len(remainingChildren(mx))
+    oldLevel = cntlr.logger.level
+    cntlr.logger.setLevel(logLevel)
+    try:
+        CntlrPy.removeDuplicatesFromXmlDocument(mx)
+    finally:
+        cntlr.logger.setLevel(oldLevel)
+    assert remainingChildren(mx) == remainingChildren(expected)
+    # one summary entry, removed elements are only logged at debug level
+    nRemoved = nBefore - len(remainingChildren(mx))
+    assert nRemoved > 0
+    assert [level for msg, level in messages] == [logging.DEBUG] * (nRemoved if logLevel == logging.DEBUG else 0) + [logging.INFO]
+    assert messages[-1][0].startswith('Removed {} duplicate element(s)'.format(nRemoved))
+    expected.close()
+    mx.close()
@@ -0,0 +1,69 @@
+import os, sys, time
+from types import SimpleNamespace as NS
+
+import pytest
+
+import CntlrPy
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='render worker pool is linux only')
+
+
+def fakeRenderTask(c, taskArgs):
+    '''renders filings named ok*, fails, raises, kills its worker or hangs for the others'''
+    itemInfo, saveToFolder, forceRender = taskArgs
+    name = os.path.basename(itemInfo['entryPointUrl'])
+    if name.startswith('raise'):
+        raise ValueError('renderer crashed on ' + name)
+    if name.startswith('exit'):
+        os._exit(1)
+    if name.startswith('hang'):
+        time.sleep(60)
+    if name.startswith('fail'):
+        return {'reportFolder': None, 'errors': ['FilingSummary.xml was not created'], 'duration': 0, 'fileHashes': None, 'bytes': None, 'memory': 1}
+    folder = os.path.join(saveToFolder, name.replace('.', '_'))
+    os.makedirs(folder, exist_ok=True)
+    for x in ('FilingSummary.xml', 'additionalMeta.json'):
+        with open(os.path.join(folder, x), 'w') as fd:
+            fd.write(x)
+    return {'reportFolder': folder, 'errors': [], 'duration': 0, 'fileHashes': CntlrPy.reportFilesHashes(folder), 'bytes': 0, 'memory': 1}
+
+
+def rssItem(name, day):
+    return NS(url='https://www.sec.gov/Archives/edgar/data/1/{}'.format(name), pubDate=day, formType='10-K', companyName=name, 
+              accessionNumber=name, status=None, results=None)
+
+
+@pytest.fixture
+def renderPool(monkeypatch):
+    monkeypatch.setattr(CntlrPy, 'renderPluginsToPreload', lambda resDir, plugins=None: 'EdgarRenderer')
+    monkeypatch.setattr(CntlrPy, 'renderSetupInfo', lambda resDir, plugins: {'arelleVersion': '2.0', 'rendererVersion': '3.0', 'plugins': 'EdgarRenderer'})
+    monkeypatch.setattr(CntlrPy, 'renderItemInfo', lambda x: {'entryPointUrl': x.url, 'primeDoc': None, 'accessionNumber': x.accessionNumber})
+    monkeypatch.setattr(CntlrPy, 'initRenderWorker', lambda *args: None)
+    monkeypatch.setattr(CntlrPy, 'closeRenderWorker', lambda c: None)
+    monkeypatch.setattr(CntlrPy, 'renderWorkerTask', fakeRenderTask)
+
+
+def test_failed_filings_do_not_stop_batch(renderPool, tmp_path):
+    messages = []
+    cntlr = NS(userAppDir=str(tmp_path), configDir=str(tmp_path / 'config'), showStatus=lambda *args, **kwargs: None,
+               addToLog=lambda msg, **kwargs: messages.append(msg))
+    names = ['ok1.htm', 'raise.htm', 'ok2.htm', 'exit.htm', 'fail.htm', 'hang.htm', 'ok3.htm']
+    items = [rssItem(name, day) for day, name in enumerate(reversed(names))]
+    events = []
+    CntlrPy.renderEdgarReportsFromRssItems(cntlr, items, str(tmp_path / 'reports'), workers=2, filingTimeout=3, 
+                                           manifestPath=str(tmp_path / 'manifest.db'), progressCallback=lambda evt, stats: events.append(evt))
+    status = {x.companyName: x.status for x in items}
+    assert status == {name: 'Render Edgar Reports' if name.startswith('ok') else 'Render Failed' for name in names}
+    assert sorted(os.listdir(str(tmp_path / 'reports'))) == ['ok1_htm', 'ok2_htm', 'ok3_htm']
+    assert any('Done with Rendering 3 reports' in x and '4 failed' in x for x in messages)
+    errors = '\n'.join(x for x in messages if x.startswith('Error in rendering'))
+    assert 'renderer crashed on raise.htm' in errors and 'timed out' in errors
+    # each filing gets one final event
+    assert sorted(evt['key'] for evt in events if evt['event'] in ('done', 'failed')) == sorted(x.url for x in items)
+    # failed filings are rendered again next time, rendered ones are skipped
+    events.clear()
+    CntlrPy.renderEdgarReportsFromRssItems(cntlr, [x for x in items if x.companyName in ('ok1.htm', 'ok2.htm', 'fail.htm')], 
+                                           str(tmp_path / 'reports'), workers=2, manifestPath=str(tmp_path / 'manifest.db'), 
+                                           progressCallback=lambda evt, stats: events.append(evt))
+    assert any('2 filing(s) already rendered' in x for x in messages)
+    assert [evt['key'] for evt in events if evt['event'] == 'queued'] == ['https://www.sec.gov/Archives/edgar/data/1/fail.htm']
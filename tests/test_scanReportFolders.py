@@ -0,0 +1,132 @@
+import os, sys, json
+
+import pytest
+
+import HelperFuncs
+from HelperFuncs import scanReportFolders, makeLocator
+from LocatorIndex import LocatorIndex
+
+
+def makeReport(folder, complete=True):
+    os.makedirs(folder)
+    with open(os.path.join(folder, 'FilingSummary.xml'), 'w') as f:
+        f.write('<FilingSummary><InputFiles><File instance="a-20231231.htm">a-20231231.htm</File></InputFiles></FilingSummary>')
+    if complete:
+        with open(os.path.join(folder, 'additionalMeta.json'), 'w') as f:
+            f.write('{"dataAttrs": "%s"}' % os.path.basename(folder))
+    return folder
+
+
+@pytest.fixture
+def reportsTree(tmp_path):
+    root = tmp_path / 'reports'
+    expected = [makeReport(str(root / 'a')), makeReport(str(root / 'b' / 'c'))]
+    makeReport(str(root / 'a' / 'nested'))          # within report folder, not scanned
+    makeReport(str(root / '.hidden' / 'd'))         # hidden, not scanned
+    makeReport(str(root / 'e'), complete=False)     # not a report folder
+    return root, sorted(expected)
+
+
+def test_report_folders_found(reportsTree):
+    root, expected = reportsTree
+    for threads in (1, 4):
+        found = scanReportFolders([str(root)], threads=threads)
+        assert [f for f, entries in found] == expected
+        assert all({'FilingSummary.xml', 'additionalMeta.json'} <= set(entries) for f, entries in found)
+
+
+def test_no_report_folders(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    assert scanReportFolders([str(tmp_path)]) == []
+    assert scanReportFolders(None) == []
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='symlinks need privileges on windows')
+def test_symlinks_checked_not_descended(reportsTree, tmp_path):
+    root, expected = reportsTree
+    outside = tmp_path / 'outside'
+    makeReport(str(outside / 'f'))
+    makeReport(str(outside / 'g' / 'h'))
+    os.symlink(str(outside / 'f'), str(root / 'linkReport'))
+    os.symlink(str(outside / 'g'), str(root / 'linkFolder'))
+    found = [f for f, entries in scanReportFolders([str(root)])]
+    assert found == sorted(expected + [str(root / 'linkReport')])
+
+
+def test_makeLocator_index_reuses_unchanged_folders(reportsTree, tmp_path, monkeypatch):
+    root, expected = reportsTree
+    indexPath = str(tmp_path / 'locatorIndex.db')
+    locators = makeLocator([str(root)], index=indexPath)['locators']
+    assert sorted(x['reportFolder'] for x in locators.values()) == expected
+    with LocatorIndex(indexPath) as index:
+        assert sorted(index.stamps()) == expected
+
+    def failRead(*args, **kwargs):
+        raise AssertionError('unchanged report folder was read again')
+    monkeypatch.setattr(HelperFuncs, 'readReportFolder', failRead)
+    assert makeLocator([str(root)], index=indexPath)['locators'] == locators
+
+    # changed folders are read again, unchanged ones still come from the index
+    monkeypatch.undo()
+    readFolders = []
+    readReportFolder = HelperFuncs.readReportFolder
+    def countingRead(f, *args, **kwargs):
+        readFolders.append(f)
+        return readReportFolder(f, *args, **kwargs)
+    monkeypatch.setattr(HelperFuncs, 'readReportFolder', countingRead)
+    with open(os.path.join(expected[0], 'additionalMeta.json'), 'w') as f:
+        f.write('{"dataAttrs": "a changed"}')
+    os.utime(os.path.join(expected[0], 'additionalMeta.json'), (1, 1))
+    locators = makeLocator([str(root)], index=indexPath)['locators']
+    assert readFolders == expected[:1]
+    assert sorted(x['dataAttrs'] for x in locators.values()) == ['a changed', 'c']
+
+    # folders gone are dropped from the index
+    monkeypatch.undo()
+    os.remove(os.path.join(expected[1], 'additionalMeta.json'))
+    locators = makeLocator([str(root)], index=indexPath)['locators']
+    assert [x['reportFolder'] for x in locators.values()] == expected[:1]
+    with LocatorIndex(indexPath) as index:
+        assert sorted(index.stamps()) == expected[:1]
+
+
+def writeLocator(path, loc):
+    with open(path, 'w') as f:
+        json.dump(loc, f)
+
+
+def test_makeLocator_merges_new_filings_only(reportsTree, tmp_path):
+    root, expected = reportsTree
+    locPath = str(tmp_path / 'locator.json')
+    # "a" is already in the locator file, another filing is keyed "c" so new "c" is added under another key
+    writeLocator(locPath, {'a': {'dataAttrs': 'a', 'reportFolder': 'old'}, 'c': {'dataAttrs': {'y': 1, 'x': 2}}})
+    with pytest.warns(HelperFuncs.CntlrPyWarning):
+        res = makeLocator([str(root)], CreateUpdatelocatorPath=locPath)
+    with open(locPath) as f:
+        saved = json.load(f)
+    assert saved == res['locators']
+    assert list(saved) == ['a', 'c', 'c_1']
+    assert saved['a']['reportFolder'] == 'old' and saved['c_1']['reportFolder'] == expected[1]
+    assert [x for x in os.listdir(str(tmp_path)) if x.endswith('.tmp')] == []
+
+    # nothing new, file is not written again, dict dataAttrs are matched regardless of key order
+    writeLocator(locPath, {'a': {'dataAttrs': 'a'}, 'c': {'dataAttrs': 'c'}, 'z': {'dataAttrs': {'x': 2, 'y': 1}}})
+    os.utime(locPath, (0, 0))
+    with pytest.warns(HelperFuncs.CntlrPyWarning):
+        assert list(makeLocator([str(root)], CreateUpdatelocatorPath=locPath)['locators']) == ['a', 'c', 'z']
+    assert os.stat(locPath).st_mtime == 0
+
+
+def test_locator_write_failure_keeps_old_file(tmp_path):
+    locPath = str(tmp_path / 'locator.json')
+    writeLocator(locPath, {'a': {'dataAttrs': 'a'}})
+    os.chmod(locPath, 0o640)
+    with pytest.raises(TypeError):
+        HelperFuncs._dumpJsonAtomic({'a': {'dataAttrs': 'a'}, 'b': object()}, locPath)
+    with open(locPath) as f:
+        assert json.load(f) == {'a': {'dataAttrs': 'a'}}
+    assert os.listdir(str(tmp_path)) == ['locator.json']
+    HelperFuncs._dumpJsonAtomic({'b': {'dataAttrs': 'b'}}, locPath)
+    with open(locPath) as f:
+        assert json.load(f) == {'b': {'dataAttrs': 'b'}}
+    assert os.stat(locPath).st_mode & 0o777 == 0o640